@@ -0,0 +1,155 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# Upper bound on resample matrix cells materialized at once (~40MB of int64)
+MAX_BATCH_CELLS = 5_000_000
+
+
+def _batch_size(n_rows, n_total):
+    """Resamples per NumPy batch so that one batch stays under MAX_BATCH_CELLS"""
+    return int(max(1, min(n_total, MAX_BATCH_CELLS // max(n_rows, 1))))
+
+
+def _is_binary(values):
+    """True when every value is 0 or 1 (hit / no hit)"""
+    return bool(np.all((values == 0) | (values == 1)))
+
+
+def _bootstrap_chunk(control, treatment, n_resamples, seed):
+    """Bootstrap resampled (control, treatment) means for one chunk"""
+    rng = np.random.default_rng(seed)
+
+    # For 0/1 hits the resampled hit count is exactly Binomial(n, rate)
+    if _is_binary(control) and _is_binary(treatment):
+        return (
+            rng.binomial(len(control), control.mean(), size=n_resamples) / len(control),
+            rng.binomial(len(treatment), treatment.mean(), size=n_resamples) / len(treatment)
+        )
+
+    control_means = np.empty(n_resamples)
+    treatment_means = np.empty(n_resamples)
+
+    step = _batch_size(max(len(control), len(treatment)), n_resamples)
+    for start in range(0, n_resamples, step):
+        size = min(step, n_resamples - start)
+        idx_c = rng.integers(0, len(control), size=(size, len(control)))
+        idx_t = rng.integers(0, len(treatment), size=(size, len(treatment)))
+        control_means[start:start + size] = control[idx_c].mean(axis=1)
+        treatment_means[start:start + size] = treatment[idx_t].mean(axis=1)
+
+    return control_means, treatment_means
+
+
+def _permutation_chunk(pooled, n_treatment, n_permutations, seed):
+    """Treatment-minus-control mean differences under shuffled labels"""
+    rng = np.random.default_rng(seed)
+
+    # For 0/1 hits the shuffled treatment hit count is exactly hypergeometric
+    if _is_binary(pooled):
+        total_hits = int(pooled.sum())
+        treatment_sums = rng.hypergeometric(
+            total_hits, len(pooled) - total_hits, n_treatment, size=n_permutations
+        )
+        n_control = len(pooled) - n_treatment
+        return treatment_sums / n_treatment - (total_hits - treatment_sums) / n_control
+
+    diffs = np.empty(n_permutations)
+
+    step = _batch_size(len(pooled), n_permutations)
+    for start in range(0, n_permutations, step):
+        size = min(step, n_permutations - start)
+        shuffled = rng.permuted(np.broadcast_to(pooled, (size, len(pooled))), axis=1)
+        diffs[start:start + size] = (
+            shuffled[:, :n_treatment].mean(axis=1) - shuffled[:, n_treatment:].mean(axis=1)
+        )
+
+    return diffs
+
+
+def _run_chunks(fn, args, n_total, n_jobs, seed):
+    """Split n_total draws into independently seeded chunks, optionally in a process pool"""
+    n_chunks = max(1, n_jobs)
+    sizes = [len(c) for c in np.array_split(np.arange(n_total), n_chunks) if len(c) > 0]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = [pool.submit(fn, *args, size, s) for size, s in zip(sizes, seeds)]
+            return [f.result() for f in futures]
+
+    return [fn(*args, size, s) for size, s in zip(sizes, seeds)]
+
+
+def bootstrap_lift(control_hits, treatment_hits, n_resamples=10000, confidence=0.95,
+                   n_jobs=1, seed=42):
+    """
+    Bootstrap confidence intervals for the lift of treatment over control
+
+    Args:
+        control_hits: per-user metric for the control group (e.g. 0/1 hits)
+        treatment_hits: per-user metric for the treatment group
+        n_resamples: number of bootstrap resamples
+        confidence: two-sided confidence level of the intervals
+        n_jobs: worker processes (1 = run in-process)
+        seed: base seed, results are reproducible for a fixed n_jobs
+
+    Returns:
+        dict with observed rates, absolute/relative lift and their CIs
+    """
+    control = np.asarray(control_hits, dtype=float)
+    treatment = np.asarray(treatment_hits, dtype=float)
+
+    chunks = _run_chunks(_bootstrap_chunk, (control, treatment), n_resamples, n_jobs, seed)
+    control_means = np.concatenate([c for c, _ in chunks])
+    treatment_means = np.concatenate([t for _, t in chunks])
+
+    absolute = treatment_means - control_means
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative = absolute / control_means
+    relative = relative[np.isfinite(relative)]
+
+    alpha = (1 - confidence) / 2 * 100
+    control_rate = control.mean()
+    treatment_rate = treatment.mean()
+
+    return {
+        'control_rate': control_rate,
+        'treatment_rate': treatment_rate,
+        'absolute_lift': treatment_rate - control_rate,
+        'relative_lift': (treatment_rate - control_rate) / control_rate if control_rate > 0 else np.nan,
+        'absolute_lift_ci': tuple(np.percentile(absolute, [alpha, 100 - alpha])),
+        'relative_lift_ci': tuple(np.percentile(relative, [alpha, 100 - alpha])) if len(relative) else (np.nan, np.nan),
+        'confidence': confidence,
+        'n_resamples': n_resamples
+    }
+
+
+def permutation_test(control_hits, treatment_hits, n_permutations=10000, n_jobs=1, seed=42):
+    """
+    Two-sided permutation p-value for the difference in mean hit rate
+
+    Returns:
+        dict with the observed difference and the permutation p-value
+    """
+    control = np.asarray(control_hits, dtype=float)
+    treatment = np.asarray(treatment_hits, dtype=float)
+    pooled = np.concatenate([treatment, control])
+    observed = treatment.mean() - control.mean()
+
+    chunks = _run_chunks(_permutation_chunk, (pooled, len(treatment)), n_permutations, n_jobs, seed)
+    diffs = np.concatenate(chunks)
+
+    extreme = np.sum(np.abs(diffs) >= abs(observed) - 1e-12)
+
+    return {
+        'observed_diff': observed,
+        'p_value': (extreme + 1) / (n_permutations + 1),
+        'n_permutations': n_permutations
+    }
+
+
+def simulate(control_hits, treatment_hits, n_resamples=10000, confidence=0.95, n_jobs=1, seed=42):
+    """Bootstrap lift CIs plus permutation p-value in one call"""
+    results = bootstrap_lift(control_hits, treatment_hits, n_resamples, confidence, n_jobs, seed)
+    results.update(permutation_test(control_hits, treatment_hits, n_resamples, n_jobs, seed))
+    return results
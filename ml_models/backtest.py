@@ -0,0 +1,225 @@
+import pandas as pd
+import numpy as np
+import psycopg2
+import json
+import time
+from pathlib import Path
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from ranking_metrics import build_rec_matrix, hits_at_k
+from event_types import VIEW, ADDTOCART, TRANSACTION
+import warnings
+warnings.filterwarnings("ignore", message="pandas only supports SQLAlchemy")
+
+load_dotenv()
+
+DB_CONFIG = {
+    'dbname': os.getenv('DB_NAME'),
+    'user': os.getenv('DB_USER'),
+    'password': os.getenv('DB_PASSWORD'),
+    'host': os.getenv('DB_HOST'),
+    'port': os.getenv('DB_PORT')
+}
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def rolling_cutoffs(n_folds=4, horizon_days=7, train_days=None, source="events"):
+    """
+    Define rolling-origin folds as timestamp ranges over the events source
+
+    Fold i trains on [train_start, cutoff) and tests on [cutoff, cutoff + horizon).
+    The last fold's test window ends at the newest event. Nothing is copied:
+    every fold is just a range predicate on the indexed timestamp column.
+
+    Args:
+        n_folds: number of cutoffs
+        horizon_days: length of every test window (and step between cutoffs)
+        train_days: sliding training window length, None = expanding window
+        source: table or view holding the event log
+    """
+    conn = psycopg2.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT MIN(timestamp), MAX(timestamp) FROM {source}")
+    min_ts, max_ts = cursor.fetchone()
+    conn.close()
+
+    horizon = horizon_days * DAY_MS
+    folds = []
+
+    for i in range(n_folds):
+        cutoff = max_ts + 1 - horizon * (n_folds - i)
+        train_start = min_ts if train_days is None else max(min_ts, cutoff - train_days * DAY_MS)
+
+        if cutoff <= train_start:
+            raise ValueError(
+                f"Fold {i + 1} has an empty training window; use fewer folds or a shorter horizon"
+            )
+
+        folds.append({
+            'fold': i + 1,
+            'train_start': int(train_start),
+            'cutoff': int(cutoff),
+            'test_end': int(cutoff + horizon)
+        })
+
+    return folds
+
+
+def train_popularity(conn, source, train_start, cutoff, n=100):
+    """Most viewed items that sold at least once in the training window"""
+    return pd.read_sql(f"""
+        SELECT itemid
+        FROM {source}
+        WHERE timestamp >= {train_start} AND timestamp < {cutoff}
+        GROUP BY itemid
+        HAVING COUNT(*) FILTER (WHERE event = {TRANSACTION}) > 0
+        ORDER BY COUNT(*) FILTER (WHERE event = {VIEW}) DESC
+        LIMIT {n}
+    """, conn)['itemid'].tolist()
+
+
+def train_trending(conn, source, train_start, cutoff, n=100):
+    """Time-weighted trending items over the last 20% of the training window"""
+    recent_ts = train_start + (cutoff - train_start) * 0.8
+
+    return pd.read_sql(f"""
+        SELECT e.itemid
+        FROM {source} e
+        JOIN event_types et ON et.event_code = e.event
+        WHERE e.timestamp >= {recent_ts} AND e.timestamp < {cutoff}
+        GROUP BY e.itemid
+        HAVING SUM(et.weight) > 10
+        ORDER BY SUM(
+            et.weight * (e.timestamp - {train_start})::FLOAT / ({cutoff} - {train_start} + 1)
+        ) DESC
+        LIMIT {n}
+    """, conn)['itemid'].tolist()
+
+
+FOLD_MODELS = {
+    'Popularity': train_popularity,
+    'Trending': train_trending
+}
+
+
+def run_fold(fold, ks=(5, 10, 20), source="events"):
+    """Train the lightweight models on one fold and score its test window"""
+    started = time.perf_counter()
+    conn = psycopg2.connect(**DB_CONFIG)
+
+    test_pairs = pd.read_sql(f"""
+        SELECT DISTINCT visitorid, itemid
+        FROM {source}
+        WHERE timestamp >= {fold['cutoff']} AND timestamp < {fold['test_end']}
+          AND event IN ({ADDTOCART}, {TRANSACTION})
+    """, conn)
+
+    user_index, user_ids = pd.factorize(test_pairs['visitorid'])
+    item_ids = test_pairs['itemid'].values
+    max_k = max(ks)
+
+    metrics = {}
+    for name, train_fn in FOLD_MODELS.items():
+        recs = train_fn(conn, source, fold['train_start'], fold['cutoff'])
+
+        # Non-personalized lists: one row shared by every test user
+        rec_matrix = np.broadcast_to(build_rec_matrix([recs], max_k), (len(user_ids), max_k))
+        hits = hits_at_k(rec_matrix, user_index, item_ids, ks)
+
+        metrics[name] = {
+            str(k): {
+                'hit_rate': float(np.mean(hits[k] > 0)) if len(user_ids) else 0.0,
+                'precision': float(np.mean(hits[k] / k)) if len(user_ids) else 0.0
+            }
+            for k in ks
+        }
+
+    conn.close()
+
+    return {
+        **fold,
+        'test_users': int(len(user_ids)),
+        'seconds': round(time.perf_counter() - started, 2),
+        'metrics': metrics
+    }
+
+
+def aggregate_folds(fold_results, ks):
+    """Mean and standard deviation of every metric across folds"""
+    summary = {}
+
+    for name in FOLD_MODELS:
+        summary[name] = {}
+        for k in ks:
+            summary[name][str(k)] = {}
+            for metric in ('hit_rate', 'precision'):
+                values = [f['metrics'][name][str(k)][metric] for f in fold_results]
+                summary[name][str(k)][metric] = {
+                    'mean': float(np.mean(values)),
+                    'std': float(np.std(values))
+                }
+
+    return summary
+
+
+def run_backtest(n_folds=4, horizon_days=7, train_days=None, ks=(5, 10, 20),
+                 n_workers=4, source="events", output_file="data/backtest_results.json"):
+    """Run every fold (in parallel worker processes) and aggregate the metrics"""
+    print("\n" + "="*60)
+    print("ROLLING-ORIGIN BACKTEST")
+    print("="*60 + "\n")
+
+    folds = rolling_cutoffs(n_folds, horizon_days, train_days, source)
+
+    for fold in folds:
+        print(f"[INFO] Fold {fold['fold']}: "
+              f"train {pd.to_datetime(fold['train_start'], unit='ms')} -> "
+              f"{pd.to_datetime(fold['cutoff'], unit='ms')}, "
+              f"test until {pd.to_datetime(fold['test_end'], unit='ms')}")
+
+    started = time.perf_counter()
+
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=min(n_workers, len(folds))) as pool:
+            fold_results = list(pool.map(run_fold, folds, [ks] * len(folds), [source] * len(folds)))
+    else:
+        fold_results = [run_fold(fold, ks, source) for fold in folds]
+
+    elapsed = time.perf_counter() - started
+    print(f"\n[OK] {len(folds)} folds finished in {elapsed:.1f}s")
+
+    summary = aggregate_folds(fold_results, ks)
+
+    # Results
+    print("\n" + "="*60)
+    print("BACKTEST RESULTS (mean ± std across folds)")
+    print("="*60 + "\n")
+
+    print(f"{'Model':<15} {'K':<5} {'Hit Rate':<20} {'Precision':<20}")
+    print("-" * 60)
+    for name, by_k in summary.items():
+        for k, metrics in by_k.items():
+            hr = metrics['hit_rate']
+            prec = metrics['precision']
+            print(f"{name:<15} {k:<5} "
+                  f"{hr['mean']:>6.2%} ± {hr['std']:<10.2%} "
+                  f"{prec['mean']:>6.2%} ± {prec['std']:<10.2%}")
+
+    Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+    with open(output_file, 'w') as f:
+        json.dump({'folds': fold_results, 'summary': summary}, f, indent=2)
+
+    print(f"\n[OK] Results saved to {output_file}")
+    print("\n" + "="*60 + "\n")
+
+    return summary
+
+
+def main():
+    run_backtest(n_folds=4, horizon_days=7)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+import numpy as np
+import argparse
+import json
+import os
+import sys
+import time
+import gc
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DEFAULT_OUTPUT_DIR = "data/benchmarks"
+
+# p95 latency / throughput change that counts as a regression vs a baseline run
+REGRESSION_THRESHOLD = 0.10
+
+# p95 changes smaller than this are timer noise, whatever the relative change
+MIN_LATENCY_DELTA_MS = 0.05
+
+
+def rss_mb():
+    """Current resident memory of this process in MB (psutil, else /proc on Linux)"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1024 ** 2
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        return float('nan')
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, from getrusage on every platform"""
+    if resource is None:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, KB elsewhere
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def _popularity():
+    from popularity_recommender import PopularityRecommender
+    return PopularityRecommender()
+
+
+def _trending():
+    from trending_items import TrendingRecommender
+    return TrendingRecommender()
+
+
+def _category_cf():
+    from category_cf import CategoryCollaborativeFiltering
+    return CategoryCollaborativeFiltering()
+
+
+def _item_cf():
+    from collaborative_filtering import CollaborativeFilteringModel
+    return CollaborativeFilteringModel()
+
+
+def _database_users(n, seed):
+    """Random sample of known visitor ids (None = anonymous if the DB is unreachable)"""
+    try:
+        import psycopg2
+        import pandas as pd
+        from popularity_recommender import DB_CONFIG
+
+        conn = psycopg2.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        cursor.execute("SELECT setseed(%s)", (((seed % 1000) / 1000.0),))
+        users = pd.read_sql(
+            f"SELECT visitorid FROM user_features ORDER BY random() LIMIT {int(n)}", conn
+        )['visitorid'].tolist()
+        conn.close()
+        return users
+    except Exception as e:
+        print(f"[WARN] Could not sample users from database ({e}); using anonymous requests")
+        return [None] * n
+
+
+def _sample(values, n, rng):
+    """Draw n request keys with replacement from a model's known keys"""
+    values = list(values)
+    if not values:
+        return [None] * n
+    return [values[i] for i in rng.integers(0, len(values), size=n)]
+
+
+# name -> (factory, artifact path, request key sampler, single-request call)
+MODELS = {
+    'Popularity': (
+        _popularity,
+        'data/models/popularity_model.pkl',
+        lambda model, n, rng, seed: _database_users(n, seed),
+        lambda model, key: model.recommend(user_id=key, n=10)
+    ),
+    'Trending': (
+        _trending,
+        'data/models/trending_model.pkl',
+        lambda model, n, rng, seed: _sample(model.category_trending.keys(), n, rng),
+        lambda model, key: model.recommend(category_id=key, n=10)
+    ),
+    'Category_CF': (
+        _category_cf,
+        'data/models/category_cf.pkl',
+        lambda model, n, rng, seed: _sample(model.user_ids, n, rng),
+        lambda model, key: model.recommend(key, n=10)
+    ),
+    'Item_CF': (
+        _item_cf,
+        'data/models/cf_model.pkl',
+        lambda model, n, rng, seed: _sample(model.user_ids, n, rng),
+        lambda model, key: model.recommend(key, n_recommendations=10)
+    )
+}
+
+
+def benchmark_model(name, n_requests=1000, n_warmup=20, batch_size=256, seed=42):
+    """
+    Benchmark one model; meant to run in a fresh process so load and memory are cold
+
+    Measures:
+        - module import time and cold load time of the artifact
+        - resident memory before/after load
+        - single-call latency percentiles over sampled request keys
+        - batch throughput (requests/sec) using recommend_batch when available
+    """
+    factory, filepath, sampler, call = MODELS[name]
+
+    if not Path(filepath).exists():
+        return {'model': name, 'status': 'skipped', 'reason': f"{filepath} not found"}
+
+    rng = np.random.default_rng(seed)
+
+    # Import the model's module first so load time and memory cover the artifact only
+    started = time.perf_counter()
+    model = factory()
+    import_seconds = time.perf_counter() - started
+
+    gc.collect()
+    rss_before = rss_mb()
+
+    started = time.perf_counter()
+    model.load_model(filepath)
+    load_seconds = time.perf_counter() - started
+
+    rss_loaded = rss_mb()
+
+    keys = sampler(model, n_requests + n_warmup, rng, seed)
+    warmup, keys = keys[:n_warmup], keys[n_warmup:]
+
+    for key in warmup:
+        call(model, key)
+
+    # Single-call latency
+    latencies = np.empty(len(keys))
+    for i, key in enumerate(keys):
+        t0 = time.perf_counter()
+        call(model, key)
+        latencies[i] = time.perf_counter() - t0
+    latencies_ms = latencies * 1000
+
+    # Batch throughput
+    batch_fn = getattr(model, 'recommend_batch', None)
+    started = time.perf_counter()
+    for start in range(0, len(keys), batch_size):
+        batch = keys[start:start + batch_size]
+        if batch_fn is not None:
+            batch_fn(batch, n=10)
+        else:
+            for key in batch:
+                call(model, key)
+    batch_seconds = time.perf_counter() - started
+
+    return {
+        'model': name,
+        'status': 'ok',
+        'artifact': filepath,
+        'artifact_mb': round(Path(filepath).stat().st_size / 1024 ** 2, 2),
+        'requests': len(keys),
+        'import_s': round(import_seconds, 4),
+        'cold_load_s': round(load_seconds, 4),
+        'rss_before_mb': round(rss_before, 1),
+        'rss_loaded_mb': round(rss_loaded, 1),
+        'rss_model_mb': round(rss_loaded - rss_before, 1),
+        'rss_peak_mb': round(peak_rss_mb(), 1),
+        'latency_ms': {
+            'mean': round(float(latencies_ms.mean()), 4),
+            'p50': round(float(np.percentile(latencies_ms, 50)), 4),
+            'p95': round(float(np.percentile(latencies_ms, 95)), 4),
+            'p99': round(float(np.percentile(latencies_ms, 99)), 4),
+            'max': round(float(latencies_ms.max()), 4)
+        },
+        'batch_size': batch_size,
+        'batched': batch_fn is not None,
+        'throughput_rps': round(len(keys) / batch_seconds, 1) if batch_seconds > 0 else None
+    }
+
+
+def run_benchmarks(models=None, n_requests=1000, n_warmup=20, batch_size=256, seed=42,
+                   output_dir=DEFAULT_OUTPUT_DIR):
+    """Benchmark every model, each in its own spawned process, and write a JSON report"""
+    print("\n" + "="*60)
+    print("RECOMMENDATION BENCHMARK")
+    print("="*60 + "\n")
+
+    models = models or list(MODELS.keys())
+    results = []
+
+    ctx = mp.get_context('spawn')
+    for name in models:
+        print(f"[INFO] Benchmarking {name}...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            result = pool.submit(benchmark_model, name, n_requests, n_warmup, batch_size, seed).result()
+        results.append(result)
+
+        if result['status'] == 'ok':
+            print(f"[OK] {name}: load {result['cold_load_s']:.2f}s, "
+                  f"p50 {result['latency_ms']['p50']:.2f}ms, "
+                  f"p99 {result['latency_ms']['p99']:.2f}ms, "
+                  f"{result['throughput_rps']:,.0f} req/s")
+        else:
+            print(f"[SKIP] {name}: {result['reason']}")
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'config': {
+            'n_requests': n_requests,
+            'n_warmup': n_warmup,
+            'batch_size': batch_size,
+            'seed': seed
+        },
+        'results': results
+    }
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_file = output_dir / f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+
+    for path in (output_file, output_dir / "latest.json"):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    print(f"\n[OK] Results saved to {output_file}")
+    return report
+
+
+def compare_reports(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Compare two benchmark reports model by model
+
+    Returns:
+        list of regression messages (empty when nothing got worse than threshold)
+    """
+    base_by_model = {r['model']: r for r in baseline['results'] if r['status'] == 'ok'}
+    regressions = []
+
+    print("\n" + "="*60)
+    print("COMPARISON WITH BASELINE")
+    print("="*60 + "\n")
+
+    print(f"{'Model':<15} {'p95 ms':<22} {'req/s':<22} {'load s':<20}")
+    print("-" * 80)
+
+    for result in current['results']:
+        base = base_by_model.get(result['model'])
+        if result['status'] != 'ok' or base is None:
+            continue
+
+        p95, base_p95 = result['latency_ms']['p95'], base['latency_ms']['p95']
+        rps, base_rps = result['throughput_rps'], base['throughput_rps']
+        load, base_load = result['cold_load_s'], base['cold_load_s']
+
+        print(f"{result['model']:<15} "
+              f"{base_p95:>8.2f} -> {p95:<10.2f} "
+              f"{base_rps:>8,.0f} -> {rps:<10,.0f} "
+              f"{base_load:>6.2f} -> {load:<8.2f}")
+
+        if p95 > base_p95 * (1 + threshold) and p95 - base_p95 > MIN_LATENCY_DELTA_MS:
+            regressions.append(f"{result['model']}: p95 latency {base_p95:.2f}ms -> {p95:.2f}ms")
+        if base_rps and rps < base_rps * (1 - threshold):
+            regressions.append(f"{result['model']}: throughput {base_rps:,.0f} -> {rps:,.0f} req/s")
+
+    if regressions:
+        print("\n⚠️  Regressions:")
+        for message in regressions:
+            print(f"  - {message}")
+    else:
+        print("\n[OK] No regressions beyond threshold")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recommendation models")
+    parser.add_argument('--models', nargs='+', choices=list(MODELS.keys()), default=None)
+    parser.add_argument('--requests', type=int, default=1000, help="sampled requests per model")
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument('--baseline', default=None, help="previous report to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    report = run_benchmarks(
+        args.models, args.requests, args.warmup, args.batch_size, args.seed, args.output_dir
+    )
+
+    if baseline:
+        regressions = compare_reports(report, baseline)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
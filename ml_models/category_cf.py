@@ -4,9 +4,12 @@ from scipy.sparse import csr_matrix
 from sklearn.metrics.pairwise import cosine_similarity
 import psycopg2
 import pickle
-from pathlib import Path
 import os
 from dotenv import load_dotenv
+from data_backend import get_backend
+from event_types import VIEW, ADDTOCART, TRANSACTION, EVENT_WEIGHTS
+from response_cache import artifact_version, trained_version
+from model_registry import atomic_pickle, publish_model
 import warnings
 warnings.filterwarnings('ignore', category=UserWarning)
 
@@ -20,6 +23,68 @@ DB_CONFIG = {
     'port': os.getenv('DB_PORT')
 }
 
+def neighbor_category_scores(user_similarity, user_category_matrix, user_indices,
+                             n_neighbors=30, weighted=True, batch_size=128):
+    """
+    Score categories for many users at once from their nearest neighbors
+    
+    Replaces the per-user loop over similar users with one sparse
+    (neighbor weights x user-category) product per batch of users.
+    
+    Args:
+        user_similarity: sparse (n_users, n_users) similarity matrix
+        user_category_matrix: sparse (n_users, n_categories) score matrix
+        user_indices: matrix rows of the users to score
+        n_neighbors: number of most similar users to aggregate (self excluded)
+        weighted: weight each neighbor's categories by its similarity
+        batch_size: users per dense similarity block
+    
+    Returns:
+        (len(user_indices), n_categories) array of category scores
+    """
+    user_indices = np.asarray(user_indices, dtype=np.int64)
+    n_users = user_similarity.shape[0]
+    n_neighbors = min(n_neighbors, n_users - 1)
+    scores = np.zeros((len(user_indices), user_category_matrix.shape[1]))
+    
+    if n_neighbors <= 0 or len(user_indices) == 0:
+        return scores
+    
+    for start in range(0, len(user_indices), batch_size):
+        batch = user_indices[start:start + batch_size]
+        rows = np.arange(len(batch))
+        
+        sims = user_similarity[batch].toarray()
+        sims[rows, batch] = 0  # Exclude self
+        
+        # Top-N neighbors per user (unordered is fine, they are summed)
+        neighbors = np.argpartition(-sims, n_neighbors - 1, axis=1)[:, :n_neighbors]
+        weights = np.take_along_axis(sims, neighbors, axis=1)
+        weights = np.where(weights > 0, weights if weighted else 1.0, 0.0)
+        
+        neighbor_weights = csr_matrix(
+            (weights.ravel(), (np.repeat(rows, n_neighbors), neighbors.ravel())),
+            shape=(len(batch), n_users)
+        )
+        scores[start:start + len(batch)] = (neighbor_weights @ user_category_matrix).toarray()
+    
+    return scores
+
+
+def category_scores_to_items(category_scores, category_ids, category_popular_items,
+                             n_categories=5, items_per_category=10, n=10):
+    """Turn one user's category scores into a de-duplicated item list"""
+    recommendations = []
+    
+    for cat_idx in np.argsort(category_scores)[::-1][:n_categories]:
+        if category_scores[cat_idx] > 0:
+            cat_id = category_ids[cat_idx]
+            if cat_id in category_popular_items:
+                recommendations.extend(category_popular_items[cat_id][:items_per_category])
+    
+    return [int(item) for item in dict.fromkeys(recommendations)][:n]
+
+
 class CategoryCollaborativeFiltering:
     """
     Collaborative Filtering on CATEGORIES instead of items
@@ -36,49 +101,40 @@ class CategoryCollaborativeFiltering:
         self.user_ids = None
         self.category_ids = None
         self.category_popular_items = {}
+        self._user_index = None
+        # Changes on every train/load; response caches key on it
+        self.model_version = None
         
-    def train(self, use_train_set=True):
+    def train(self, use_train_set=True, backend=None):
         """
         Build category-based CF model
         
         Args:
             use_train_set: If True, use only train_set for proper evaluation
+            backend: data backend to query (default: get_backend(), i.e. DATA_BACKEND)
         """
         print("\n" + "="*60)
         print("CATEGORY-BASED COLLABORATIVE FILTERING")
         print("="*60 + "\n")
         
-        conn = psycopg2.connect(**DB_CONFIG)
+        backend = backend or get_backend()
         
         # Choose data source
         table_name = "train_set" if use_train_set else "events"
-        print(f"[INFO] Training on: {table_name}")
+        print(f"[INFO] Training on: {table_name} ({backend.name} backend)")
         
         # Get user-category interactions
         print("[1/5] Loading user-category interactions...")
-        interactions = pd.read_sql(f"""
-            SELECT 
-                e.visitorid,
-                ip.categoryid,
-                COUNT(*) as interaction_count,
-                SUM(CASE WHEN e.event = 'transaction' THEN 1 ELSE 0 END) as purchases,
-                SUM(CASE WHEN e.event = 'addtocart' THEN 1 ELSE 0 END) as carts,
-                SUM(CASE WHEN e.event = 'view' THEN 1 ELSE 0 END) as views
-            FROM {table_name} e
-            JOIN item_properties ip ON e.itemid = ip.itemid
-            WHERE ip.categoryid IS NOT NULL
-            GROUP BY e.visitorid, ip.categoryid
-            HAVING COUNT(*) >= 2
-        """, conn)
+        interactions = backend.user_category_interactions(table_name, min_interactions=2)
         
         print(f"[OK] Loaded {len(interactions):,} user-category pairs")
         
-        # Calculate weighted interaction score
+        # Calculate weighted interaction score (event_types.weight)
         print("\n[2/5] Calculating interaction scores...")
         interactions['score'] = (
-            interactions['purchases'] * 5 + 
-            interactions['carts'] * 3 + 
-            interactions['views'] * 1
+            interactions['purchases'] * EVENT_WEIGHTS[TRANSACTION] + 
+            interactions['carts'] * EVENT_WEIGHTS[ADDTOCART] + 
+            interactions['views'] * EVENT_WEIGHTS[VIEW]
         )
         
         # Build user-category matrix
@@ -92,6 +148,7 @@ class CategoryCollaborativeFiltering:
         self.user_ids = matrix.index.values
         self.category_ids = matrix.columns.values
         self.user_category_matrix = csr_matrix(matrix.values)
+        self._user_index = None
         
         sparsity = (1 - self.user_category_matrix.nnz / 
                    (self.user_category_matrix.shape[0] * self.user_category_matrix.shape[1])) * 100
@@ -107,39 +164,16 @@ class CategoryCollaborativeFiltering:
         
         print(f"[OK] Computed similarities for {len(self.user_ids):,} users")
         
-        # Get popular items per category (from train set only)
+        # Get popular items per category (from train set only), all categories in one query
         print("\n[5/5] Loading popular items per category...")
-        for cat_id in self.category_ids:
-            items = pd.read_sql(f"""
-                SELECT e.itemid, COUNT(*) as popularity
-                FROM {table_name} e
-                JOIN item_properties ip ON e.itemid = ip.itemid
-                WHERE ip.categoryid = {cat_id}
-                  AND e.event = 'transaction'
-                GROUP BY e.itemid
-                ORDER BY popularity DESC
-                LIMIT 30
-            """, conn)
-            
-            if len(items) > 0:
-                self.category_popular_items[int(cat_id)] = items['itemid'].tolist()
-            else:
-                # Fallback to views if no purchases
-                items = pd.read_sql(f"""
-                    SELECT e.itemid, COUNT(*) as popularity
-                    FROM {table_name} e
-                    JOIN item_properties ip ON e.itemid = ip.itemid
-                    WHERE ip.categoryid = {cat_id}
-                    GROUP BY e.itemid
-                    ORDER BY popularity DESC
-                    LIMIT 30
-                """, conn)
-                if len(items) > 0:
-                    self.category_popular_items[int(cat_id)] = items['itemid'].tolist()
+        top_items = backend.category_top_items(table_name, n=30)
+        top_items = top_items[top_items['categoryid'].isin(self.category_ids)]
         
-        print(f"[OK] Loaded top items for {len(self.category_popular_items)} categories")
+        for cat_id, items in top_items.groupby('categoryid', sort=False)['itemid']:
+            self.category_popular_items[int(cat_id)] = items.tolist()
         
-        conn.close()
+        print(f"[OK] Loaded top items for {len(self.category_popular_items)} categories")
+        self.model_version = trained_version()
         
         print("\n" + "="*60)
         print("[SUCCESS] Category CF trained!")
@@ -197,18 +231,49 @@ class CategoryCollaborativeFiltering:
         
         return final_recs[:n]
     
+    def user_rows(self, user_ids):
+        """Matrix row of each user id, -1 for users the model does not know"""
+        if self._user_index is None:
+            self._user_index = pd.Index(self.user_ids)
+        return self._user_index.get_indexer(user_ids)
+    
+    def recommend_batch(self, user_ids, n=10, n_neighbors=30):
+        """
+        Recommend for many users at once (same scoring as recommend; only
+        ties at the last neighbor slot may break differently)
+        
+        Neighbor category scores come from one sparse product per block of
+        users (neighbor_category_scores); each user's own categories are
+        excluded before picking items. Unknown users get [].
+        """
+        rows = self.user_rows(user_ids)
+        known = rows >= 0
+        recs = [[] for _ in range(len(rows))]
+        if not known.any():
+            return recs
+        
+        scores = neighbor_category_scores(
+            self.user_similarity, self.user_category_matrix, rows[known], n_neighbors=n_neighbors
+        )
+        own = self.user_category_matrix[rows[known]].toarray() > 0
+        scores[own] = -1
+        
+        for i, user_scores in zip(np.flatnonzero(known), scores):
+            recs[i] = category_scores_to_items(
+                user_scores, self.category_ids, self.category_popular_items,
+                n_categories=5, items_per_category=10, n=n
+            )
+        return recs
+    
     def save_model(self, filepath="data/models/category_cf.pkl"):
-        """Save trained model"""
-        Path(filepath).parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(filepath, 'wb') as f:
-            pickle.dump({
-                'user_category_matrix': self.user_category_matrix,
-                'user_similarity': self.user_similarity,
-                'user_ids': self.user_ids,
-                'category_ids': self.category_ids,
-                'category_popular_items': self.category_popular_items
-            }, f)
+        """Save trained model (written to a temp file and renamed into place)"""
+        atomic_pickle({
+            'user_category_matrix': self.user_category_matrix,
+            'user_similarity': self.user_similarity,
+            'user_ids': self.user_ids,
+            'category_ids': self.category_ids,
+            'category_popular_items': self.category_popular_items
+        }, filepath)
         
         print(f"[OK] Model saved to {filepath}")
     
@@ -222,6 +287,8 @@ class CategoryCollaborativeFiltering:
         self.user_ids = model_data['user_ids']
         self.category_ids = model_data['category_ids']
         self.category_popular_items = model_data['category_popular_items']
+        self._user_index = None
+        self.model_version = artifact_version(filepath)
         
         print(f"[OK] Model loaded from {filepath}")
 
@@ -233,7 +300,7 @@ def main():
     
     # IMPORTANT: Train on train_set only for proper evaluation
     model.train(use_train_set=True)
-    model.save_model()
+    publish_model(model, 'category_cf', legacy_filename='category_cf.pkl')
     
     # Test recommendations
     print("\n" + "="*60)
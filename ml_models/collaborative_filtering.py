@@ -7,6 +7,8 @@ import os
 from dotenv import load_dotenv
 import pickle
 from pathlib import Path
+from response_cache import artifact_version, trained_version
+from model_registry import atomic_pickle
 
 load_dotenv()
 
@@ -25,6 +27,8 @@ class CollaborativeFilteringModel:
         self.item_similarity = None
         self.user_ids = None
         self.item_ids = None
+        # Changes on every train/load; response caches key on it
+        self.model_version = None
         
     def load_data(self):
         """Load ONLY active buyers with sampling"""
@@ -34,12 +38,9 @@ class CollaborativeFilteringModel:
         SELECT 
             e.visitorid,
             e.itemid,
-            CASE 
-                WHEN e.event = 'transaction' THEN 5
-                WHEN e.event = 'addtocart' THEN 3
-                WHEN e.event = 'view' THEN 1
-            END as implicit_rating
+            et.weight as implicit_rating
         FROM events_train e
+        INNER JOIN event_types et ON et.event_code = e.event
         INNER JOIN user_features uf ON e.visitorid = uf.visitorid
         WHERE uf.user_segment IN ('converter', 'power_user')
         """
@@ -88,6 +89,7 @@ class CollaborativeFilteringModel:
         
         # Item-based CF (faster and often better than user-based)
         self.item_similarity = cosine_similarity(self.user_item_matrix.T, dense_output=False)
+        self.model_version = trained_version()
         
         print("[OK] Model trained")
     
@@ -130,10 +132,20 @@ class CollaborativeFilteringModel:
         }
         
         filepath = model_dir / "cf_model.pkl"
-        with open(filepath, 'wb') as f:
-            pickle.dump(model_data, f)
+        atomic_pickle(model_data, filepath)
         
         print(f"[OK] Model saved to {filepath}")
+    
+    def load_model(self, filepath="data/models/cf_model.pkl"):
+        """Load saved model"""
+        with open(filepath, 'rb') as f:
+            model_data = pickle.load(f)
+        
+        self.user_item_matrix = model_data['user_item_matrix']
+        self.item_similarity = model_data['item_similarity']
+        self.user_ids = model_data['user_ids']
+        self.item_ids = model_data['item_ids']
+        self.model_version = artifact_version(filepath)
 
 
 def main():
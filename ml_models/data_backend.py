@@ -0,0 +1,447 @@
+import pandas as pd
+import numpy as np
+import psycopg2
+import os
+import shutil
+from pathlib import Path
+from dotenv import load_dotenv
+from event_types import ADDTOCART, TRANSACTION, VIEW, EVENT_WEIGHTS
+import warnings
+warnings.filterwarnings("ignore", message="pandas only supports SQLAlchemy")
+
+load_dotenv()
+
+DB_CONFIG = {
+    'dbname': os.getenv('DB_NAME'),
+    'user': os.getenv('DB_USER'),
+    'password': os.getenv('DB_PASSWORD'),
+    'host': os.getenv('DB_HOST'),
+    'port': os.getenv('DB_PORT')
+}
+
+DEFAULT_PARQUET_DIR = "data/parquet"
+WEEK_MS = 7 * 24 * 60 * 60 * 1000
+
+# Event log aliases: train/test are the 80/20 time split of events
+EVENT_TABLES = ('events', 'train_set', 'test_set', 'events_train', 'events_test')
+TRAIN_FRACTION = 0.8
+
+
+class PostgresBackend:
+    """
+    Training queries against the PostgreSQL warehouse
+
+    Every method returns plain pandas/list results so the models do not
+    care which backend produced them.
+    """
+
+    name = 'postgres'
+
+    def __init__(self, db_config=None):
+        self.db_config = db_config or DB_CONFIG
+
+    def _query(self, sql):
+        conn = psycopg2.connect(**self.db_config)
+        try:
+            return pd.read_sql(sql, conn)
+        finally:
+            conn.close()
+
+    def feature_table(self, name, columns=None):
+        """A feature table (user_features / item_features) as a DataFrame"""
+        cols = ", ".join(columns) if columns else "*"
+        return self._query(f"SELECT {cols} FROM {name}")
+
+    def time_range(self, table="events"):
+        """(min_ts, max_ts) of an event table"""
+        df = self._query(f"SELECT MIN(timestamp) as min_ts, MAX(timestamp) as max_ts FROM {table}")
+        return int(df['min_ts'].iloc[0]), int(df['max_ts'].iloc[0])
+
+    def popular_items(self, n=100):
+        """Items with sales, ranked by popularity_score"""
+        return self._query(f"""
+            SELECT itemid, popularity_score, total_transactions
+            FROM item_features
+            WHERE total_transactions > 0
+            ORDER BY popularity_score DESC
+            LIMIT {n}
+        """)['itemid'].tolist()
+
+    def category_popular_items(self, n=30):
+        """Top n items with sales per category by popularity_score"""
+        return self._query(f"""
+            WITH ranked_items AS (
+                SELECT
+                    ip.categoryid,
+                    ip.itemid,
+                    if.popularity_score,
+                    ROW_NUMBER() OVER (PARTITION BY ip.categoryid ORDER BY if.popularity_score DESC) as rn
+                FROM item_properties ip
+                JOIN item_features if ON ip.itemid = if.itemid
+                WHERE ip.categoryid IS NOT NULL
+                  AND if.total_transactions > 0
+            )
+            SELECT categoryid, itemid
+            FROM ranked_items
+            WHERE rn <= {n}
+            ORDER BY categoryid, rn
+        """)
+
+    def trending_items(self, min_ts, max_ts, cutoff_ts, n=100):
+        """Time-weighted trending items since cutoff_ts"""
+        return self._query(f"""
+            SELECT
+                e.itemid,
+                SUM(et.weight * (e.timestamp - {min_ts}) / ({max_ts} - {min_ts} + 1)) as trending_score
+            FROM events e
+            JOIN event_types et ON et.event_code = e.event
+            WHERE e.timestamp >= {cutoff_ts}
+            GROUP BY e.itemid
+            HAVING SUM(et.weight) > 10
+            ORDER BY trending_score DESC
+            LIMIT {n}
+        """)['itemid'].tolist()
+
+    def category_trending_items(self, min_ts, max_ts, cutoff_ts, n=20):
+        """Top n time-weighted trending items per category since cutoff_ts"""
+        return self._query(f"""
+            WITH trending_scores AS (
+                SELECT
+                    ip.categoryid,
+                    e.itemid,
+                    SUM(et.weight * (e.timestamp - {min_ts}) / ({max_ts} - {min_ts} + 1)) as trending_score
+                FROM events e
+                JOIN event_types et ON et.event_code = e.event
+                JOIN item_properties ip ON e.itemid = ip.itemid
+                WHERE e.timestamp >= {cutoff_ts}
+                  AND ip.categoryid IS NOT NULL
+                GROUP BY ip.categoryid, e.itemid
+            ),
+            ranked AS (
+                SELECT
+                    categoryid,
+                    itemid,
+                    ROW_NUMBER() OVER (PARTITION BY categoryid ORDER BY trending_score DESC) as rn
+                FROM trending_scores
+            )
+            SELECT categoryid, itemid
+            FROM ranked
+            WHERE rn <= {n}
+            ORDER BY categoryid, rn
+        """)
+
+    def user_category_interactions(self, table="events", min_interactions=2):
+        """Per (visitor, category) event counts by type"""
+        return self._query(f"""
+            SELECT
+                e.visitorid,
+                ip.categoryid,
+                COUNT(*) as interaction_count,
+                COUNT(*) FILTER (WHERE e.event = {TRANSACTION}) as purchases,
+                COUNT(*) FILTER (WHERE e.event = {ADDTOCART}) as carts,
+                COUNT(*) FILTER (WHERE e.event = {VIEW}) as views
+            FROM {table} e
+            JOIN item_properties ip ON e.itemid = ip.itemid
+            WHERE ip.categoryid IS NOT NULL
+            GROUP BY e.visitorid, ip.categoryid
+            HAVING COUNT(*) >= {min_interactions}
+        """)
+
+    def category_top_items(self, table="events", n=30):
+        """
+        Top n items per category by purchases
+
+        Categories without any purchase fall back to ranking by event count.
+        """
+        return self._query(f"""
+            WITH item_counts AS (
+                SELECT
+                    ip.categoryid,
+                    e.itemid,
+                    COUNT(*) as popularity,
+                    COUNT(*) FILTER (WHERE e.event = {TRANSACTION}) as purchases
+                FROM {table} e
+                JOIN item_properties ip ON e.itemid = ip.itemid
+                WHERE ip.categoryid IS NOT NULL
+                GROUP BY ip.categoryid, e.itemid
+            ),
+            ranked AS (
+                SELECT
+                    categoryid,
+                    itemid,
+                    purchases,
+                    MAX(purchases) OVER (PARTITION BY categoryid) > 0 as has_purchases,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY categoryid
+                        ORDER BY purchases DESC, popularity DESC
+                    ) as purchase_rank,
+                    ROW_NUMBER() OVER (PARTITION BY categoryid ORDER BY popularity DESC) as popularity_rank
+                FROM item_counts
+            )
+            SELECT categoryid, itemid
+            FROM ranked
+            WHERE (has_purchases AND purchases > 0 AND purchase_rank <= {n})
+               OR (NOT has_purchases AND popularity_rank <= {n})
+            ORDER BY categoryid, CASE WHEN has_purchases THEN purchase_rank ELSE popularity_rank END
+        """)
+
+
+class ParquetBackend:
+    """
+    The same training queries over a local columnar copy of the warehouse
+
+    Layout under data_dir (written by export_postgres_to_parquet):
+        events/                  hive-partitioned by week (timestamp // WEEK_MS)
+        item_properties.parquet
+        item_features.parquet
+        user_features.parquet
+
+    Scans read only the needed columns and prune week partitions for
+    time-bounded queries; aggregation is vectorized pandas.
+    """
+
+    name = 'parquet'
+
+    def __init__(self, data_dir=DEFAULT_PARQUET_DIR):
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+
+        self.ds = ds
+        self.pc = pc
+        self.data_dir = Path(data_dir)
+
+        if not (self.data_dir / "events").exists():
+            raise FileNotFoundError(
+                f"No Parquet events under {self.data_dir}; run data_backend.py export first"
+            )
+
+        self._events = ds.dataset(self.data_dir / "events", format="parquet", partitioning="hive")
+        self._time_range = None
+
+    def _table(self, name, columns=None):
+        return pd.read_parquet(self.data_dir / f"{name}.parquet", columns=columns)
+
+    def events(self, table="events", columns=None, min_ts=None, max_ts=None):
+        """
+        Scan the event log (or its train/test split) for the given columns
+
+        Args:
+            table: one of EVENT_TABLES
+            min_ts, max_ts: optional [min_ts, max_ts) timestamp bounds
+        """
+        if table not in EVENT_TABLES:
+            raise ValueError(f"Unknown event table: {table}")
+
+        # train/test follow the same 80/20 time rule as create_train_test_split
+        if table != 'events':
+            first_ts, last_ts = self.time_range()
+            split_ts = first_ts + (last_ts - first_ts) * TRAIN_FRACTION
+            if table in ('train_set', 'events_train'):
+                max_ts = split_ts if max_ts is None else min(max_ts, split_ts)
+            else:
+                min_ts = split_ts if min_ts is None else max(min_ts, split_ts)
+
+        ds = self.ds
+        condition = None
+        if min_ts is not None:
+            condition = (ds.field('timestamp') >= min_ts) & (ds.field('week') >= int(min_ts // WEEK_MS))
+        if max_ts is not None:
+            upper = (ds.field('timestamp') < max_ts) & (ds.field('week') <= int(max_ts // WEEK_MS))
+            condition = upper if condition is None else condition & upper
+
+        return self._events.to_table(columns=columns, filter=condition).to_pandas()
+
+    def feature_table(self, name, columns=None):
+        """A feature table (user_features / item_features) as a DataFrame"""
+        return self._table(name, columns=columns)
+
+    def _item_categories(self):
+        categories = self._table("item_properties", columns=['itemid', 'categoryid'])
+        return categories.dropna(subset=['categoryid']).astype({'categoryid': 'int64'})
+
+    def time_range(self, table="events"):
+        """(min_ts, max_ts) of the event log"""
+        if self._time_range is None:
+            ts = self._events.to_table(columns=['timestamp']).column('timestamp')
+            bounds = self.pc.min_max(ts).as_py()
+            self._time_range = (int(bounds['min']), int(bounds['max']))
+        return self._time_range
+
+    def popular_items(self, n=100):
+        """Items with sales, ranked by popularity_score"""
+        features = self._table("item_features", columns=['itemid', 'popularity_score', 'total_transactions'])
+        features = features[features['total_transactions'] > 0]
+        return features.nlargest(n, 'popularity_score')['itemid'].tolist()
+
+    def category_popular_items(self, n=30):
+        """Top n items with sales per category by popularity_score"""
+        features = self._table("item_features", columns=['itemid', 'popularity_score', 'total_transactions'])
+        features = features[features['total_transactions'] > 0]
+        ranked = self._item_categories().merge(features, on='itemid')
+        return _top_n_per_group(ranked, 'categoryid', 'popularity_score', n)[['categoryid', 'itemid']]
+
+    def _trending_scores(self, min_ts, max_ts, cutoff_ts):
+        events = self.events(columns=['itemid', 'event', 'timestamp'], min_ts=cutoff_ts)
+        weights = _event_weights(events['event'])
+        # Integer arithmetic on purpose: mirrors the BIGINT division in the SQL query
+        events['score'] = weights * (events['timestamp'].values - min_ts) // (max_ts - min_ts + 1)
+        events['weight'] = weights
+        return events
+
+    def trending_items(self, min_ts, max_ts, cutoff_ts, n=100):
+        """Time-weighted trending items since cutoff_ts"""
+        events = self._trending_scores(min_ts, max_ts, cutoff_ts)
+        scores = events.groupby('itemid').agg(trending_score=('score', 'sum'), weight=('weight', 'sum'))
+        scores = scores[scores['weight'] > 10]
+        return scores.nlargest(n, 'trending_score').index.tolist()
+
+    def category_trending_items(self, min_ts, max_ts, cutoff_ts, n=20):
+        """Top n time-weighted trending items per category since cutoff_ts"""
+        events = self._trending_scores(min_ts, max_ts, cutoff_ts)
+        scores = events.groupby('itemid', as_index=False)['score'].sum()
+        scores = self._item_categories().merge(scores, on='itemid')
+        return _top_n_per_group(scores, 'categoryid', 'score', n)[['categoryid', 'itemid']]
+
+    def user_category_interactions(self, table="events", min_interactions=2):
+        """Per (visitor, category) event counts by type"""
+        events = self.events(table, columns=['visitorid', 'itemid', 'event'])
+        events = events.merge(self._item_categories(), on='itemid')
+
+        counts = (
+            events.groupby(['visitorid', 'categoryid', 'event'])
+            .size()
+            .unstack('event', fill_value=0)
+            .reindex(columns=[TRANSACTION, ADDTOCART, VIEW], fill_value=0)
+        )
+        counts.columns = ['purchases', 'carts', 'views']
+        counts['interaction_count'] = counts.sum(axis=1)
+        counts = counts[counts['interaction_count'] >= min_interactions].reset_index()
+
+        return counts[['visitorid', 'categoryid', 'interaction_count', 'purchases', 'carts', 'views']]
+
+    def category_top_items(self, table="events", n=30):
+        """
+        Top n items per category by purchases
+
+        Categories without any purchase fall back to ranking by event count.
+        """
+        events = self.events(table, columns=['itemid', 'event'])
+        events['purchase'] = (events['event'] == TRANSACTION).astype(np.int64)
+
+        counts = events.groupby('itemid').agg(popularity=('purchase', 'size'), purchases=('purchase', 'sum'))
+        counts = self._item_categories().merge(counts.reset_index(), on='itemid')
+
+        has_purchases = counts.groupby('categoryid')['purchases'].transform('max') > 0
+        by_purchases = counts[has_purchases & (counts['purchases'] > 0)]
+        by_popularity = counts[~has_purchases]
+
+        return pd.concat([
+            _top_n_per_group(by_purchases, 'categoryid', ['purchases', 'popularity'], n),
+            _top_n_per_group(by_popularity, 'categoryid', 'popularity', n)
+        ])[['categoryid', 'itemid']]
+
+
+# event code -> weight, as an array for vectorized lookup
+_WEIGHT_LOOKUP = np.zeros(max(EVENT_WEIGHTS) + 1, dtype=np.int64)
+_WEIGHT_LOOKUP[list(EVENT_WEIGHTS)] = list(EVENT_WEIGHTS.values())
+
+
+def _event_weights(event):
+    """Interaction weight per event code (event_types.weight)"""
+    return _WEIGHT_LOOKUP[event.to_numpy()]
+
+
+def _top_n_per_group(df, group_col, score_cols, n):
+    """Rows sorted by group then score (descending), keeping n per group"""
+    score_cols = [score_cols] if isinstance(score_cols, str) else list(score_cols)
+    ranked = df.sort_values([group_col] + score_cols, ascending=[True] + [False] * len(score_cols))
+    return ranked[ranked.groupby(group_col).cumcount() < n]
+
+
+def get_backend(name=None, **kwargs):
+    """
+    Backend selected by name or the DATA_BACKEND env var (default: postgres)
+
+    Parquet location can be set with PARQUET_DIR.
+    """
+    name = (name or os.getenv('DATA_BACKEND', 'postgres')).lower()
+
+    if name == 'postgres':
+        return PostgresBackend(**kwargs)
+    if name == 'parquet':
+        kwargs.setdefault('data_dir', os.getenv('PARQUET_DIR', DEFAULT_PARQUET_DIR))
+        return ParquetBackend(**kwargs)
+
+    raise ValueError(f"Unknown data backend: {name}")
+
+
+def export_postgres_to_parquet(data_dir=DEFAULT_PARQUET_DIR, chunk_rows=1_000_000):
+    """
+    Copy the warehouse tables needed for training into the Parquet layout
+
+    Events are streamed with a server-side cursor and written per chunk into
+    week partitions, so memory stays bounded by chunk_rows.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    print("\n" + "="*60)
+    print("EXPORTING POSTGRESQL TO PARQUET")
+    print("="*60 + "\n")
+
+    data_dir = Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    conn = psycopg2.connect(**DB_CONFIG)
+
+    # Events, partitioned by week
+    print("[1/2] Exporting events...")
+    cursor = conn.cursor(name="export_events")
+    cursor.itersize = chunk_rows
+    cursor.execute("SELECT timestamp, visitorid, event, itemid, transactionid FROM events")
+
+    # Start from an empty directory so partitions from an older export cannot linger
+    shutil.rmtree(data_dir / "events", ignore_errors=True)
+
+    total = 0
+    part = 0
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+
+        chunk = pd.DataFrame(rows, columns=['timestamp', 'visitorid', 'event', 'itemid', 'transactionid'])
+        chunk['event'] = chunk['event'].astype('int16')
+        chunk['itemid'] = chunk['itemid'].astype('int32')
+        chunk['week'] = (chunk['timestamp'] // WEEK_MS).astype('int32')
+
+        ds.write_dataset(
+            pa.Table.from_pandas(chunk, preserve_index=False),
+            data_dir / "events",
+            format="parquet",
+            partitioning=["week"],
+            partitioning_flavor="hive",
+            basename_template=f"part-{part}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore"
+        )
+        total += len(chunk)
+        part += 1
+
+    cursor.close()
+    print(f"[OK] Exported {total:,} events")
+
+    # Dimension / feature tables (small enough to read at once)
+    print("\n[2/2] Exporting item, user and session tables...")
+    for table in ['item_properties', 'item_features', 'user_features', 'sessions']:
+        df = pd.read_sql(f"SELECT * FROM {table}", conn)
+        df.to_parquet(data_dir / f"{table}.parquet", index=False)
+        print(f"[OK] Exported {len(df):,} rows from {table}")
+
+    conn.close()
+
+    print("\n" + "="*60)
+    print(f"[SUCCESS] Parquet copy written to {data_dir}")
+    print("="*60 + "\n")
+
+
+if __name__ == "__main__":
+    export_postgres_to_parquet()
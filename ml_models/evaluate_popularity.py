@@ -2,8 +2,11 @@ import pandas as pd
 import numpy as np
 import psycopg2
 import pickle
+import time
 import os
 from dotenv import load_dotenv
+from ranking_metrics import build_rec_matrix, hits_at_k
+from event_types import TRANSACTION
 
 load_dotenv()
 
@@ -27,57 +30,51 @@ def evaluate():
     print("EVALUATING POPULARITY RECOMMENDER")
     print("="*60 + "\n")
     
+    started = time.perf_counter()
+    
     # Load model
     model_data = load_model()
     
-    # Load test purchases
+    # Load test purchases together with each buyer's favorite category
+    # (one set-based query instead of a round trip per user)
     conn = psycopg2.connect(**DB_CONFIG)
-    test_df = pd.read_sql("""
-        SELECT visitorid, itemid
-        FROM events_test
-        WHERE event = 'transaction'
+    test_df = pd.read_sql(f"""
+        SELECT t.visitorid, t.itemid, uf.favorite_category
+        FROM events_test t
+        LEFT JOIN user_features uf ON t.visitorid = uf.visitorid
+        WHERE t.event = {TRANSACTION}
     """, conn)
+    conn.close()
     
     print(f"[INFO] Test purchases: {len(test_df):,}")
     
-    # Group by user
-    test_by_user = test_df.groupby('visitorid')['itemid'].apply(list).to_dict()
-    print(f"[INFO] Test users: {len(test_by_user):,}\n")
+    # One row per distinct (user, item) pair
+    test_df = test_df.drop_duplicates(subset=['visitorid', 'itemid'])
+    user_index, user_ids = pd.factorize(test_df['visitorid'])
+    print(f"[INFO] Test users: {len(user_ids):,}\n")
     
-    # Evaluate
-    hit_rates_5 = []
-    hit_rates_10 = []
-    precisions_10 = []
+    # Recommendation table: row 0 = overall popular, then one row per category
+    categories = list(model_data['category_popular'].keys())
+    rec_table = build_rec_matrix(
+        [model_data['popular_items']] + [model_data['category_popular'][c] for c in categories],
+        10
+    )
+    category_row = {cat_id: row + 1 for row, cat_id in enumerate(categories)}
     
-    for user_id, actual_items in test_by_user.items():
-        # Get user's favorite category
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT favorite_category 
-            FROM user_features 
-            WHERE visitorid = %s
-        """, (user_id,))
-        result = cursor.fetchone()
-        
-        # Get recommendations
-        if result and result[0] is not None and result[0] in model_data['category_popular']:
-            recs = model_data['category_popular'][result[0]][:10]
-        else:
-            recs = model_data['popular_items'][:10]
-        
-        # Calculate metrics
-        hits_5 = len(set(recs[:5]) & set(actual_items))
-        hits_10 = len(set(recs[:10]) & set(actual_items))
-        
-        hr_5 = 1.0 if hits_5 > 0 else 0.0
-        hr_10 = 1.0 if hits_10 > 0 else 0.0
-        prec_10 = hits_10 / 10.0
-        
-        hit_rates_5.append(hr_5)
-        hit_rates_10.append(hr_10)
-        precisions_10.append(prec_10)
+    # Map every user to the row of their favorite category (or the overall list)
+    user_favorites = (
+        test_df.groupby(user_index)['favorite_category'].first()
+        .reindex(range(len(user_ids)))
+    )
+    user_rows = user_favorites.map(category_row).fillna(0).astype(np.int64).values
+    rec_matrix = rec_table[user_rows]
     
-    conn.close()
+    # Calculate metrics
+    hits = hits_at_k(rec_matrix, user_index, test_df['itemid'].values, ks=(5, 10))
+    
+    hit_rates_5 = (hits[5] > 0).astype(float)
+    hit_rates_10 = (hits[10] > 0).astype(float)
+    precisions_10 = hits[10] / 10.0
     
     # Results
     print("="*60)
@@ -101,7 +98,8 @@ def evaluate():
         print(f"\n✗ Hit Rate ({hr*100:.1f}%): POOR")
     
     print("\nCoverage: 100% of users")
-    print("Latency: <50ms")
+    print(f"Evaluation time: {time.perf_counter() - started:.2f}s")
+    print("Serving latency: see ml_models/benchmark.py")
     print("\n" + "="*60 + "\n")
 
 if __name__ == "__main__":
@@ -5,6 +5,10 @@ import pickle
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from category_cf import neighbor_category_scores, category_scores_to_items
+from ranking_metrics import build_rec_matrix, hits_at_k
+from event_types import ADDTOCART, TRANSACTION
+import ab_simulation
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -42,11 +46,13 @@ class ModelEvaluator:
         
         conn = psycopg2.connect(**DB_CONFIG)
         
-        self.test_data = pd.read_sql("""
-            SELECT visitorid, itemid, event
-            FROM test_set
-            WHERE event IN ('addtocart', 'transaction')
-            ORDER BY visitorid, timestamp
+        self.test_data = pd.read_sql(f"""
+            SELECT t.visitorid, t.itemid, t.event,
+                   COALESCE(uf.user_segment, 'unknown') as user_segment
+            FROM test_set t
+            LEFT JOIN user_features uf ON t.visitorid = uf.visitorid
+            WHERE t.event IN ({ADDTOCART}, {TRANSACTION})
+            ORDER BY t.visitorid, t.timestamp
         """, conn)
         
         conn.close()
@@ -94,145 +100,142 @@ class ModelEvaluator:
         hits = sum(1 for item in top_k if item in true_items)
         return hits / len(top_k)
     
-    def evaluate_popularity(self, k=10):
-        """Evaluate popularity recommender"""
-        print("\n[1/3] Evaluating Popularity Model...")
-        
-        model = self.models.get('Popularity')
-        if not model:
-            return {}
+    def recommend_all(self, model_name, user_ids, max_k):
+        """
+        Run a model's inference once for every test user at max_k
         
-        hits = 0
-        precisions = []
+        Returns:
+            covered: boolean mask of users the model can serve
+            rec_matrix: (n_users, max_k) itemids, padded with -1
+        """
+        model = self.models.get(model_name)
+        n_users = len(user_ids)
+        
+        if model_name == 'Popularity':
+            recs = build_rec_matrix([model['popular_items']], max_k)
+            return np.ones(n_users, dtype=bool), np.broadcast_to(recs, (n_users, max_k))
+        
+        if model_name == 'Trending':
+            recs = build_rec_matrix([model['trending_items']], max_k)
+            return np.ones(n_users, dtype=bool), np.broadcast_to(recs, (n_users, max_k))
+        
+        if model_name == 'Category_CF':
+            in_model, cf_recs = self.category_cf_recs(
+                user_ids, k=max_k, n_neighbors=10, weighted=True, n_categories=5, items_per_category=5
+            )
+            rec_matrix = np.full((n_users, max_k), -1, dtype=np.int64)
+            rec_matrix[in_model] = build_rec_matrix(cf_recs, max_k)
+            return in_model, rec_matrix
+        
+        raise ValueError(f"Unknown model: {model_name}")
+    
+    def compute_metrics(self, rec_matrix, covered, user_index, item_ids, ks, user_mask=None):
+        """
+        Hit rate, precision and coverage for every k from one top-k matrix
         
-        for user_id, group in self.test_data.groupby('visitorid'):
-            true_items = group['itemid'].tolist()
-            
-            # Get recommendations (popularity is same for everyone)
-            recs = model['popular_items'][:k]
-            
-            hits += self.hit_rate_at_k(recs, true_items, k)
-            precisions.append(self.precision_at_k(recs, true_items, k))
+        Hit rate is averaged over covered users, precision over users that
+        received at least one recommendation (divided by the list length).
+        """
+        hits = hits_at_k(rec_matrix, user_index, item_ids, ks)
         
-        return {
-            'hit_rate': hits / len(self.test_data['visitorid'].unique()),
-            'precision': np.mean(precisions),
-            'coverage': 1.0  # Works for all users
-        }
-    
-    def evaluate_trending(self, k=10):
-        """Evaluate trending model"""
-        print("\n[2/3] Evaluating Trending Model...")
+        if user_mask is None:
+            user_mask = np.ones(len(covered), dtype=bool)
         
-        model = self.models.get('Trending')
-        if not model or not model['trending_items']:
-            return {}
+        evaluated = covered & user_mask
+        n_users = int(user_mask.sum())
         
-        hits = 0
-        precisions = []
+        metrics = {
+            'users': n_users,
+            'coverage': float(evaluated.sum() / n_users) if n_users else 0.0,
+            'at_k': {}
+        }
         
-        for user_id, group in self.test_data.groupby('visitorid'):
-            true_items = group['itemid'].tolist()
+        for k in ks:
+            rec_len = (rec_matrix[:, :k] >= 0).sum(axis=1)
+            with_recs = evaluated & (rec_len > 0)
             
-            recs = model['trending_items'][:k]
-            
-            hits += self.hit_rate_at_k(recs, true_items, k)
-            precisions.append(self.precision_at_k(recs, true_items, k))
+            metrics['at_k'][str(k)] = {
+                'hit_rate': float(np.mean(hits[k][evaluated] > 0)) if evaluated.any() else 0.0,
+                'precision': float(np.mean(hits[k][with_recs] / rec_len[with_recs])) if with_recs.any() else 0.0
+            }
         
-        return {
-            'hit_rate': hits / len(self.test_data['visitorid'].unique()),
-            'precision': np.mean(precisions),
-            'coverage': 1.0  # Works for all users
-        }
+        return metrics
     
-    def evaluate_category_cf(self, k=10):
-        """Evaluate category CF"""
-        print("\n[3/3] Evaluating Category CF...")
+    def evaluate_model(self, model_name, ks=(5, 10, 20), primary_k=10):
+        """
+        Evaluate one model at all ks and per user segment in a single pass
         
-        model = self.models.get('Category_CF')
+        Inference runs once at max(ks); every cutoff and segment breakdown
+        is sliced from the same top-k array.
+        """
+        model = self.models.get(model_name)
         if not model:
-            print("[SKIP] Category CF model not loaded")
+            print(f"[SKIP] {model_name} model not loaded")
             return {}
         
-        # Check if model has required data
-        if 'user_ids' not in model or model['user_ids'] is None:
-            print("[SKIP] Category CF model has no user data")
+        if model_name == 'Trending' and not model['trending_items']:
             return {}
         
-        hits = 0
-        precisions = []
-        users_with_recs = 0
-        total_users = 0
-        
-        for user_id, group in self.test_data.groupby('visitorid'):
-            total_users += 1
-            
-            # Check if user exists in model
-            if user_id not in model['user_ids']:
-                continue
-            
-            users_with_recs += 1
-            true_items = group['itemid'].tolist()
-            
-            # Get user index
-            user_idx = np.where(model['user_ids'] == user_id)[0][0]
-            
-            # Get similar users (top 10)
-            user_sims = model['user_similarity'][user_idx].toarray().flatten()
-            similar_users = np.argsort(user_sims)[::-1][1:11]  # Exclude self
-            
-            # Aggregate category scores from similar users
-            category_scores = np.zeros(len(model['category_ids']))
-            for sim_idx in similar_users:
-                if user_sims[sim_idx] > 0:
-                    category_scores += model['user_category_matrix'][sim_idx].toarray().flatten() * user_sims[sim_idx]
-            
-            # Get top categories
-            top_cat_indices = np.argsort(category_scores)[::-1][:5]
-            
-            # Get items from those categories
-            recs = []
-            for cat_idx in top_cat_indices:
-                if category_scores[cat_idx] > 0:
-                    cat_id = model['category_ids'][cat_idx]
-                    if cat_id in model['category_popular_items']:
-                        items = model['category_popular_items'][cat_id][:5]
-                        recs.extend([int(item) for item in items])
-            
-            # Remove duplicates while preserving order
-            seen = set()
-            final_recs = []
-            for item in recs:
-                if item not in seen:
-                    seen.add(item)
-                    final_recs.append(item)
-            
-            final_recs = final_recs[:k]
-            
-            if final_recs:
-                hits += self.hit_rate_at_k(final_recs, true_items, k)
-                precisions.append(self.precision_at_k(final_recs, true_items, k))
-        
-        if users_with_recs == 0:
-            print("[SKIP] No test users found in Category CF model")
-            return {
-                'hit_rate': 0,
-                'precision': 0,
-                'coverage': 0
-            }
+        if model_name == 'Category_CF' and model.get('user_ids') is None:
+            print("[SKIP] Category CF model has no user data")
+            return {}
         
-        coverage = users_with_recs / total_users
+        ks = sorted(set(ks) | {primary_k})
+        user_index, user_ids, item_ids = self.test_pairs()
+        
+        covered, rec_matrix = self.recommend_all(model_name, user_ids, max(ks))
+        
+        overall = self.compute_metrics(rec_matrix, covered, user_index, item_ids, ks)
+        
+        # Segment breakdowns from user_features.user_segment
+        user_segments = (
+            self.test_data.drop_duplicates(subset='visitorid')
+            .set_index('visitorid')['user_segment']
+            .reindex(user_ids)
+            .values
+        )
+        segments = {
+            segment: self.compute_metrics(
+                rec_matrix, covered, user_index, item_ids, ks, user_mask=(user_segments == segment)
+            )
+            for segment in sorted(set(user_segments))
+        }
         
-        print(f"[OK] Evaluated {users_with_recs}/{total_users} users ({coverage:.1%} coverage)")
+        print(f"[OK] Evaluated {int(covered.sum()):,}/{len(user_ids):,} users "
+              f"({overall['coverage']:.1%} coverage) at k={ks}")
         
         return {
-            'hit_rate': hits / users_with_recs if users_with_recs > 0 else 0,
-            'precision': np.mean(precisions) if precisions else 0,
-            'coverage': coverage
+            'hit_rate': overall['at_k'][str(primary_k)]['hit_rate'],
+            'precision': overall['at_k'][str(primary_k)]['precision'],
+            'coverage': overall['coverage'],
+            'k': primary_k,
+            'at_k': overall['at_k'],
+            'segments': segments
         }
     
-    def run_evaluation(self, k=10):
-        """Run full evaluation"""
+    def evaluate_popularity(self, k=10):
+        """Evaluate popularity recommender"""
+        print("\n[1/3] Evaluating Popularity Model...")
+        return self.evaluate_model('Popularity', ks=(k,), primary_k=k)
+    
+    def evaluate_trending(self, k=10):
+        """Evaluate trending model"""
+        print("\n[2/3] Evaluating Trending Model...")
+        return self.evaluate_model('Trending', ks=(k,), primary_k=k)
+    
+    def evaluate_category_cf(self, k=10):
+        """Evaluate category CF"""
+        print("\n[3/3] Evaluating Category CF...")
+        return self.evaluate_model('Category_CF', ks=(k,), primary_k=k)
+    
+    def run_evaluation(self, k=10, ks=(5, 10, 20)):
+        """
+        Run full evaluation
+        
+        Args:
+            k: headline cutoff reported as hit_rate/precision
+            ks: every cutoff computed from the same inference pass
+        """
         print("\n" + "="*60)
         print("MODEL EVALUATION")
         print("="*60)
@@ -244,9 +247,9 @@ class ModelEvaluator:
         print("COMPUTING METRICS")
         print("="*60)
         
-        self.results['Popularity'] = self.evaluate_popularity(k)
-        self.results['Trending'] = self.evaluate_trending(k)
-        self.results['Category_CF'] = self.evaluate_category_cf(k)
+        for i, model_name in enumerate(['Popularity', 'Trending', 'Category_CF']):
+            print(f"\n[{i + 1}/3] Evaluating {model_name}...")
+            self.results[model_name] = self.evaluate_model(model_name, ks=ks, primary_k=k)
         
         self.print_results()
         self.save_results()
@@ -257,7 +260,9 @@ class ModelEvaluator:
         print("RESULTS COMPARISON")
         print("="*60 + "\n")
         
-        print(f"{'Model':<20} {'Hit Rate@10':<15} {'Precision@10':<15} {'Coverage':<10}")
+        k = next((m['k'] for m in self.results.values() if m), 10)
+        
+        print(f"{'Model':<20} {f'Hit Rate@{k}':<15} {f'Precision@{k}':<15} {'Coverage':<10}")
         print("-" * 60)
         
         for model_name, metrics in self.results.items():
@@ -273,6 +278,21 @@ class ModelEvaluator:
             else:
                 print(f"{model_name:<20} {'N/A':<15} {'N/A':<15} {'N/A':<10}")
         
+        # All cutoffs
+        print(f"\n{'Model':<20} {'K':<5} {'Hit Rate':<12} {'Precision':<12}")
+        print("-" * 60)
+        for model_name, metrics in self.results.items():
+            for cutoff, at_k in (metrics or {}).get('at_k', {}).items():
+                print(f"{model_name:<20} {cutoff:<5} {at_k['hit_rate']:>8.2%}    {at_k['precision']:>8.2%}")
+        
+        # Segment breakdown at the headline k
+        print(f"\n{'Model':<20} {'Segment':<12} {'Users':<10} {f'Hit Rate@{k}':<15} {'Coverage':<10}")
+        print("-" * 60)
+        for model_name, metrics in self.results.items():
+            for segment, seg in (metrics or {}).get('segments', {}).items():
+                print(f"{model_name:<20} {segment:<12} {seg['users']:<10,} "
+                      f"{seg['at_k'][str(k)]['hit_rate']:>8.2%}       {seg['coverage']:>6.2%}")
+        
         print("\n" + "="*60)
         
         # Best model
@@ -282,8 +302,8 @@ class ModelEvaluator:
             best_model = max(valid_results.items(), key=lambda x: x[1].get('hit_rate', 0))
             
             print(f"\n🏆 BEST MODEL: {best_model[0]}")
-            print(f"   Hit Rate@10: {best_model[1]['hit_rate']:.2%}")
-            print(f"   Precision@10: {best_model[1]['precision']:.2%}")
+            print(f"   Hit Rate@{k}: {best_model[1]['hit_rate']:.2%}")
+            print(f"   Precision@{k}: {best_model[1]['precision']:.2%}")
             print(f"   Coverage: {best_model[1]['coverage']:.2%}")
         else:
             print("\n⚠️  No valid results to compare")
@@ -299,11 +319,63 @@ class ModelEvaluator:
         
         print(f"\n[OK] Results saved to {output_file}")
     
-    def simulate_ab_test(self):
+    def test_pairs(self):
+        """
+        De-duplicated (user, true item) pairs of the test set
+        
+        Returns:
+            user_index: row of each pair's user in user_ids
+            user_ids: distinct test users
+            item_ids: true item of each pair
+        """
+        pairs = self.test_data.drop_duplicates(subset=['visitorid', 'itemid'])
+        user_index, user_ids = pd.factorize(pairs['visitorid'])
+        return user_index, np.asarray(user_ids), pairs['itemid'].values
+    
+    def category_cf_recs(self, user_ids, k=10, n_neighbors=10, weighted=True,
+                         n_categories=5, items_per_category=5):
+        """
+        Batched Category CF recommendations for many users
+        
+        Returns:
+            in_model: boolean mask over user_ids of users known to the model
+            recs: recommendation lists for the users in the model, in order
+        """
+        model = self.models['Category_CF']
+        
+        user_rows = pd.Index(model['user_ids']).get_indexer(user_ids)
+        in_model = user_rows >= 0
+        
+        scores = neighbor_category_scores(
+            model['user_similarity'],
+            model['user_category_matrix'],
+            user_rows[in_model],
+            n_neighbors=n_neighbors,
+            weighted=weighted
+        )
+        
+        recs = [
+            category_scores_to_items(
+                user_scores,
+                model['category_ids'],
+                model['category_popular_items'],
+                n_categories=n_categories,
+                items_per_category=items_per_category,
+                n=k
+            )
+            for user_scores in scores
+        ]
+        
+        return in_model, recs
+    
+    def simulate_ab_test(self, n_resamples=10000, n_jobs=1):
         """
         Simulate A/B test: Popularity vs Category CF
         
         Measures: Click-through rate on recommendations
+        
+        Per-user hit vectors are computed once, then significance comes from
+        a chi-square test, bootstrap lift CIs and a permutation p-value.
         """
         print("\n" + "="*60)
         print("A/B TEST SIMULATION")
@@ -312,14 +384,6 @@ class ModelEvaluator:
         print("Scenario: Popularity (Control) vs Category CF (Treatment)")
         print("Metric: Recommendation relevance (hit rate)\n")
         
-        # Control: Popularity recommendations
-        control_hits = 0
-        control_total = 0
-        
-        # Treatment: Category CF recommendations
-        treatment_hits = 0
-        treatment_total = 0
-        
         pop_model = self.models['Popularity']
         cf_model = self.models.get('Category_CF')
         
@@ -327,52 +391,36 @@ class ModelEvaluator:
             print("[ERROR] Category CF model not available")
             return
         
-        # Simulate for users who exist in both
-        for user_id, group in self.test_data.groupby('visitorid'):
-            true_items = group['itemid'].tolist()
-            
-            # Control group: Popularity
-            pop_recs = pop_model['popular_items'][:10]
-            control_total += 1
-            if any(item in pop_recs for item in true_items):
-                control_hits += 1
-            
-            # Treatment group: Category CF (only for users in the model)
-            if user_id in cf_model['user_ids']:
-                treatment_total += 1
-                
-                # Get user index
-                user_idx = np.where(cf_model['user_ids'] == user_id)[0][0]
-                
-                # Get similar users
-                user_sims = cf_model['user_similarity'][user_idx].toarray().flatten()
-                similar_users = np.argsort(user_sims)[::-1][1:11]
-                
-                # Get category scores
-                category_scores = np.zeros(len(cf_model['category_ids']))
-                for sim_idx in similar_users:
-                    if user_sims[sim_idx] > 0:
-                        category_scores += cf_model['user_category_matrix'][sim_idx].toarray().flatten()
-                
-                # Get top categories
-                top_cats = np.argsort(category_scores)[::-1][:3]
-                
-                # Get recommendations
-                cf_recs = []
-                for cat_idx in top_cats:
-                    if category_scores[cat_idx] > 0:
-                        cat_id = cf_model['category_ids'][cat_idx]
-                        if cat_id in cf_model['category_popular_items']:
-                            cf_recs.extend(cf_model['category_popular_items'][cat_id][:5])
-                
-                cf_recs = list(dict.fromkeys(cf_recs))[:10]
-                
-                if any(item in cf_recs for item in true_items):
-                    treatment_hits += 1
+        user_index, user_ids, item_ids = self.test_pairs()
+        
+        # Control group: Popularity (same list for every user)
+        pop_recs = build_rec_matrix([pop_model['popular_items']], 10)
+        control_hits = hits_at_k(
+            np.broadcast_to(pop_recs, (len(user_ids), 10)), user_index, item_ids, ks=(10,)
+        )[10] > 0
+        
+        # Treatment group: Category CF (only for users in the model)
+        in_model, cf_recs = self.category_cf_recs(
+            user_ids, k=10, n_neighbors=10, weighted=False, n_categories=3, items_per_category=5
+        )
+        treatment_rows = np.full(len(user_ids), -1)
+        treatment_rows[in_model] = np.arange(in_model.sum())
+        treatment_pairs = in_model[user_index]
+        treatment_hits = hits_at_k(
+            build_rec_matrix(cf_recs, 10),
+            treatment_rows[user_index[treatment_pairs]],
+            item_ids[treatment_pairs],
+            ks=(10,)
+        )[10] > 0
+        
+        control_total = len(control_hits)
+        control_hits_count = int(control_hits.sum())
+        treatment_total = len(treatment_hits)
+        treatment_hits_count = int(treatment_hits.sum())
         
         # Calculate metrics
-        control_hit_rate = control_hits / control_total if control_total > 0 else 0
-        treatment_hit_rate = treatment_hits / treatment_total if treatment_total > 0 else 0
+        control_hit_rate = control_hits_count / control_total if control_total > 0 else 0
+        treatment_hit_rate = treatment_hits_count / treatment_total if treatment_total > 0 else 0
         
         # Calculate uplift
         uplift = ((treatment_hit_rate - control_hit_rate) / control_hit_rate * 100) if control_hit_rate > 0 else 0
@@ -381,27 +429,37 @@ class ModelEvaluator:
         from scipy import stats
         
         contingency_table = [
-            [treatment_hits, treatment_total - treatment_hits],
-            [control_hits, control_total - control_hits]
+            [treatment_hits_count, treatment_total - treatment_hits_count],
+            [control_hits_count, control_total - control_hits_count]
         ]
         chi2, p_value = stats.chi2_contingency(contingency_table)[:2]
         
+        # Bootstrap CIs and permutation p-value on the same hit vectors
+        significance_results = ab_simulation.simulate(
+            control_hits, treatment_hits, n_resamples=n_resamples, n_jobs=n_jobs
+        )
+        
         print(f"Sample Sizes:")
         print(f"  Control (Popularity): {control_total:,} users")
         print(f"  Treatment (Category CF): {treatment_total:,} users")
         
         print(f"\nControl (Popularity):")
         print(f"  Hit Rate: {control_hit_rate:.2%}")
-        print(f"  Hits: {control_hits:,}/{control_total:,}")
+        print(f"  Hits: {control_hits_count:,}/{control_total:,}")
         
         print(f"\nTreatment (Category CF):")
         print(f"  Hit Rate: {treatment_hit_rate:.2%}")
-        print(f"  Hits: {treatment_hits:,}/{treatment_total:,}")
+        print(f"  Hits: {treatment_hits_count:,}/{treatment_total:,}")
+        
+        abs_low, abs_high = significance_results['absolute_lift_ci']
+        rel_low, rel_high = significance_results['relative_lift_ci']
         
         print(f"\nResults:")
-        print(f"  Absolute Lift: {(treatment_hit_rate - control_hit_rate)*100:+.2f} percentage points")
-        print(f"  Relative Lift: {uplift:+.1f}%")
-        print(f"  P-value: {p_value:.4f}")
+        print(f"  Absolute Lift: {(treatment_hit_rate - control_hit_rate)*100:+.2f} percentage points "
+              f"(95% CI {abs_low*100:+.2f} to {abs_high*100:+.2f})")
+        print(f"  Relative Lift: {uplift:+.1f}% (95% CI {rel_low*100:+.1f}% to {rel_high*100:+.1f}%)")
+        print(f"  P-value (chi-square): {p_value:.4f}")
+        print(f"  P-value (permutation, {n_resamples:,} draws): {significance_results['p_value']:.4f}")
         
         if p_value < 0.05:
             significance = "✅ STATISTICALLY SIGNIFICANT"
@@ -418,11 +476,14 @@ class ModelEvaluator:
             print(f"\n⚠️  Category CF underperforms by {abs(uplift):.1f}%")
         
         print("\n" + "="*60)
+        
+        significance_results['chi2_p_value'] = p_value
+        return significance_results
 
 
 def main():
     evaluator = ModelEvaluator()
-    evaluator.run_evaluation(k=10)
+    evaluator.run_evaluation(k=10, ks=(5, 10, 20))
     evaluator.simulate_ab_test()
 
 
@@ -0,0 +1,14 @@
+# Event type codes stored in events.event (SMALLINT). The values live in one
+# place, src/database/event_types.py, which also seeds the event_types lookup
+# table; this module re-exports them so model code keeps its flat imports.
+import sys
+from pathlib import Path
+
+SRC_DIR = str(Path(__file__).resolve().parent.parent / "src")
+if SRC_DIR not in sys.path:
+    # Appended, so src packages never shadow ml_models modules
+    sys.path.append(SRC_DIR)
+
+from database.event_types import (
+    VIEW, ADDTOCART, TRANSACTION, EVENT_CODES, EVENT_NAMES, EVENT_WEIGHTS
+)
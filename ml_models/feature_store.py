@@ -0,0 +1,251 @@
+"""
+In-process feature store: memory-mapped snapshots of user/item features
+
+A snapshot is one directory of .npy column files per table, rows sorted by
+id, so a batch of ids resolves with a single np.searchsorted and each
+column read is a fancy index into a memory map - no database round trip.
+
+Layout under root:
+    CURRENT                        name of the live snapshot
+    <snapshot>/meta.json           row counts, column dtypes, string vocabularies
+    <snapshot>/<table>/<col>.npy   one array per column (key.npy holds the ids)
+
+Publishing writes the snapshot under a temporary name, renames it into
+place, then swaps CURRENT with os.replace, so readers see either the old or
+the new snapshot, never a partial one.
+"""
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from data_backend import get_backend
+
+DEFAULT_STORE_DIR = "data/feature_store"
+
+# Snapshots kept on disk besides the live one (open memory maps stay valid after deletion)
+KEEP_SNAPSHOTS = 2
+
+# NULL in integer columns; float columns use NaN, string columns None
+MISSING_INT = -1
+
+# table -> (key column, {column: dtype}); 'category' columns are stored as int16 codes
+TABLES = {
+    'user_features': ('visitorid', {
+        'total_events': 'int32',
+        'total_views': 'int32',
+        'total_addtocarts': 'int32',
+        'total_transactions': 'int32',
+        'favorite_category': 'int32',
+        'avg_session_duration': 'float64',
+        'last_interaction_timestamp': 'int64',
+        'user_segment': 'category'
+    }),
+    'item_features': ('itemid', {
+        'total_views': 'int32',
+        'total_addtocarts': 'int32',
+        'total_transactions': 'int32',
+        'conversion_rate': 'float64',
+        'avg_time_to_purchase': 'float64',
+        'popularity_score': 'float64',
+        'trending_score': 'float64'
+    })
+}
+
+
+def _write_table(df, key, columns, table_dir):
+    """Sort by key and write one .npy per column; returns the table's meta entry"""
+    table_dir.mkdir(parents=True)
+    df = df.sort_values(key, kind='stable')
+
+    np.save(table_dir / "key.npy", df[key].to_numpy(dtype=np.int64))
+
+    vocab = {}
+    for col, dtype in columns.items():
+        values = df[col]
+        if dtype == 'category':
+            codes, uniques = pd.factorize(values, sort=True)
+            array = codes.astype(np.int16)
+            vocab[col] = [str(u) for u in uniques]
+        elif dtype.startswith('int'):
+            array = values.fillna(MISSING_INT).to_numpy(dtype=dtype)
+        else:
+            array = values.to_numpy(dtype=dtype, na_value=np.nan)
+        np.save(table_dir / f"{col}.npy", array)
+
+    return {'key': key, 'rows': len(df), 'columns': columns, 'vocab': vocab}
+
+
+def _prune(root, keep):
+    snapshots = sorted(p for p in root.iterdir() if p.is_dir() and not p.name.startswith('.'))
+    for old in snapshots[:-keep]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def build_snapshot(backend=None, root=DEFAULT_STORE_DIR, keep=KEEP_SNAPSHOTS):
+    """
+    Export user_features and item_features into a new snapshot and publish it
+
+    Args:
+        backend: data backend to read the feature tables from (default: get_backend())
+
+    Returns:
+        Path of the published snapshot
+    """
+    print("\n" + "="*60)
+    print("BUILDING FEATURE STORE SNAPSHOT")
+    print("="*60 + "\n")
+
+    backend = backend or get_backend()
+    print(f"[INFO] Data backend: {backend.name}")
+
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+
+    name = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    staging = root / f".{name}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+
+    meta = {'created_at': name, 'tables': {}}
+    for table, (key, columns) in TABLES.items():
+        df = backend.feature_table(table, columns=[key] + list(columns))
+        meta['tables'][table] = _write_table(df, key, columns, staging / table)
+        print(f"[OK] {table}: {len(df):,} rows")
+
+    with open(staging / "meta.json", 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    snapshot = root / name
+    shutil.rmtree(snapshot, ignore_errors=True)
+    os.replace(staging, snapshot)
+
+    # Atomic pointer swap
+    pointer = root / ".CURRENT.tmp"
+    pointer.write_text(name)
+    os.replace(pointer, root / "CURRENT")
+
+    _prune(root, keep + 1)
+
+    print(f"[OK] Published snapshot {snapshot}")
+    return snapshot
+
+
+class FeatureTable:
+    """One table of a snapshot: sorted keys plus memory-mapped columns"""
+
+    def __init__(self, table_dir, meta):
+        self.key_name = meta['key']
+        self.dtypes = meta['columns']
+        self.vocab = {col: np.array(values + [None], dtype=object)
+                      for col, values in meta['vocab'].items()}
+        self.keys = np.load(table_dir / "key.npy", mmap_mode='r')
+        self.columns = {col: np.load(table_dir / f"{col}.npy", mmap_mode='r') for col in self.dtypes}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def positions(self, ids):
+        """(row position, found mask) for an array of ids"""
+        ids = np.asarray(ids, dtype=np.int64)
+        pos = np.searchsorted(self.keys, ids)
+        pos = np.minimum(pos, len(self.keys) - 1) if len(self.keys) else np.zeros_like(pos)
+        found = (self.keys[pos] == ids) if len(self.keys) else np.zeros(len(ids), dtype=bool)
+        return pos, found
+
+    def column(self, col, pos, found):
+        """Values of one column at pos; missing ids get the column's NULL"""
+        if len(self.keys) == 0:
+            # Empty table (e.g. snapshot taken before features were built): nothing to index,
+            # every id is missing and gets the NULL below
+            values = np.zeros(len(pos), dtype=self.columns[col].dtype)
+        else:
+            values = self.columns[col][pos]
+        if col in self.vocab:
+            # code -1 (and missing ids) index the trailing None
+            return self.vocab[col][np.where(found, values, -1)]
+        if values.dtype.kind == 'f':
+            return np.where(found, values, np.nan)
+        return np.where(found, values, MISSING_INT)
+
+    def lookup(self, ids, columns=None):
+        """
+        Vectorized batch lookup
+
+        Returns:
+            (found mask, {column: array aligned with ids})
+        """
+        pos, found = self.positions(ids)
+        return found, {col: self.column(col, pos, found) for col in (columns or self.dtypes)}
+
+    def get(self, id_, columns=None):
+        """Features of one id as a dict, or None if unknown"""
+        found, values = self.lookup([id_], columns)
+        if not found[0]:
+            return None
+        return {col: array[0] for col, array in values.items()}
+
+
+class FeatureStore:
+    """
+    Reader for the live snapshot
+
+    refresh() re-reads CURRENT and swaps in the new snapshot with one
+    attribute assignment; callers holding the previous tables keep reading
+    them safely.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = Path(root)
+        self.snapshot = None
+        self.tables = {}
+        if not self.refresh():
+            raise FileNotFoundError(f"No feature store snapshot under {self.root}; run feature_store.py first")
+
+    def refresh(self):
+        """Load the snapshot CURRENT points at; True if one is loaded"""
+        pointer = self.root / "CURRENT"
+        if not pointer.exists():
+            return self.snapshot is not None
+
+        name = pointer.read_text().strip()
+        if name == self.snapshot:
+            return True
+
+        with open(self.root / name / "meta.json") as f:
+            meta = json.load(f)
+        tables = {table: FeatureTable(self.root / name / table, table_meta)
+                  for table, table_meta in meta['tables'].items()}
+
+        self.tables, self.snapshot = tables, name
+        return True
+
+    @property
+    def users(self):
+        return self.tables['user_features']
+
+    @property
+    def items(self):
+        return self.tables['item_features']
+
+
+def main():
+    build_snapshot()
+
+    store = FeatureStore()
+    users = store.users
+    print(f"\n[INFO] Snapshot {store.snapshot}: {len(users):,} users, {len(store.items):,} items")
+
+    if len(users):
+        ids = np.random.default_rng(0).choice(np.asarray(users.keys), 10000)
+        started = time.perf_counter()
+        found, values = users.lookup(ids, ['favorite_category', 'user_segment'])
+        elapsed = time.perf_counter() - started
+        print(f"[OK] Batch lookup of {len(ids):,} users: {elapsed * 1e6 / len(ids):.2f} us/id "
+              f"({found.mean():.0%} found)")
+
+
+if __name__ == "__main__":
+    main()
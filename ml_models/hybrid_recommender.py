@@ -0,0 +1,310 @@
+import threading
+import time
+import numpy as np
+from collections import Counter
+from popularity_recommender import PopularityRecommender
+from trending_items import TrendingRecommender
+from category_cf import CategoryCollaborativeFiltering
+from model_registry import ModelWatcher, DEFAULT_MODEL_ROOT
+
+DEFAULT_MODEL_DIR = DEFAULT_MODEL_ROOT
+
+# (attribute, registry name, class, legacy artifact) of every component model
+COMPONENTS = [
+    ('category_cf', 'category_cf', CategoryCollaborativeFiltering, "category_cf.pkl"),
+    ('trending', 'trending', TrendingRecommender, "trending_model.pkl"),
+    ('popularity', 'popularity', PopularityRecommender, "popularity_model.pkl")
+]
+
+# Users scored on a freshly loaded CF model before it is swapped in
+WARMUP_USERS = 8
+
+# Per-request latency budget (batches get the same budget for the whole batch)
+DEFAULT_BUDGET_MS = 50.0
+
+# Smoothing of the per-user stage cost estimate
+COST_EWMA_ALPHA = 0.2
+
+# Users scored per CF block; the budget is checked before each block
+CF_BLOCK = 64
+
+# Stages tried per route, in order; later stages fill slots earlier ones left empty.
+# Only category_cf does real work - the rest are list slices and always run.
+ROUTE_STAGES = {
+    'cf': ['category_cf', 'category_trending', 'trending', 'popularity'],
+    'light': ['category_trending', 'category_popular', 'trending', 'popularity'],
+    'anonymous': ['trending', 'popularity']
+}
+
+
+class HybridRecommender:
+    """
+    Route each user to the cheapest model that can serve them
+
+    - cf: users known to Category CF get neighbor-based category picks
+    - light: users with features but too little history for CF get
+      trending / popular items of their favorite category
+    - anonymous: no user id (or an unknown one) gets global trending,
+      then popularity
+
+    A request never waits on CF past its time budget: CF runs in blocks
+    while the EWMA cost estimate fits the remaining budget, and users left
+    over fall through to their route's next stages, so every request still
+    gets n items.
+    """
+
+    def __init__(self, category_cf=None, trending=None, popularity=None, feature_store=None,
+                 budget_ms=DEFAULT_BUDGET_MS, cache=None):
+        self.category_cf = category_cf
+        self.trending = trending
+        self.popularity = popularity
+        self.feature_store = feature_store
+        self.budget_ms = budget_ms
+        # Optional ResponseCache for finished per-user lists
+        self.cache = cache
+
+        # Estimated milliseconds per user for the CF stage (None until first measured)
+        self.cf_cost_ms = None
+        # Written from the scoring thread, read from the server's event loop
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+        self.watcher = None
+
+    def _count(self, counts):
+        """Add a batch's counters to self.stats"""
+        with self._stats_lock:
+            self.stats.update(counts)
+
+    def stats_snapshot(self):
+        """Copy of the counters, safe to iterate while batches are scored"""
+        with self._stats_lock:
+            return dict(self.stats)
+
+    @staticmethod
+    def warm(model):
+        """Exercise a freshly loaded model once (builds the CF user index, faults in pages)"""
+        if isinstance(model, CategoryCollaborativeFiltering) and len(model.user_ids):
+            model.recommend_batch([int(user) for user in model.user_ids[:WARMUP_USERS]])
+
+    def load_models(self, model_dir=DEFAULT_MODEL_DIR, components=COMPONENTS):
+        """
+        Load the current version of every component (legacy flat files as fallback)
+
+        components overrides the model class per component, e.g.
+        shared_model.shared_components(COMPONENTS) for memory-mapped CF.
+        """
+        self.watcher = ModelWatcher(self, components, model_dir, warm=self.warm)
+        self.watcher.check()
+
+        for attr, name, _, filename in components:
+            if getattr(self, attr) is None:
+                print(f"[WARN] No {name} model under {model_dir}; {attr} stage disabled")
+
+    def watch(self, interval=5.0):
+        """Poll for newly published versions in the background and hot-swap them"""
+        if self.watcher is None:
+            self.load_models()
+        self.watcher.interval = interval
+        self.watcher.start()
+        return self.watcher
+
+    @property
+    def model_version(self):
+        """Versions of every component; any reload changes it (and so the cache keys)"""
+        parts = [getattr(model, 'model_version', None)
+                 for model in (self.category_cf, self.trending, self.popularity)]
+        parts.append(self.feature_store.snapshot if self.feature_store is not None else None)
+        return "|".join(str(part) for part in parts)
+
+    def route(self, user_ids, category_cf=None):
+        """
+        Route per user, plus the favorite category used by category stages
+
+        category_cf defaults to the current CF model.
+
+        Returns:
+            (routes, favorite categories; -1 where unknown)
+        """
+        n = len(user_ids)
+        routes = np.full(n, 'anonymous', dtype=object)
+        categories = np.full(n, -1, dtype=np.int64)
+
+        present = np.array([user_id is not None for user_id in user_ids], dtype=bool)
+        if not present.any():
+            return routes, categories
+        ids = np.array([int(user_id) for user_id in np.asarray(user_ids, dtype=object)[present]],
+                       dtype=np.int64)
+
+        if self.feature_store is not None:
+            found, values = self.feature_store.users.lookup(ids, ['favorite_category'])
+            categories[present] = values['favorite_category']
+            routes[np.flatnonzero(present)[found]] = 'light'
+
+        category_cf = category_cf or self.category_cf
+        if category_cf is not None:
+            in_cf = category_cf.user_rows(ids) >= 0
+            routes[np.flatnonzero(present)[in_cf]] = 'cf'
+
+        return routes, categories
+
+    def _category_list(self, stage, category):
+        if stage == 'category_trending' and self.trending is not None:
+            return self.trending.category_trending.get(category, [])
+        if stage == 'category_popular' and self.popularity is not None:
+            return self.popularity.category_popular.get(category, [])
+        return []
+
+    def _global_list(self, stage):
+        if stage == 'trending' and self.trending is not None:
+            return self.trending.trending_items or []
+        if stage == 'popularity' and self.popularity is not None:
+            return self.popularity.popular_items or []
+        return []
+
+    def _run_cf(self, category_cf, user_ids, deadline, n):
+        """
+        CF picks for as many users as the budget allows
+
+        Returns:
+            {position in user_ids: recommendations} for the users scored
+        """
+        results = {}
+        for start in range(0, len(user_ids), CF_BLOCK):
+            block = user_ids[start:start + CF_BLOCK]
+            remaining_ms = (deadline - time.perf_counter()) * 1000
+            if self.cf_cost_ms is not None and self.cf_cost_ms * len(block) > remaining_ms:
+                self._count({'cf_over_budget': len(user_ids) - start})
+                break
+
+            started = time.perf_counter()
+            recs = category_cf.recommend_batch(block, n=n)
+            cost = (time.perf_counter() - started) * 1000 / len(block)
+            self.cf_cost_ms = cost if self.cf_cost_ms is None else (
+                COST_EWMA_ALPHA * cost + (1 - COST_EWMA_ALPHA) * self.cf_cost_ms
+            )
+
+            for offset, items in enumerate(recs):
+                results[start + offset] = items
+        return results
+
+    def recommend_batch(self, user_ids, n=10, budget_ms=None):
+        """
+        Recommend n items for each user id (None = anonymous)
+
+        The budget covers the whole batch; returns one list per user id.
+        With a cache, only misses are scored, and lists that had to skip
+        CF for lack of budget are not cached.
+        """
+        started = time.perf_counter()
+        deadline = started + (self.budget_ms if budget_ms is None else budget_ms) / 1000
+        user_ids = list(user_ids)
+
+        if self.cache is None:
+            return self._score(user_ids, n, deadline)[0]
+
+        version = self.model_version
+        results = [self.cache.get('hybrid', version, user_id, n) for user_id in user_ids]
+        misses = [i for i, recs in enumerate(results) if recs is None]
+        self._count({'cache_hits': len(user_ids) - len(misses)})
+
+        if misses:
+            scored, degraded = self._score([user_ids[i] for i in misses], n, deadline)
+            for i, recs, is_degraded in zip(misses, scored, degraded):
+                results[i] = recs
+                if not is_degraded:
+                    self.cache.put('hybrid', version, user_ids[i], n, recs)
+
+        # Copies, so callers cannot modify cached lists
+        return [list(recs) for recs in results]
+
+    def _score(self, user_ids, n, deadline):
+        """
+        Route and score users
+
+        Returns:
+            (recommendation lists, per-user flag set when CF was skipped over budget)
+        """
+        # One read of the CF reference: a hot swap mid-batch cannot mix two models
+        category_cf = self.category_cf
+        routes, categories = self.route(user_ids, category_cf)
+        counts = Counter(f"route:{route}" for route in routes)
+
+        cf_recs = {}
+        cf_positions = np.flatnonzero(routes == 'cf')
+        if len(cf_positions) and category_cf is not None:
+            scored = self._run_cf(category_cf, [int(user_ids[i]) for i in cf_positions], deadline, n)
+            cf_recs = {int(cf_positions[j]): items for j, items in scored.items()}
+
+        results = []
+        degraded = []
+        for i, route in enumerate(routes):
+            recs = list(cf_recs.get(i, []))
+            served = ['category_cf'] if recs else []
+
+            for stage in ROUTE_STAGES[route]:
+                if len(recs) >= n:
+                    break
+                if stage == 'category_cf':
+                    continue
+                if stage.startswith('category_'):
+                    items = self._category_list(stage, int(categories[i]))
+                else:
+                    items = self._global_list(stage)
+                before = len(recs)
+                recs = list(dict.fromkeys(recs + [int(item) for item in items[:n]]))
+                if len(recs) > before:
+                    served.append(stage)
+
+            counts.update(f"served:{stage}" for stage in served)
+            results.append(recs[:n])
+            degraded.append(route == 'cf' and i not in cf_recs)
+
+        counts['requests'] += len(user_ids)
+        counts['batches'] += 1
+        self._count(counts)
+        return results, degraded
+
+    def recommend(self, user_id=None, n=10, budget_ms=None):
+        """Recommend n items for one user (None = anonymous)"""
+        return self.recommend_batch([user_id], n=n, budget_ms=budget_ms)[0]
+
+    def route_summary(self):
+        """Share of scored (not cached) requests per route and per serving stage"""
+        stats = self.stats_snapshot()
+        total = max(stats.get('requests', 0), 1)
+        return {key: round(count / total, 4) for key, count in sorted(stats.items())
+                if key.startswith(('route:', 'served:'))}
+
+
+def main():
+    """Load the trained models and route a few sample requests"""
+    model = HybridRecommender()
+    model.load_models()
+
+    try:
+        from feature_store import FeatureStore
+        model.feature_store = FeatureStore()
+    except FileNotFoundError as e:
+        print(f"[WARN] {e}; light-user routing disabled")
+
+    print("\n" + "="*60)
+    print("TESTING HYBRID ROUTING")
+    print("="*60)
+
+    users = [None]
+    if model.category_cf is not None and len(model.category_cf.user_ids):
+        users += [int(user) for user in model.category_cf.user_ids[:3]]
+    if model.feature_store is not None and len(model.feature_store.users):
+        users += [int(user) for user in model.feature_store.users.keys[-3:]]
+
+    routes, _ = model.route(users)
+    for user, route, recs in zip(users, routes, model.recommend_batch(users, n=5)):
+        print(f"\nUser {user} [{route}]: {recs}")
+
+    print(f"\n[INFO] CF cost estimate: {model.cf_cost_ms} ms/user")
+    print(f"[INFO] Routing: {model.route_summary()}")
+    print("\n" + "="*60 + "\n")
+
+
+if __name__ == "__main__":
+    main()
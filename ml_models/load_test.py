@@ -0,0 +1,169 @@
+"""
+Closed-loop load test for the recommendation service (serving.py)
+
+Each of --concurrency clients keeps one keep-alive connection open and
+sends /recommend requests back to back for --duration seconds. Reports
+QPS, latency percentiles and the server's mean micro-batch size per pass
+(single-worker servers only: /stats is per worker).
+
+Usage:
+    python ml_models/serving.py --port 8000 &
+    python ml_models/load_test.py --port 8000 --concurrency 64 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+from datetime import datetime
+from pathlib import Path
+
+DEFAULT_OUTPUT_DIR = "data/benchmarks"
+
+# Share of requests sent without a user id
+ANONYMOUS_SHARE = 0.1
+
+
+def sample_users(n, seed=42):
+    """Visitor ids from the feature store snapshot (anonymous if there is none)"""
+    rng = np.random.default_rng(seed)
+    try:
+        from feature_store import FeatureStore
+        keys = np.asarray(FeatureStore().users.keys)
+    except FileNotFoundError:
+        print("[WARN] No feature store snapshot; sending anonymous requests only")
+        return [None] * n
+
+    users = [int(user) for user in keys[rng.integers(0, len(keys), size=n)]]
+    anonymous = rng.random(n) < ANONYMOUS_SHARE
+    return [None if anon else user for user, anon in zip(users, anonymous)]
+
+
+async def _get(reader, writer, path):
+    """Send one GET on an open connection and return the decoded JSON body"""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = 0
+    for line in head.decode('latin-1').split("\r\n")[1:]:
+        name, _, value = line.partition(":")
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    status = int(head.split(b" ", 2)[1])
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def _client(host, port, users, stop_at, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    i = 0
+    try:
+        while time.perf_counter() < stop_at:
+            user = users[i % len(users)]
+            i += 1
+            path = "/recommend?n=10" + (f"&user_id={user}" if user is not None else "")
+
+            started = time.perf_counter()
+            try:
+                status, _ = await _get(reader, writer, path)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                # Server dropped the connection (e.g. a worker restarted): count it and reconnect
+                errors.append('disconnected')
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, port)
+                continue
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def _server_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    _, stats = await _get(reader, writer, "/stats")
+    writer.close()
+    return stats
+
+
+async def run_load_test(host="127.0.0.1", port=8000, concurrency=32, duration=10.0, seed=42):
+    """
+    Returns:
+        dict with QPS, latency percentiles (ms) and the server's mean
+        micro-batch size during this pass
+    """
+    users = sample_users(10000, seed)
+    latencies, errors = [], []
+    before = await _server_stats(host, port)
+
+    started = time.perf_counter()
+    stop_at = started + duration
+    await asyncio.gather(*[
+        _client(host, port, users[i::concurrency] or [None], stop_at, latencies, errors)
+        for i in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - started
+
+    after = await _server_stats(host, port)
+    batches = after['batches'] - before['batches']
+    # /stats counters are per worker: with several, the two snapshots may come from different ones
+    single_worker = after.get('workers', 1) == 1
+
+    latencies_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'concurrency': concurrency,
+        'duration_s': round(elapsed, 2),
+        'requests': len(latencies),
+        'errors': len(errors),
+        'qps': round(len(latencies) / elapsed, 1),
+        'latency_ms': {
+            'p50': round(float(np.percentile(latencies_ms, 50)), 3),
+            'p95': round(float(np.percentile(latencies_ms, 95)), 3),
+            'p99': round(float(np.percentile(latencies_ms, 99)), 3),
+            'max': round(float(latencies_ms.max()), 3)
+        },
+        'mean_batch': round((after['requests'] - before['requests']) / max(batches, 1), 2)
+                      if single_worker else None,
+        'workers': after.get('workers', 1),
+        'routes': after['routes']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the recommendation service")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 128],
+                        help="client counts to run, one pass each")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per pass")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print("SERVICE LOAD TEST")
+    print("="*60 + "\n")
+
+    results = []
+    print(f"{'Clients':>8} {'QPS':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'batch':>7}")
+    print("-" * 56)
+    for concurrency in args.concurrency:
+        result = asyncio.run(run_load_test(args.host, args.port, concurrency, args.duration, args.seed))
+        results.append(result)
+        latency = result['latency_ms']
+        batch = f"{result['mean_batch']:.1f}" if result['mean_batch'] is not None else "-"
+        print(f"{concurrency:>8} {result['qps']:>10,.0f} {latency['p50']:>9.2f} "
+              f"{latency['p95']:>9.2f} {latency['p99']:>9.2f} {batch:>7}")
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_file = output_dir / f"load_test_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\n[OK] Results saved to {output_file}")
+
+
+if __name__ == "__main__":
+    main()
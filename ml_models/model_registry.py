@@ -0,0 +1,193 @@
+"""
+Versioned model artifacts with an atomic "current" pointer
+
+Layout under root (data/models):
+    <name>/<version>/model.pkl     immutable once published
+    <name>/CURRENT                 version being served
+    <legacy file>.pkl              kept pointing at the current artifact for
+                                   scripts that load fixed paths
+
+publish_model() saves into a hidden staging directory, renames it to its
+version, then swaps CURRENT with os.replace, so a reader never sees a
+half-written artifact. ModelWatcher polls CURRENT from a background thread,
+loads and warms new versions off the serving path and swaps them in with
+one attribute assignment.
+"""
+import os
+import pickle
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+DEFAULT_MODEL_ROOT = "data/models"
+
+# Published versions kept per model (CURRENT is never pruned)
+KEEP_VERSIONS = 3
+
+ARTIFACT_NAME = "model.pkl"
+
+
+def atomic_pickle(obj, filepath):
+    """Pickle to a temporary file next to filepath, then rename over it"""
+    filepath = Path(filepath)
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    tmp = filepath.with_name(f".{filepath.name}.tmp")
+    with open(tmp, 'wb') as f:
+        pickle.dump(obj, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, filepath)
+
+
+def _write_pointer(model_dir, version):
+    tmp = model_dir / ".CURRENT.tmp"
+    tmp.write_text(version)
+    os.replace(tmp, model_dir / "CURRENT")
+
+
+def _link_legacy(artifact, legacy_path):
+    """Point the fixed legacy path at the published artifact (hard link, else copy)"""
+    legacy_path = Path(legacy_path)
+    tmp = legacy_path.with_name(f".{legacy_path.name}.tmp")
+    if tmp.exists():
+        tmp.unlink()
+    try:
+        os.link(artifact, tmp)
+    except OSError:
+        shutil.copy2(artifact, tmp)
+    os.replace(tmp, legacy_path)
+
+
+def current_version(name, root=DEFAULT_MODEL_ROOT):
+    """Version CURRENT points at, or None if the model was never published"""
+    pointer = Path(root) / name / "CURRENT"
+    if not pointer.exists():
+        return None
+    return pointer.read_text().strip() or None
+
+
+def resolve_artifact(name, legacy_filename=None, root=DEFAULT_MODEL_ROOT):
+    """
+    (version, path) of the artifact to load
+
+    Falls back to the legacy flat file (version None) for models saved
+    before the registry existed; (None, None) if neither exists.
+    """
+    version = current_version(name, root)
+    if version is not None:
+        return version, Path(root) / name / version / ARTIFACT_NAME
+    if legacy_filename and (Path(root) / legacy_filename).exists():
+        return None, Path(root) / legacy_filename
+    return None, None
+
+
+def _prune(model_dir, keep, current):
+    versions = sorted(p.name for p in model_dir.iterdir() if p.is_dir() and not p.name.startswith('.'))
+    for version in versions[:-keep]:
+        if version != current:
+            shutil.rmtree(model_dir / version, ignore_errors=True)
+
+
+def publish_model(model, name, legacy_filename=None, root=DEFAULT_MODEL_ROOT, keep=KEEP_VERSIONS):
+    """
+    Save a trained model as a new version and make it current
+
+    Args:
+        model: any model with save_model(filepath)
+        name: registry name (directory under root)
+        legacy_filename: flat file under root to keep in sync (e.g. category_cf.pkl)
+
+    Returns:
+        the published version
+    """
+    model_dir = Path(root) / name
+    model_dir.mkdir(parents=True, exist_ok=True)
+
+    version = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    staging = model_dir / f".{version}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+
+    model.save_model(staging / ARTIFACT_NAME)
+    os.replace(staging, model_dir / version)
+    _write_pointer(model_dir, version)
+
+    if legacy_filename:
+        _link_legacy(model_dir / version / ARTIFACT_NAME, Path(root) / legacy_filename)
+
+    _prune(model_dir, keep, version)
+    print(f"[OK] Published {name} version {version}")
+    return version
+
+
+class ModelWatcher:
+    """
+    Hot-swap models on a host object when a new version is published
+
+    components: list of (attribute, registry name, model class, legacy filename).
+    warm(model), if given, runs on the freshly loaded model before the swap
+    (e.g. a few recommend calls), so the first live request does not pay
+    for index building or page faults. The feature store on the host, if
+    any, is refreshed on the same tick.
+    """
+
+    def __init__(self, host, components, root=DEFAULT_MODEL_ROOT, interval=5.0, warm=None):
+        self.host = host
+        self.components = components
+        self.root = root
+        self.interval = interval
+        self.warm = warm
+        self.loaded = {}
+        self.swaps = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self):
+        """Load, warm and swap in every component whose CURRENT moved; returns names swapped"""
+        swapped = []
+        for attr, name, cls, legacy_filename in self.components:
+            version, path = resolve_artifact(name, legacy_filename, self.root)
+            if path is None or (version is not None and self.loaded.get(attr) == version):
+                continue
+            if version is None and attr in self.loaded:
+                # Legacy file only: loaded once at startup, not watched
+                continue
+
+            started = time.perf_counter()
+            model = cls()
+            model.load_model(path)
+            if self.warm is not None:
+                self.warm(model)
+
+            # The swap: requests already running keep the model they started with
+            setattr(self.host, attr, model)
+            self.loaded[attr] = version
+            self.swaps += 1
+            swapped.append(name)
+            print(f"[OK] Swapped in {name} {version or path} ({time.perf_counter() - started:.2f}s)")
+
+        feature_store = getattr(self.host, 'feature_store', None)
+        if feature_store is not None:
+            feature_store.refresh()
+
+        return swapped
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                # Keep serving the current models; retry on the next tick
+                print(f"[ERROR] Model reload failed: {e}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -3,7 +3,9 @@ import psycopg2
 import pickle
 import os
 from dotenv import load_dotenv
-from pathlib import Path
+from data_backend import get_backend
+from response_cache import artifact_version, trained_version
+from model_registry import atomic_pickle, publish_model
 import warnings
 warnings.filterwarnings("ignore", message="pandas only supports SQLAlchemy")
 
@@ -21,60 +23,44 @@ DB_CONFIG = {
 class PopularityRecommender:
     """Smart popularity-based recommender"""
     
-    def __init__(self):
+    def __init__(self, feature_store=None):
         self.popular_items = None
         self.category_popular = {}
-        
-    def train(self):
-        """Build popularity rankings"""
+        # Optional FeatureStore: user features from memory instead of Postgres
+        self.feature_store = feature_store
+        # Changes on every train/load; response caches key on it
+        self.model_version = None
+        
+    def train(self, backend=None):
+        """
+        Build popularity rankings
+        
+        Args:
+            backend: data backend to query (default: get_backend(), i.e. DATA_BACKEND)
+        """
         print("\n" + "="*60)
         print("TRAINING POPULARITY RECOMMENDER")
         print("="*60 + "\n")
         
-        conn = psycopg2.connect(**DB_CONFIG)
+        backend = backend or get_backend()
+        print(f"[INFO] Data backend: {backend.name}")
         
         # Overall popular items
         print("[1/2] Loading overall popular items...")
-        self.popular_items = pd.read_sql("""
-            SELECT itemid, popularity_score, total_transactions
-            FROM item_features
-            WHERE total_transactions > 0
-            ORDER BY popularity_score DESC
-            LIMIT 100
-        """, conn)['itemid'].tolist()
+        self.popular_items = backend.popular_items(n=100)
         
         print(f"[OK] Loaded {len(self.popular_items)} popular items")
         
-        # Popular by category - FIXED: Load ALL at once instead of loop
+        # Popular by category - top 30 items per category in one query
         print("\n[2/2] Loading category-specific popular items...")
-        
-        # Get top 30 items per category in one query
-        category_items = pd.read_sql("""
-            WITH ranked_items AS (
-                SELECT 
-                    ip.categoryid,
-                    ip.itemid,
-                    if.popularity_score,
-                    ROW_NUMBER() OVER (PARTITION BY ip.categoryid ORDER BY if.popularity_score DESC) as rn
-                FROM item_properties ip
-                JOIN item_features if ON ip.itemid = if.itemid
-                WHERE ip.categoryid IS NOT NULL
-                  AND if.total_transactions > 0
-            )
-            SELECT categoryid, itemid
-            FROM ranked_items
-            WHERE rn <= 30
-            ORDER BY categoryid, rn
-        """, conn)
+        category_items = backend.category_popular_items(n=30)
         
         # Group by category
-        for cat_id in category_items['categoryid'].unique():
-            cat_items = category_items[category_items['categoryid'] == cat_id]['itemid'].tolist()
-            self.category_popular[int(cat_id)] = cat_items
+        for cat_id, items in category_items.groupby('categoryid', sort=False)['itemid']:
+            self.category_popular[int(cat_id)] = items.tolist()
         
         print(f"[OK] Loaded popular items for {len(self.category_popular)} categories")
-        
-        conn.close()
+        self.model_version = trained_version()
         
         print("\n" + "="*60)
         print("[SUCCESS] Trained!")
@@ -89,6 +75,12 @@ class PopularityRecommender:
         # Convert numpy int64 to Python int
         user_id = int(user_id)
         
+        if self.feature_store is not None:
+            features = self.feature_store.users.get(user_id, ['favorite_category'])
+            if features and int(features['favorite_category']) in self.category_popular:
+                return self.category_popular[int(features['favorite_category'])][:n]
+            return self.popular_items[:n]
+        
         # Get user's favorite category
         conn = psycopg2.connect(**DB_CONFIG)
         cursor = conn.cursor()
@@ -108,16 +100,13 @@ class PopularityRecommender:
         return self.popular_items[:n]
     
     def save_model(self, filepath="data/models/popularity_model.pkl"):
-        """Save model"""
-        Path(filepath).parent.mkdir(parents=True, exist_ok=True)
-        
+        """Save model (written to a temp file and renamed into place)"""
         model_data = {
             'popular_items': self.popular_items,
             'category_popular': self.category_popular
         }
         
-        with open(filepath, 'wb') as f:
-            pickle.dump(model_data, f)
+        atomic_pickle(model_data, filepath)
         
         print(f"[OK] Model saved to {filepath}")
     
@@ -128,11 +117,12 @@ class PopularityRecommender:
         
         self.popular_items = model_data['popular_items']
         self.category_popular = model_data['category_popular']
+        self.model_version = artifact_version(filepath)
 
 def main():
     model = PopularityRecommender()
     model.train()
-    model.save_model()
+    publish_model(model, 'popularity', legacy_filename='popularity_model.pkl')
     
     # Test
     print("\n" + "="*60)
@@ -0,0 +1,54 @@
+import numpy as np
+
+
+def build_rec_matrix(rec_lists, k):
+    """
+    Pack ragged recommendation lists into a (n_lists, k) array
+
+    Missing slots are padded with -1, which never matches a real itemid.
+    """
+    rec_matrix = np.full((len(rec_lists), k), -1, dtype=np.int64)
+
+    for row, recs in enumerate(rec_lists):
+        recs = list(recs)[:k]
+        if recs:
+            rec_matrix[row, :len(recs)] = recs
+
+    return rec_matrix
+
+
+def hit_ranks(rec_matrix, user_index, item_ids):
+    """
+    Position of each (user, true item) pair in that user's recommendations
+
+    Args:
+        rec_matrix: (n_users, k) array from build_rec_matrix
+        user_index: row in rec_matrix for every true pair
+        item_ids: true itemid for every pair (pairs must be de-duplicated)
+
+    Returns:
+        Array with the 0-based rank of the item, or k when it was not recommended
+    """
+    user_index = np.asarray(user_index, dtype=np.int64)
+    item_ids = np.asarray(item_ids, dtype=np.int64)
+
+    match = rec_matrix[user_index] == item_ids[:, None]
+    found = match.any(axis=1)
+
+    return np.where(found, match.argmax(axis=1), rec_matrix.shape[1])
+
+
+def hits_at_k(rec_matrix, user_index, item_ids, ks):
+    """
+    Count distinct true items inside the top-k of every user, for every k
+
+    Returns:
+        dict k -> (n_users,) array of hit counts
+    """
+    ranks = hit_ranks(rec_matrix, user_index, item_ids)
+    n_users = rec_matrix.shape[0]
+
+    return {
+        k: np.bincount(user_index, weights=(ranks < k), minlength=n_users)
+        for k in ks
+    }
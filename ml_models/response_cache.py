@@ -0,0 +1,121 @@
+"""
+Bounded in-process cache of recommendation responses
+
+Entries are keyed by (model name, model version, user or category, n),
+evicted least-recently-used beyond max_entries and expired after
+ttl_seconds. Models stamp model_version when they train or load an
+artifact; the first lookup under a new version for a model drops that
+model's old entries, so loading a new artifact invalidates the cache
+without the model knowing about it.
+"""
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+DEFAULT_MAX_ENTRIES = 100_000
+DEFAULT_TTL_SECONDS = 300.0
+
+
+def artifact_version(filepath):
+    """Version stamp of a model artifact: changes whenever the file is rewritten"""
+    stat = os.stat(filepath)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def trained_version():
+    """Version stamp of a model trained in this process"""
+    return f"trained-{time.time_ns()}"
+
+
+class ResponseCache:
+    """
+    TTL + LRU cache; safe to share between the event loop and a worker thread
+
+    get() returns None on a miss, so None is never stored as a value.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def _check_version(self, model, version):
+        """Drop a model's entries when its version changes (caller holds the lock)"""
+        current = self._versions.get(model)
+        if current == version:
+            return
+        if current is not None:
+            stale = [key for key in self._entries if key[0] == model]
+            for key in stale:
+                del self._entries[key]
+            self.stats['invalidated'] += len(stale)
+        self._versions[model] = version
+
+    def get(self, model, version, key, n):
+        with self._lock:
+            self._check_version(model, version)
+            cache_key = (model, version, key, n)
+            entry = self._entries.get(cache_key)
+
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[cache_key]
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(cache_key)
+            self.stats['hits'] += 1
+            return value
+
+    def put(self, model, version, key, n, value):
+        with self._lock:
+            self._check_version(model, version)
+            cache_key = (model, version, key, n)
+            self._entries[cache_key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(cache_key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def invalidate(self, model=None):
+        """Drop every entry, or only one model's"""
+        with self._lock:
+            if model is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                self._versions.clear()
+            else:
+                stale = [key for key in self._entries if key[0] == model]
+                for key in stale:
+                    del self._entries[key]
+                self._versions.pop(model, None)
+                dropped = len(stale)
+            self.stats['invalidated'] += dropped
+
+    def __len__(self):
+        return len(self._entries)
+
+    def summary(self):
+        """Counters plus size and hit rate"""
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_s': self.ttl,
+            'hits': self.stats['hits'],
+            'misses': self.stats['misses'],
+            'hit_rate': round(self.stats['hits'] / lookups, 4) if lookups else None,
+            'evictions': self.stats['evictions'],
+            'expired': self.stats['expired'],
+            'invalidated': self.stats['invalidated']
+        }
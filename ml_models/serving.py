@@ -0,0 +1,427 @@
+"""
+Asyncio HTTP recommendation service
+
+Endpoints (GET, JSON responses):
+    /recommend?user_id=<id>&n=10   hybrid recommendations (omit user_id for anonymous)
+    /trending?category_id=<id>&n=10
+    /stats                         batching, routing and cache counters
+    /health
+
+Concurrent /recommend calls are coalesced into micro-batches: the first
+request opens a short window (window_ms), everything arriving inside it is
+scored with one HybridRecommender.recommend_batch call on a worker thread,
+so per-request NumPy overhead is paid once per batch and the event loop
+keeps accepting connections while a batch is scored.
+
+With --workers N (POSIX only) the models are loaded once, Category CF on
+memory-mapped arrays (shared_model.py), and N worker processes are forked
+to accept from one listening socket. Workers share the model pages, so
+throughput scales with cores while memory stays near one model copy.
+Batching, the response cache and /stats counters are per worker.
+
+Usage:
+    python ml_models/serving.py --port 8000
+    python ml_models/serving.py --port 8000 --workers 4
+    python ml_models/load_test.py --port 8000
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import signal
+import socket
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+from hybrid_recommender import HybridRecommender, COMPONENTS, DEFAULT_MODEL_DIR
+from response_cache import ResponseCache, DEFAULT_MAX_ENTRIES, DEFAULT_TTL_SECONDS
+from shared_model import shared_components
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+
+# Micro-batch window and size cap
+BATCH_WINDOW_MS = 2.0
+MAX_BATCH_SIZE = 256
+
+MAX_N = 100
+
+# Pending connections on the listening socket shared by pre-forked workers
+LISTEN_BACKLOG = 1024
+
+# Pause before replacing a worker that died, so a crash loop does not spin
+RESPAWN_DELAY_S = 1.0
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               500: "Internal Server Error"}
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent calls into one batched call
+
+    submit() enqueues a key and awaits its result; run() drains the queue in
+    windows of window_ms (or max_batch keys) and calls
+    batch_fn(keys, n) -> list of results on the executor, once per distinct
+    n in the window, so results (and batch_fn's per-n cache) match the n asked for.
+    """
+
+    def __init__(self, batch_fn, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH_SIZE, executor=None):
+        self.batch_fn = batch_fn
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        # One thread: models are not thread-safe, and batches stay ordered
+        self.executor = executor or ThreadPoolExecutor(max_workers=1)
+        self.queue = asyncio.Queue()
+        self.stats = Counter()
+
+    async def submit(self, key, n):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((key, n, future))
+        return await future
+
+    async def _collect(self):
+        """Block for the first request, let the window fill, then drain the queue"""
+        batch = [await self.queue.get()]
+        if self.queue.qsize() < self.max_batch - 1:
+            await asyncio.sleep(self.window)
+
+        while len(batch) < self.max_batch and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            groups = {}
+            for key, n, future in batch:
+                groups.setdefault(n, []).append((key, future))
+
+            for n, group in groups.items():
+                keys = [key for key, _ in group]
+                try:
+                    results = await loop.run_in_executor(self.executor, self.batch_fn, keys, n)
+                except Exception as e:
+                    for _, future in group:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+
+                for (_, future), result in zip(group, results):
+                    if not future.done():
+                        future.set_result(result)
+
+            self.stats['batches'] += 1
+            self.stats['batch_calls'] += len(groups)
+            self.stats['requests'] += len(batch)
+            self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+
+
+def _json_response(status, payload, keep_alive=True):
+    body = json.dumps(payload).encode()
+    head = (
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode() + body
+
+
+def _int_param(params, name, default=None):
+    values = params.get(name)
+    if not values or values[0] == '':
+        return default
+    return int(values[0])
+
+
+def _n_param(params, default=10):
+    """List length: 1..MAX_N (larger values are capped, smaller ones rejected)"""
+    n = _int_param(params, 'n', default)
+    if n < 1:
+        raise ValueError(f"n must be at least 1, got {n}")
+    return min(n, MAX_N)
+
+
+class RecommendationService:
+    """HTTP front end over a loaded HybridRecommender"""
+
+    def __init__(self, hybrid, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH_SIZE):
+        self.hybrid = hybrid
+        self.batcher = MicroBatcher(hybrid.recommend_batch, window_ms, max_batch)
+        self.started_at = time.time()
+        # Processes serving the same socket (set by serve_prefork)
+        self.workers = 1
+
+    async def recommend(self, params):
+        user_id = _int_param(params, 'user_id')
+        n = _n_param(params)
+        items = await self.batcher.submit(user_id, n)
+        return 200, {'user_id': user_id, 'items': items}
+
+    async def trending(self, params):
+        category_id = _int_param(params, 'category_id')
+        n = _n_param(params)
+        trending = self.hybrid.trending
+        if trending is None:
+            return 404, {'error': "trending model not loaded"}
+
+        cache = self.hybrid.cache
+        items = cache.get('trending', trending.model_version, category_id, n) if cache else None
+        if items is None:
+            # A list slice: cheaper to answer inline than to batch
+            items = [int(item) for item in trending.recommend(category_id=category_id, n=n)]
+            if cache is not None:
+                cache.put('trending', trending.model_version, category_id, n, items)
+        return 200, {'category_id': category_id, 'items': list(items)}
+
+    async def stats(self, params):
+        batcher = self.batcher.stats
+        return 200, {
+            'pid': os.getpid(),
+            'workers': self.workers,
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'requests': batcher['requests'],
+            'batches': batcher['batches'],
+            'mean_batch': round(batcher['requests'] / max(batcher['batches'], 1), 2),
+            'batch_calls': batcher['batch_calls'],
+            'max_batch': batcher['max_batch'],
+            'routes': self.hybrid.route_summary(),
+            'cache': self.hybrid.cache.summary() if self.hybrid.cache is not None else None,
+            'models': self.model_versions()
+        }
+
+    def model_versions(self):
+        watcher = self.hybrid.watcher
+        return {
+            'loaded': dict(watcher.loaded) if watcher is not None else {},
+            'swaps': watcher.swaps if watcher is not None else 0,
+            'feature_snapshot': self.hybrid.feature_store.snapshot if self.hybrid.feature_store else None
+        }
+
+    async def health(self, params):
+        return 200, {'status': 'ok'}
+
+    async def dispatch(self, method, target):
+        if method != 'GET':
+            return 405, {'error': f"{method} not supported"}
+
+        url = urlsplit(target)
+        handler = {
+            '/recommend': self.recommend,
+            '/trending': self.trending,
+            '/stats': self.stats,
+            '/health': self.health
+        }.get(url.path)
+        if handler is None:
+            return 404, {'error': f"unknown path {url.path}"}
+
+        try:
+            return await handler(parse_qs(url.query))
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            # e.g. a failed batch: answer every request in it rather than drop the connection
+            print(f"[ERROR] {url.path}: {type(e).__name__}: {e}")
+            return 500, {'error': f"{type(e).__name__}: {e}"}
+
+    async def handle(self, reader, writer):
+        """One connection; HTTP/1.1 keep-alive, GET only (request bodies are not read)"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                lines = head.decode('latin-1').split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    writer.write(_json_response(400, {'error': "malformed request line"}, False))
+                    break
+
+                headers = {k.strip().lower(): v.strip()
+                           for k, _, v in (line.partition(":") for line in lines[1:] if line)}
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+
+                status, payload = await self.dispatch(method, target)
+                writer.write(_json_response(status, payload, keep_alive))
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, sock=None):
+        """Run until cancelled; sock (an already bound socket) overrides host/port"""
+        batch_task = asyncio.create_task(self.batcher.run())
+        if sock is not None:
+            server = await asyncio.start_server(self.handle, sock=sock)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+
+        addresses = ", ".join(str(s.getsockname()) for s in server.sockets)
+        print(f"[OK] Serving on {addresses}")
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batch_task.cancel()
+
+
+def load_service(model_dir=DEFAULT_MODEL_DIR, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH_SIZE,
+                 cache_size=DEFAULT_MAX_ENTRIES, cache_ttl=DEFAULT_TTL_SECONDS, watch_interval=5.0,
+                 shared=False):
+    """
+    Load the models once and wrap them in a RecommendationService
+
+    cache_size 0 disables the response cache; watch_interval 0 disables
+    hot-swapping of newly published model versions. shared maps Category
+    CF from exported arrays instead of unpickling a private copy.
+    """
+    cache = ResponseCache(cache_size, cache_ttl) if cache_size > 0 else None
+    hybrid = HybridRecommender(cache=cache)
+    hybrid.load_models(model_dir, shared_components(COMPONENTS) if shared else COMPONENTS)
+
+    try:
+        from feature_store import FeatureStore
+        hybrid.feature_store = FeatureStore()
+    except FileNotFoundError as e:
+        print(f"[WARN] {e}; light-user routing disabled")
+
+    # Warm-up: first CF call measures its cost and touches the model's pages
+    hybrid.recommend_batch([None], n=10)
+    if hybrid.category_cf is not None and len(hybrid.category_cf.user_ids):
+        hybrid.recommend_batch([int(user) for user in hybrid.category_cf.user_ids[:8]], n=10)
+    if cache is not None:
+        cache.invalidate()
+
+    if watch_interval > 0:
+        hybrid.watch(watch_interval)
+
+    return RecommendationService(hybrid, window_ms, max_batch)
+
+
+def _run_worker(service, sock, watch_interval):
+    """Body of a forked worker; never returns"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    status = 0
+    try:
+        # Threads do not survive fork: the watcher starts here, after catching
+        # up on anything published since the parent loaded
+        if watch_interval > 0:
+            service.hybrid.watcher.check()
+            service.hybrid.watch(watch_interval)
+        asyncio.run(service.serve(sock=sock))
+    except Exception as e:
+        print(f"[ERROR] Worker {os.getpid()} failed: {e}")
+        status = 1
+    finally:
+        os._exit(status)
+
+
+def serve_prefork(service, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=2, watch_interval=5.0):
+    """
+    Fork workers that share the loaded models and one listening socket
+
+    Load the service with shared=True and watch_interval=0 first; each
+    worker starts its own watcher. The parent only supervises: a worker
+    that dies is replaced, SIGTERM / SIGINT stop them all.
+    """
+    sock = socket.create_server((host, port), backlog=LISTEN_BACKLOG)
+    sock.setblocking(False)
+    print(f"[INFO] Listening on {sock.getsockname()} with {workers} workers")
+
+    service.workers = workers
+    children = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(service, sock, watch_interval)
+        children[pid] = time.time()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Move everything loaded so far out of the collector's reach: a GC pass in
+    # a worker would otherwise write to every inherited object and copy its page
+    gc.collect()
+    gc.freeze()
+
+    for _ in range(workers):
+        spawn()
+    print(f"[OK] Workers: {sorted(children)}")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        if children.pop(pid, None) is None or stopping:
+            continue
+        print(f"[WARN] Worker {pid} exited (status {status}); restarting")
+        time.sleep(RESPAWN_DELAY_S)
+        if not stopping:
+            spawn()
+
+    sock.close()
+    print("\n[INFO] Stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recommendations over HTTP")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--model-dir', default=DEFAULT_MODEL_DIR)
+    parser.add_argument('--window-ms', type=float, default=BATCH_WINDOW_MS)
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_ENTRIES, help="0 disables the cache")
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_TTL_SECONDS)
+    parser.add_argument('--watch-interval', type=float, default=5.0,
+                        help="seconds between checks for new model versions (0 disables)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="pre-forked worker processes sharing one model copy (POSIX only)")
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print("RECOMMENDATION SERVICE")
+    print("="*60 + "\n")
+
+    if args.workers > 1 and not hasattr(os, 'fork'):
+        print("[WARN] --workers needs os.fork; serving from a single process")
+        args.workers = 1
+
+    if args.workers > 1:
+        service = load_service(args.model_dir, args.window_ms, args.max_batch, args.cache_size,
+                               args.cache_ttl, watch_interval=0, shared=True)
+        serve_prefork(service, args.host, args.port, args.workers, args.watch_interval)
+        return
+
+    service = load_service(args.model_dir, args.window_ms, args.max_batch, args.cache_size, args.cache_ttl,
+                           args.watch_interval)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n[INFO] Stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Category CF backed by memory-mapped arrays, for multi-process serving
+
+The pickled model holds two sparse matrices (user_similarity dominates).
+SharedCategoryCF exports their CSR arrays once as .npy files next to the
+artifact and rebuilds the matrices on read-only memory maps. Every process
+mapping the same files shares one copy through the page cache - forked
+workers, and workers that hot-swap to a new version independently.
+
+Arrays live in <artifact stem>_arrays/<artifact version>/ next to the
+artifact, so a rewritten artifact gets a fresh export and a registry
+version directory takes its arrays with it when pruned. The export runs in
+a short-lived subprocess under a file lock: one process unpickles the
+artifact, and serving processes never hold the unpickled copy.
+
+Usage (optional; load_model exports on first use):
+    python ml_models/shared_model.py data/models/category_cf.pkl
+"""
+import json
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import numpy as np
+from pathlib import Path
+from scipy.sparse import csr_matrix
+from category_cf import CategoryCollaborativeFiltering
+from response_cache import artifact_version
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MATRICES = ('user_similarity', 'user_category_matrix')
+VECTORS = ('user_ids', 'category_ids')
+
+
+def arrays_dir(filepath):
+    """<artifact dir>/<artifact stem>_arrays/<artifact version>"""
+    filepath = Path(filepath)
+    return filepath.with_name(f"{filepath.stem}_arrays") / artifact_version(filepath)
+
+
+def shared_components(components):
+    """Copy of a ModelWatcher component list with Category CF swapped for SharedCategoryCF"""
+    return [(attr, name, SharedCategoryCF if cls is CategoryCollaborativeFiltering else cls, legacy)
+            for attr, name, cls, legacy in components]
+
+
+def export_arrays(model, directory):
+    """
+    Write the model's CSR and id arrays as .npy files (atomic directory rename)
+
+    Concurrent exporters are fine: the first rename wins and later ones
+    discard their copy.
+    """
+    directory = Path(directory)
+    staging = directory.with_name(f".{directory.name}.{os.getpid()}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    meta = {}
+    for name in MATRICES:
+        matrix = csr_matrix(getattr(model, name))
+        matrix.sort_indices()
+        for part in ('data', 'indices', 'indptr'):
+            np.save(staging / f"{name}.{part}.npy", getattr(matrix, part))
+        meta[name] = list(matrix.shape)
+    for name in VECTORS:
+        np.save(staging / f"{name}.npy", np.asarray(getattr(model, name)))
+
+    with open(staging / "category_popular_items.pkl", 'wb') as f:
+        pickle.dump(model.category_popular_items, f)
+    with open(staging / "meta.json", 'w') as f:
+        json.dump(meta, f)
+
+    try:
+        os.replace(staging, directory)
+    except OSError:
+        # Another process exported first
+        shutil.rmtree(staging, ignore_errors=True)
+
+    # Exports of older artifact versions (processes still mapping them keep their pages)
+    for old in directory.parent.iterdir():
+        if old.is_dir() and old.name != directory.name and not old.name.startswith('.'):
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def ensure_exported(filepath):
+    """Export the arrays of an artifact unless already done; returns their directory"""
+    directory = arrays_dir(filepath)
+    if (directory / "meta.json").exists():
+        return directory
+
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    with open(directory.parent / ".lock", 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        # Whoever held the lock before us may have exported it
+        if not (directory / "meta.json").exists():
+            subprocess.run([sys.executable, str(Path(__file__).resolve()), str(filepath)], check=True)
+    return directory
+
+
+class SharedCategoryCF(CategoryCollaborativeFiltering):
+    """CategoryCollaborativeFiltering whose matrices live in shared memory maps"""
+
+    def load_model(self, filepath="data/models/category_cf.pkl"):
+        """Map the exported arrays of an artifact, exporting them on first use"""
+        directory = ensure_exported(filepath)
+
+        with open(directory / "meta.json") as f:
+            meta = json.load(f)
+
+        for name in MATRICES:
+            data, indices, indptr = (np.load(directory / f"{name}.{part}.npy", mmap_mode='r')
+                                     for part in ('data', 'indices', 'indptr'))
+            matrix = csr_matrix((data, indices, indptr), shape=tuple(meta[name]), copy=False)
+            matrix.has_sorted_indices = True
+            setattr(self, name, matrix)
+
+        for name in VECTORS:
+            setattr(self, name, np.load(directory / f"{name}.npy", mmap_mode='r'))
+
+        with open(directory / "category_popular_items.pkl", 'rb') as f:
+            self.category_popular_items = pickle.load(f)
+
+        self._user_index = None
+        self.model_version = artifact_version(filepath)
+        print(f"[OK] Model mapped from {directory}")
+
+
+def main():
+    """Export the arrays of one artifact"""
+    if len(sys.argv) != 2:
+        print("Usage: python ml_models/shared_model.py <artifact.pkl>")
+        sys.exit(2)
+
+    filepath = Path(sys.argv[1])
+    model = CategoryCollaborativeFiltering()
+    model.load_model(filepath)
+    export_arrays(model, arrays_dir(filepath))
+    print(f"[OK] Arrays exported to {arrays_dir(filepath)}")
+
+
+if __name__ == "__main__":
+    main()
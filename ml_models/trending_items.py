@@ -1,9 +1,11 @@
 import pandas as pd
 import psycopg2
 import pickle
-from pathlib import Path
 import os
 from dotenv import load_dotenv
+from data_backend import get_backend
+from response_cache import artifact_version, trained_version
+from model_registry import atomic_pickle, publish_model
 import warnings
 warnings.filterwarnings("ignore")
 
@@ -26,100 +28,43 @@ class TrendingRecommender:
     def __init__(self):
         self.trending_items = None
         self.category_trending = {}
+        # Changes on every train/load; response caches key on it
+        self.model_version = None
         
-    def train(self):
-        """Build trending rankings"""
-        print("TRAINING TRENDING RECOMMENDER")
+    def train(self, backend=None):
+        """
+        Build trending rankings
         
-        conn = psycopg2.connect(**DB_CONFIG)
+        Args:
+            backend: data backend to query (default: get_backend(), i.e. DATA_BACKEND)
+        """
+        print("TRAINING TRENDING RECOMMENDER")
         
-        time_info = pd.read_sql("""
-            SELECT 
-                MIN(timestamp) as min_ts,
-                MAX(timestamp) as max_ts,
-                to_timestamp(MIN(timestamp)/1000) as min_date,
-                to_timestamp(MAX(timestamp)/1000) as max_date
-            FROM events
-        """, conn)
+        backend = backend or get_backend()
+        print(f"[INFO] Data backend: {backend.name}")
         
-        print(f"[INFO] Data range: {time_info['min_date'].iloc[0]} to {time_info['max_date'].iloc[0]}")
+        min_ts, max_ts = backend.time_range("events")
         
-        min_ts = time_info['min_ts'].iloc[0]
-        max_ts = time_info['max_ts'].iloc[0]
+        print(f"[INFO] Data range: {pd.to_datetime(min_ts, unit='ms')} to {pd.to_datetime(max_ts, unit='ms')}")
         
         # Calculate time decay based on data's actual time range
         cutoff_ts = min_ts + (max_ts - min_ts) * 0.8
                 
         # Overall trending (time-weighted by recency within dataset)
         print("\n[1/2] Computing trending items...")
-        self.trending_items = pd.read_sql(f"""
-            SELECT 
-                itemid,
-                SUM(
-                    CASE WHEN event = 'view' THEN 1 
-                         WHEN event = 'addtocart' THEN 3
-                         WHEN event = 'transaction' THEN 5 
-                    END * 
-                    (timestamp - {min_ts}) / ({max_ts} - {min_ts} + 1)
-                ) as trending_score
-            FROM events
-            WHERE timestamp >= {cutoff_ts}
-            GROUP BY itemid
-            HAVING SUM(
-                CASE WHEN event = 'view' THEN 1 
-                     WHEN event = 'addtocart' THEN 3
-                     WHEN event = 'transaction' THEN 5 
-                END
-            ) > 10
-            ORDER BY trending_score DESC
-            LIMIT 100
-        """, conn)['itemid'].tolist()
+        self.trending_items = backend.trending_items(min_ts, max_ts, cutoff_ts, n=100)
         
         print(f"[OK] Found {len(self.trending_items)} trending items")
         
         # Trending by category
         print("\n[2/2] Computing category trends...")
-        category_trends = pd.read_sql(f"""
-            WITH trending_scores AS (
-                SELECT 
-                    ip.categoryid,
-                    e.itemid,
-                    SUM(
-                        CASE WHEN e.event = 'view' THEN 1 
-                             WHEN e.event = 'addtocart' THEN 3
-                             WHEN e.event = 'transaction' THEN 5 
-                        END * 
-                        (e.timestamp - {min_ts}) / ({max_ts} - {min_ts} + 1)
-                    ) as trending_score,
-                    ROW_NUMBER() OVER (
-                        PARTITION BY ip.categoryid 
-                        ORDER BY SUM(
-                            CASE WHEN e.event = 'view' THEN 1 
-                                 WHEN e.event = 'addtocart' THEN 3
-                                 WHEN e.event = 'transaction' THEN 5 
-                            END * 
-                            (e.timestamp - {min_ts}) / ({max_ts} - {min_ts} + 1)
-                        ) DESC
-                    ) as rn
-                FROM events e
-                JOIN item_properties ip ON e.itemid = ip.itemid
-                WHERE e.timestamp >= {cutoff_ts}
-                  AND ip.categoryid IS NOT NULL
-                GROUP BY ip.categoryid, e.itemid
-            )
-            SELECT categoryid, itemid
-            FROM trending_scores
-            WHERE rn <= 20
-            ORDER BY categoryid, rn
-        """, conn)
+        category_trends = backend.category_trending_items(min_ts, max_ts, cutoff_ts, n=20)
         
-        for cat_id in category_trends['categoryid'].unique():
-            items = category_trends[category_trends['categoryid'] == cat_id]['itemid'].tolist()
-            self.category_trending[int(cat_id)] = items
+        for cat_id, items in category_trends.groupby('categoryid', sort=False)['itemid']:
+            self.category_trending[int(cat_id)] = items.tolist()
         
         print(f"[OK] Found trends for {len(self.category_trending)} categories")
-        
-        conn.close()
+        self.model_version = trained_version()
         
         print("[SUCCESS] Trained!")
     
@@ -131,21 +76,27 @@ class TrendingRecommender:
         return self.trending_items[:n]
     
     def save_model(self, filepath="data/models/trending_model.pkl"):
-        """Save model"""
-        Path(filepath).parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(filepath, 'wb') as f:
-            pickle.dump({
-                'trending_items': self.trending_items,
-                'category_trending': self.category_trending
-            }, f)
+        """Save model (written to a temp file and renamed into place)"""
+        atomic_pickle({
+            'trending_items': self.trending_items,
+            'category_trending': self.category_trending
+        }, filepath)
         
         print(f"[OK] Model saved to {filepath}")
+    
+    def load_model(self, filepath="data/models/trending_model.pkl"):
+        """Load model"""
+        with open(filepath, 'rb') as f:
+            model_data = pickle.load(f)
+        
+        self.trending_items = model_data['trending_items']
+        self.category_trending = model_data['category_trending']
+        self.model_version = artifact_version(filepath)
 
 def main():
     model = TrendingRecommender()
     model.train()
-    model.save_model()
+    publish_model(model, 'trending', legacy_filename='trending_model.pkl')
     
     print("TESTING")
     
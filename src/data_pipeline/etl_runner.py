@@ -1,5 +1,8 @@
 import sys
 import os
+import time
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 # Add src to path
@@ -9,63 +12,206 @@ from data_pipeline.extract.extract_events import extract_events
 from data_pipeline.extract.extract_item_properties import extract_item_properties
 from data_pipeline.extract.extract_category import extract_category
 
-from data_pipeline.transform.clean_events import clean_events
+from data_pipeline.transform.clean_events import clean_events, iter_clean_events
 from data_pipeline.transform.merge_item_properties import merge_item_properties
 from data_pipeline.transform.clean_item_properties import clean_item_properties
 from data_pipeline.transform.clean_category import clean_category
 
-from data_pipeline.load.load_to_postgres import load_to_postgres
+from data_pipeline.load.load_to_postgres import load_to_postgres, stream_to_postgres
+from data_pipeline.load.bulk_load import bulk_load
+from database.event_partitions import partition_preparer
 
-def main():
-    print("\n" + "="*60)
-    print("STARTING ETL PIPELINE")
-    print("="*60 + "\n")
+EVENT_COLUMNS = ["timestamp", "visitorid", "event", "itemid", "transactionid"]
 
-    try:
-        # === EXTRACT ===
-        print("[STEP 1/3] EXTRACTING DATA")
-        print("-"*60)
+# Rows per events.csv chunk in streaming mode
+EVENTS_CHUNK_SIZE = 500000
+
+def _timed(iterable, timings, stage):
+    """Yield from iterable, adding the time spent producing items to timings[stage]"""
+    iterator = iter(iterable)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+            return
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+        yield item
+
+def _load(data, table_name, bulk, n_workers=1, distinct_on=None):
+    """
+    Load a DataFrame or chunk iterator; bulk swaps in a freshly indexed copy of the table
+
+    distinct_on: columns on which rows from different chunks are deduplicated
+    in the database (chunks are only deduplicated within themselves)
+    """
+    # events is partitioned by week; direct loads create missing partitions first
+    prepare = partition_preparer(table_name) if table_name == "events" else None
+
+    if bulk:
+        ok = bulk_load(data, table_name, n_workers=n_workers, distinct_on=distinct_on)
+    elif isinstance(data, pd.DataFrame):
+        ok = load_to_postgres(data, table_name, n_workers=n_workers, prepare=prepare)
+    else:
+        ok = stream_to_postgres(data, table_name, prepare=prepare, distinct_on=distinct_on)
+
+    if not ok:
+        raise RuntimeError(f"Loading {table_name} failed")
+
+def events_chain(timings, stream_events=True, chunksize=EVENTS_CHUNK_SIZE, bulk=True):
+    """Extract -> transform -> load for events.csv"""
+    if not stream_events:
+        started = time.perf_counter()
         events_df = extract_events()
-        merged_props_df = merge_item_properties()
-        categories_df = extract_category()
-        print()
+        timings['extract'] = time.perf_counter() - started
 
-        # === TRANSFORM ===
-        print("[STEP 2/3] TRANSFORMING DATA")
-        print("-"*60)
+        started = time.perf_counter()
         clean_events_df = clean_events(events_df)
-        clean_props_df = clean_item_properties(merged_props_df)
-        clean_categories_df = clean_category(categories_df)
-        print()
-
-        # === LOAD ===
-        print("[STEP 3/3] LOADING TO POSTGRESQL")
-        print("-"*60)
-        
-        # Load events
-        load_to_postgres(
-            clean_events_df[["timestamp", "visitorid", "event", "itemid", "transactionid"]], 
-            "events"
-        )
-        
-        # Load item properties (keep all columns from cleaning)
-        load_to_postgres(clean_props_df, "item_properties")
-        
-        # Load categories
-        load_to_postgres(clean_categories_df, "categories")
-
-        print("\n" + "="*60)
-        print("[SUCCESS] ETL PIPELINE COMPLETED!")
-        print("="*60 + "\n")
-        
-        return True
+        timings['transform'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        _load(clean_events_df[EVENT_COLUMNS], "events", bulk, n_workers=4)
+        timings['load'] = time.perf_counter() - started
+        return
+
+    # Streaming: the stages run interleaved, so time each generator separately.
+    # The transform generator pulls from extract, and load pulls from transform.
+    stage_times = {}
+    raw = _timed(extract_events(chunksize=chunksize), stage_times, 'extract')
+    cleaned = _timed(iter_clean_events(raw), stage_times, 'transform')
+
+    started = time.perf_counter()
+    _load((chunk[EVENT_COLUMNS] for chunk in cleaned), "events", bulk, distinct_on=EVENT_COLUMNS)
+    total = time.perf_counter() - started
+
+    timings['extract'] = stage_times.get('extract', 0.0)
+    timings['transform'] = stage_times.get('transform', 0.0) - timings['extract']
+    timings['load'] = total - stage_times.get('transform', 0.0)
+
+def item_properties_chain(timings, bulk=True):
+    """Merge -> clean -> load for the item_properties parts"""
+    started = time.perf_counter()
+    merged_props_df = merge_item_properties()
+    timings['extract'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    clean_props_df = clean_item_properties(merged_props_df)
+    del merged_props_df
+    timings['transform'] = time.perf_counter() - started
+
+    # Load item properties (keep all columns from cleaning)
+    started = time.perf_counter()
+    _load(clean_props_df, "item_properties", bulk)
+    timings['load'] = time.perf_counter() - started
+
+def category_chain(timings, bulk=True):
+    """Extract -> clean -> load for category_tree.csv"""
+    started = time.perf_counter()
+    categories_df = extract_category()
+    timings['extract'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    clean_categories_df = clean_category(categories_df)
+    timings['transform'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    _load(clean_categories_df, "categories", bulk)
+    timings['load'] = time.perf_counter() - started
 
+CHAINS = {
+    'events': events_chain,
+    'item_properties': item_properties_chain,
+    'categories': category_chain
+}
+
+def run_chain(source, **kwargs):
+    """
+    Run one source chain and report its outcome instead of raising
+
+    Runs in a worker process; every load opens its own connections there.
+    """
+    timings = {}
+    started = time.perf_counter()
+    try:
+        CHAINS[source](timings, **kwargs)
+        status, error = 'ok', None
     except Exception as e:
-        print(f"\n[ERROR] Pipeline failed: {e}")
         import traceback
         traceback.print_exc()
+        status, error = 'failed', f"{type(e).__name__}: {e}"
+
+    timings['total'] = time.perf_counter() - started
+    return {'source': source, 'status': status, 'error': error, 'timings': timings}
+
+def print_summary(results, wall_seconds):
+    """Per-source stage timings"""
+    print("\n" + "="*60)
+    print("ETL SUMMARY")
+    print("="*60)
+    print(f"{'Source':<17} {'Extract':>9} {'Transform':>10} {'Load':>9} {'Total':>9}  Status")
+    print("-" * 68)
+    for result in results:
+        t = result['timings']
+        print(f"{result['source']:<17} "
+              f"{t.get('extract', 0):>8.1f}s {t.get('transform', 0):>9.1f}s "
+              f"{t.get('load', 0):>8.1f}s {t['total']:>8.1f}s  {result['status']}")
+        if result['error']:
+            print(f"  [ERROR] {result['error']}")
+    print("-" * 68)
+    print(f"Wall clock: {wall_seconds:.1f}s")
+
+def main(stream_events=True, chunksize=EVENTS_CHUNK_SIZE, parallel=True, bulk=True):
+    """
+    Run the ETL pipeline
+
+    The events, item_properties and categories chains are independent, so
+    with parallel each runs extract -> transform -> load in its own process
+    (and with its own connections); a failing chain does not stop the others.
+    With stream_events, events are read, cleaned and loaded chunk by chunk
+    instead of as one in-memory frame. With bulk, each table is loaded into
+    an unlogged, index-free staging copy, indexed afterwards and swapped in
+    atomically (see load/bulk_load.py).
+    """
+    print("\n" + "="*60)
+    print("STARTING ETL PIPELINE")
+    print("="*60 + "\n")
+
+    kwargs = {
+        'events': {'stream_events': stream_events, 'chunksize': chunksize, 'bulk': bulk},
+        'item_properties': {'bulk': bulk},
+        'categories': {'bulk': bulk}
+    }
+
+    started = time.perf_counter()
+    results = []
+
+    if parallel:
+        with ProcessPoolExecutor(max_workers=len(CHAINS)) as pool:
+            futures = {source: pool.submit(run_chain, source, **kwargs[source]) for source in CHAINS}
+            for source, future in futures.items():
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # Worker died (e.g. out of memory) rather than raising
+                    results.append({'source': source, 'status': 'failed',
+                                    'error': f"{type(e).__name__}: {e}", 'timings': {'total': 0.0}})
+    else:
+        for source in CHAINS:
+            results.append(run_chain(source, **kwargs[source]))
+
+    print_summary(results, time.perf_counter() - started)
+
+    if any(result['status'] != 'ok' for result in results):
+        print("\n[ERROR] ETL PIPELINE FAILED")
         return False
 
+    print("\n" + "="*60)
+    print("[SUCCESS] ETL PIPELINE COMPLETED!")
+    print("="*60 + "\n")
+
+    return True
+
 if __name__ == "__main__":
     success = main()
     sys.exit(0 if success else 1)
\ No newline at end of file
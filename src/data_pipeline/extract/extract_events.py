@@ -1,17 +1,38 @@
 import pandas as pd
 from pathlib import Path
 
-def extract_events():
-    """Extract events data"""
+# Compact dtypes for events.csv; ids stay nullable so bad rows survive until cleaning
+EVENT_DTYPES = {
+    "timestamp": "Int64",
+    "visitorid": "Int64",
+    "event": "category",
+    "itemid": "Int32",
+    "transactionid": "Int32"
+}
+
+def extract_events(chunksize=None, data_path=None):
+    """
+    Extract events data
+
+    With chunksize set, returns an iterator of DataFrames instead of one frame,
+    so the caller can stream the file with memory bounded by the chunk size.
+    data_path defaults to data/raw/events.csv.
+    """
     print("[INFO] Extracting events data...")
     
     # Get project root (2 levels up from this file)
-    project_root = Path(__file__).parent.parent.parent.parent
-    data_path = project_root / "data" / "raw" / "events.csv"
+    if data_path is None:
+        project_root = Path(__file__).parent.parent.parent.parent
+        data_path = project_root / "data" / "raw" / "events.csv"
+    data_path = Path(data_path)
     
     if not data_path.exists():
         raise FileNotFoundError(f"File not found: {data_path}")
     
-    df = pd.read_csv(data_path)
-    print(f"[OK] Loaded {len(df):,} rows from events.csv")
+    if chunksize:
+        print(f"[INFO] Streaming {data_path.name} in chunks of {chunksize:,} rows")
+        return pd.read_csv(data_path, dtype=EVENT_DTYPES, chunksize=chunksize)
+    
+    df = pd.read_csv(data_path, dtype=EVENT_DTYPES)
+    print(f"[OK] Loaded {len(df):,} rows from {data_path.name}")
     return df
\ No newline at end of file
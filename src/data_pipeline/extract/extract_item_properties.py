@@ -1,8 +1,12 @@
 import pandas as pd
 import os
 
-def extract_item_properties(data_path="../data/processed/item_properties.csv"):
+def extract_item_properties(data_path="../data/processed/item_properties.parquet", columns=None):
+    """Read the merged item properties (Parquet cache or legacy CSV), optionally only some columns"""
     print(" Extracting item properties data...")
-    df = pd.read_csv(data_path)
-    print(f"✅ Loaded {len(df):,} rows from item_properties.csv")
+    if str(data_path).endswith(".parquet"):
+        df = pd.read_parquet(data_path, columns=columns)
+    else:
+        df = pd.read_csv(data_path, usecols=columns)
+    print(f"✅ Loaded {len(df):,} rows from {os.path.basename(data_path)}")
     return df
@@ -0,0 +1,302 @@
+"""
+Synthetic RetailRocket-shaped data for scale testing
+
+Writes events.csv, item_properties_part1.csv, item_properties_part2.csv and
+category_tree.csv with the same columns as the raw RetailRocket files, so the
+ETL, training and evaluation code can run unchanged at 1x-100x volume.
+
+Shape of the data (at scale 1.0, mirroring the real dataset):
+- 2.76M events: ~96.7% view, ~2.5% addtocart, ~0.8% transaction; every cart
+  follows a view and every transaction follows a cart of the same user/item
+- Zipfian item popularity and a long tail of visitor activity
+- 417K items with ~48 property snapshot rows each (categoryid, available, ...)
+- 1,669 categories in a tree up to 6 levels deep under 25 roots
+"""
+import argparse
+import sys
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+# Real dataset volumes at scale 1.0
+BASE_VIEWS = 2_664_312
+BASE_VISITORS = 1_407_580
+BASE_ITEMS = 417_053
+BASE_CATEGORIES = 1_669
+BASE_ROOT_CATEGORIES = 25
+BASE_PROPERTIES = 1_104
+
+# Funnel: P(cart | view) and P(transaction | cart)
+CART_RATE = 69_332 / 2_664_312
+PURCHASE_RATE = 22_457 / 69_332
+
+# Popularity skew (power-law exponents over rank)
+ITEM_EXPONENT = 1.05
+VISITOR_EXPONENT = 0.75
+CATEGORY_EXPONENT = 1.0
+PROPERTY_EXPONENT = 1.2
+
+MAX_CATEGORY_DEPTH = 6
+AVG_PROPERTY_ROWS = 48
+
+# 2015-05-03 .. 2015-09-18, epoch milliseconds
+START_TS = 1430622004384
+END_TS = 1442545187788
+WEEK_MS = 7 * 24 * 60 * 60 * 1000
+
+
+def power_law_ranks(rng, n, size, exponent):
+    """
+    Draw 0-based ranks in [0, n) with P(rank) ~ (rank + 1) ** -exponent
+
+    Uses the continuous inverse CDF, so no n-sized weight array is materialized
+    even for 100M+ ids.
+    """
+    u = rng.random(size)
+    if abs(exponent - 1.0) < 1e-9:
+        x = np.exp(u * np.log(n + 1))
+    else:
+        a = 1.0 - exponent
+        x = ((np.power(n + 1, a) - 1) * u + 1) ** (1 / a)
+    return np.minimum(x.astype(np.int64) - 1, n - 1).clip(0)
+
+
+def scramble(ranks, n, salt):
+    """
+    Map popularity ranks to ids with a fixed affine permutation of [0, n)
+
+    Keeps popular ids spread over the id space like real ids, without
+    storing an n-sized permutation.
+    """
+    multiplier = 2_654_435_761 + 2 * salt
+    while np.gcd(multiplier, n) != 1:
+        multiplier += 2
+    return (ranks * multiplier + salt * 7_919) % n
+
+
+def scaled_sizes(scale):
+    """Entity counts for a scale factor (categories grow with sqrt(scale))"""
+    return {
+        'views': max(1, int(BASE_VIEWS * scale)),
+        'visitors': max(1, int(BASE_VISITORS * scale)),
+        'items': max(1, int(BASE_ITEMS * scale)),
+        'categories': max(2, int(BASE_CATEGORIES * np.sqrt(scale))),
+        'root_categories': max(1, int(BASE_ROOT_CATEGORIES * np.sqrt(scale)))
+    }
+
+
+def generate_category_tree(rng, n_categories, n_roots):
+    """Random category tree with bounded depth; roots have an empty parentid"""
+    category_ids = rng.permutation(n_categories)
+    parents = np.full(n_categories, -1, dtype=np.int64)
+    depth = np.zeros(n_categories, dtype=np.int64)
+
+    for i in range(n_roots, n_categories):
+        # Prefer recent nodes so the tree grows deep as well as wide
+        candidates = np.flatnonzero(depth[:i] < MAX_CATEGORY_DEPTH - 1)
+        offset = int(rng.exponential(0.25) * len(candidates))
+        parent = candidates[max(0, len(candidates) - 1 - offset)]
+        parents[i] = parent
+        depth[i] = depth[parent] + 1
+
+    tree = pd.DataFrame({
+        'categoryid': category_ids,
+        'parentid': pd.array(np.where(parents >= 0, category_ids[parents], -1), dtype='Int64')
+    })
+    tree.loc[parents < 0, 'parentid'] = pd.NA
+
+    print(f"[OK] Category tree: {n_categories:,} categories, {n_roots} roots, depth {depth.max() + 1}")
+    return tree
+
+
+def generate_events(rng, sizes, output_path, chunk_size):
+    """Write events.csv chunk by chunk (view -> addtocart -> transaction funnel)"""
+    n_views = sizes['views']
+    transaction_id = 0
+    counts = {'view': 0, 'addtocart': 0, 'transaction': 0}
+
+    for i, start in enumerate(range(0, n_views, chunk_size)):
+        size = min(chunk_size, n_views - start)
+
+        visitors = scramble(power_law_ranks(rng, sizes['visitors'], size, VISITOR_EXPONENT), sizes['visitors'], 1)
+        items = scramble(power_law_ranks(rng, sizes['items'], size, ITEM_EXPONENT), sizes['items'], 2)
+        view_ts = rng.integers(START_TS, END_TS, size=size)
+
+        # Carts follow views of the same user/item a few minutes later
+        cart_mask = rng.random(size) < CART_RATE
+        cart_ts = np.minimum(view_ts[cart_mask] + rng.exponential(5 * 60_000, cart_mask.sum()).astype(np.int64), END_TS)
+        cart_visitors = visitors[cart_mask]
+        cart_items = items[cart_mask]
+
+        # Transactions follow carts
+        purchase_mask = rng.random(len(cart_ts)) < PURCHASE_RATE
+        purchase_ts = np.minimum(cart_ts[purchase_mask] + rng.exponential(15 * 60_000, purchase_mask.sum()).astype(np.int64), END_TS)
+        n_purchases = len(purchase_ts)
+
+        chunk = pd.DataFrame({
+            'timestamp': np.concatenate([view_ts, cart_ts, purchase_ts]),
+            'visitorid': np.concatenate([visitors, cart_visitors, cart_visitors[purchase_mask]]),
+            'event': np.repeat(['view', 'addtocart', 'transaction'], [size, len(cart_ts), n_purchases]),
+            'itemid': np.concatenate([items, cart_items, cart_items[purchase_mask]]),
+            'transactionid': pd.array(
+                np.concatenate([
+                    np.full(size + len(cart_ts), -1),
+                    np.arange(transaction_id, transaction_id + n_purchases)
+                ]),
+                dtype='Int64'
+            )
+        })
+        chunk.loc[chunk['transactionid'] < 0, 'transactionid'] = pd.NA
+        transaction_id += n_purchases
+
+        # Raw RetailRocket events are not grouped by type
+        chunk = chunk.sample(frac=1.0, random_state=int(rng.integers(2**31)))
+        chunk.to_csv(output_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+
+        counts['view'] += size
+        counts['addtocart'] += len(cart_ts)
+        counts['transaction'] += n_purchases
+
+    total = sum(counts.values())
+    print(f"[OK] events.csv: {total:,} events "
+          f"(view {counts['view']:,}, addtocart {counts['addtocart']:,}, transaction {counts['transaction']:,})")
+    return counts
+
+
+def generate_item_properties(rng, sizes, category_ids, output_dir, chunk_size):
+    """Write item_properties_part1/2.csv as weekly property snapshots per item"""
+    n_items = sizes['items']
+    n_properties = max(10, int(BASE_PROPERTIES * min(1.0, np.sqrt(sizes['items'] / BASE_ITEMS))))
+    snapshot_ts = np.arange(START_TS + WEEK_MS, END_TS, WEEK_MS)
+
+    # Half the items go to each part, like the original split files
+    items_per_chunk = max(1, chunk_size // AVG_PROPERTY_ROWS)
+    n_chunks = (n_items + items_per_chunk - 1) // items_per_chunk
+    paths = [output_dir / "item_properties_part1.csv", output_dir / "item_properties_part2.csv"]
+    written = [False, False]
+    total_rows = 0
+
+    for i, start in enumerate(range(0, n_items, items_per_chunk)):
+        itemids = np.arange(start, min(start + items_per_chunk, n_items))
+
+        # Category: one per item, Zipfian over categories, occasionally re-snapshotted
+        categories = category_ids[scramble(
+            power_law_ranks(rng, len(category_ids), len(itemids), CATEGORY_EXPONENT), len(category_ids), 3
+        )]
+        n_cat_rows = rng.integers(1, 4, size=len(itemids))
+        cat_items = np.repeat(itemids, n_cat_rows)
+        cat_rows = pd.DataFrame({
+            'timestamp': rng.choice(snapshot_ts, size=len(cat_items)),
+            'itemid': cat_items,
+            'property': 'categoryid',
+            'value': np.repeat(categories, n_cat_rows).astype(str)
+        })
+
+        # Availability flag snapshots
+        n_avail_rows = rng.integers(1, 6, size=len(itemids))
+        avail_items = np.repeat(itemids, n_avail_rows)
+        avail_rows = pd.DataFrame({
+            'timestamp': rng.choice(snapshot_ts, size=len(avail_items)),
+            'itemid': avail_items,
+            'property': 'available',
+            'value': rng.integers(0, 2, size=len(avail_items)).astype(str)
+        })
+
+        # Hashed numeric properties ("n123.000" or token lists in the real data)
+        n_other_rows = rng.poisson(AVG_PROPERTY_ROWS - 5, size=len(itemids))
+        other_items = np.repeat(itemids, n_other_rows)
+        numeric = rng.random(len(other_items)) < 0.4
+        values = np.where(
+            numeric,
+            np.char.add(np.char.add('n', rng.integers(1, 100_000, len(other_items)).astype(str)), '.000'),
+            rng.integers(1, 1_000_000, len(other_items)).astype(str)
+        )
+        other_rows = pd.DataFrame({
+            'timestamp': rng.choice(snapshot_ts, size=len(other_items)),
+            'itemid': other_items,
+            'property': power_law_ranks(rng, n_properties, len(other_items), PROPERTY_EXPONENT).astype(str),
+            'value': values
+        })
+
+        chunk = pd.concat([cat_rows, avail_rows, other_rows], ignore_index=True)
+        part = 0 if i < (n_chunks + 1) // 2 else 1
+        chunk.to_csv(paths[part], mode='a' if written[part] else 'w', header=not written[part], index=False)
+        written[part] = True
+        total_rows += len(chunk)
+
+    # Always produce both files, even for tiny scales
+    for part, path in enumerate(paths):
+        if not written[part]:
+            pd.DataFrame(columns=['timestamp', 'itemid', 'property', 'value']).to_csv(path, index=False)
+
+    print(f"[OK] item_properties_part1/2.csv: {total_rows:,} rows for {n_items:,} items")
+    return total_rows
+
+
+def generate_dataset(scale=1.0, output_dir=None, seed=42, chunk_size=1_000_000, force=False):
+    """
+    Generate a full synthetic RetailRocket-shaped raw dataset
+
+    Args:
+        scale: volume multiplier relative to the real dataset (0.01 .. 100)
+        output_dir: target directory (default data/synthetic/scale_<scale>)
+        seed: RNG seed, the same seed and scale give identical files
+        chunk_size: rows generated and written per chunk (bounds memory)
+        force: overwrite existing files
+    """
+    print("\n" + "="*60)
+    print(f"GENERATING SYNTHETIC DATA (scale {scale}x)")
+    print("="*60 + "\n")
+
+    output_dir = Path(output_dir) if output_dir else PROJECT_ROOT / "data" / "synthetic" / f"scale_{scale:g}"
+    files = ["events.csv", "item_properties_part1.csv", "item_properties_part2.csv", "category_tree.csv"]
+
+    existing = [f for f in files if (output_dir / f).exists()]
+    if existing and not force:
+        raise FileExistsError(f"{output_dir} already contains {existing}; pass force=True to overwrite")
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    sizes = scaled_sizes(scale)
+
+    print(f"[INFO] Target: {sizes['views']:,} views, {sizes['visitors']:,} visitors, "
+          f"{sizes['items']:,} items, {sizes['categories']:,} categories")
+    print(f"[INFO] Output: {output_dir}\n")
+
+    tree = generate_category_tree(rng, sizes['categories'], sizes['root_categories'])
+    tree.to_csv(output_dir / "category_tree.csv", index=False)
+
+    generate_events(rng, sizes, output_dir / "events.csv", chunk_size)
+    generate_item_properties(rng, sizes, tree['categoryid'].values, output_dir, chunk_size)
+
+    print("\n" + "="*60)
+    print("[SUCCESS] Synthetic dataset generated!")
+    print("="*60 + "\n")
+
+    return output_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate RetailRocket-shaped synthetic data")
+    parser.add_argument('--scale', type=float, default=1.0, help="volume relative to the real dataset")
+    parser.add_argument('--output-dir', default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=1_000_000)
+    parser.add_argument('--force', action='store_true', help="overwrite existing files")
+    args = parser.parse_args()
+
+    try:
+        generate_dataset(args.scale, args.output_dir, args.seed, args.chunk_size, args.force)
+        return True
+    except Exception as e:
+        print(f"\n[ERROR] Generation failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,233 @@
+"""
+Incremental (watermark-based) event ingestion
+
+Only events at or after the stored high-water mark are loaded. Rows are
+COPYed into a temporary table and inserted with ON CONFLICT DO NOTHING
+against events' unique row index, so re-reading the boundary millisecond
+never creates duplicates and the insert only probes the new rows' keys.
+The insert and the new watermark commit in one transaction. When new rows
+arrived, downstream features and models are refreshed.
+
+Usage:
+    python src/data_pipeline/incremental_etl.py --input data/raw/incoming/*.csv
+"""
+import sys
+import os
+import glob
+import time
+import argparse
+import subprocess
+from pathlib import Path
+
+import psycopg2
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data_pipeline.extract.extract_events import extract_events
+from data_pipeline.transform.clean_events import iter_clean_events
+from data_pipeline.load.load_to_postgres import DB_CONFIG, copy_dataframe, insert_missing
+from database.event_partitions import ensure_event_partitions
+from database.etl_state import ensure_state_table, set_watermark
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+SOURCE = "events"
+
+EVENT_COLUMNS = ["timestamp", "visitorid", "event", "itemid", "transactionid"]
+
+EVENTS_CHUNK_SIZE = 500000
+
+# Republishes the in-process feature store snapshot (ml_models/feature_store.py)
+FEATURE_SNAPSHOT_SCRIPT = "ml_models/feature_store.py"
+
+# Training scripts rerun after new data lands (run from the project root)
+RETRAIN_SCRIPTS = [
+    "ml_models/popularity_recommender.py",
+    "ml_models/trending_items.py",
+    "ml_models/category_cf.py"
+]
+
+
+def get_watermark(cursor, source=SOURCE):
+    """
+    Stored high-water mark for a source
+
+    Falls back to MAX(timestamp) of events after a full reload, which leaves
+    etl_state empty. Returns None for an empty database.
+    """
+    cursor.execute("SELECT watermark FROM etl_state WHERE source = %s", (source,))
+    row = cursor.fetchone()
+    if row is not None and row[0] is not None:
+        return row[0]
+
+    cursor.execute("SELECT MAX(timestamp) FROM events")
+    return cursor.fetchone()[0]
+
+
+def load_new_events(paths, chunksize=EVENTS_CHUNK_SIZE):
+    """
+    Load events newer than the watermark from one or more CSV files
+
+    Returns:
+        dict with the old/new watermark and rows staged/inserted
+    """
+    conn = psycopg2.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+
+    try:
+        ensure_state_table(cursor)
+        watermark = get_watermark(cursor)
+        print(f"[INFO] Current watermark: {watermark}")
+
+        cursor.execute("""
+            CREATE TEMP TABLE events_incoming (LIKE events INCLUDING DEFAULTS)
+            ON COMMIT DROP
+        """)
+
+        staged = 0
+        for path in paths:
+            for chunk in iter_clean_events(extract_events(chunksize=chunksize, data_path=path)):
+                # >= keeps late rows from the boundary millisecond; ON CONFLICT drops repeats
+                if watermark is not None:
+                    chunk = chunk[chunk["timestamp"] >= watermark]
+                if len(chunk):
+                    copy_dataframe(cursor, chunk[EVENT_COLUMNS], "events_incoming")
+                    staged += len(chunk)
+
+        cursor.execute("SELECT MIN(timestamp), MAX(timestamp) FROM events_incoming")
+        min_ts, max_ts = cursor.fetchone()
+        if min_ts is not None:
+            # Own short transaction: the insert below stays open until the watermark commits
+            partition_conn = psycopg2.connect(**DB_CONFIG)
+            try:
+                with partition_conn.cursor() as partition_cursor:
+                    ensure_event_partitions(partition_cursor, min_ts, max_ts)
+                partition_conn.commit()
+            finally:
+                partition_conn.close()
+
+        inserted = insert_missing(cursor, "events_incoming", "events", EVENT_COLUMNS)
+
+        new_watermark = max_ts if max_ts is not None else watermark
+
+        if new_watermark is not None:
+            set_watermark(cursor, new_watermark, inserted, ", ".join(str(p) for p in paths), SOURCE)
+
+        # Insert and watermark become visible together
+        conn.commit()
+
+        print(f"[OK] Staged {staged:,} rows at/after watermark, inserted {inserted:,} new events")
+        print(f"[OK] Watermark: {watermark} -> {new_watermark}")
+
+        return {
+            'watermark_before': watermark,
+            'watermark_after': new_watermark,
+            'staged': staged,
+            'inserted': inserted
+        }
+
+    except Exception:
+        conn.rollback()
+        raise
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def refresh_features():
+    """Fold the newly loaded events into user/item features, then republish the snapshot"""
+    from features.build_features import update_features
+
+    update_features()
+
+    print(f"[INFO] Publishing feature snapshot: {FEATURE_SNAPSHOT_SCRIPT}")
+    subprocess.run([sys.executable, FEATURE_SNAPSHOT_SCRIPT], cwd=PROJECT_ROOT, check=True)
+
+
+def refresh_models():
+    """Rebuild the train/test split and retrain the serving models"""
+    from features.train_test_split import create_train_test_split
+
+    create_train_test_split()
+
+    for script in RETRAIN_SCRIPTS:
+        print(f"[INFO] Retraining: {script}")
+        subprocess.run([sys.executable, script], cwd=PROJECT_ROOT, check=True)
+
+
+def refresh_downstream(retrain=True):
+    """Refresh everything derived from events; returns seconds per stage"""
+    timings = {}
+
+    started = time.perf_counter()
+    refresh_features()
+    timings['features'] = time.perf_counter() - started
+
+    if retrain:
+        started = time.perf_counter()
+        refresh_models()
+        timings['models'] = time.perf_counter() - started
+
+    return timings
+
+
+def resolve_inputs(patterns):
+    """Expand globs; files are processed in name order"""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        if not matches and Path(pattern).exists():
+            matches = [pattern]
+        paths.extend(matches)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load new events since the last watermark")
+    parser.add_argument('--input', nargs='+', default=[str(PROJECT_ROOT / "data" / "raw" / "events.csv")],
+                        help="event CSV files or globs")
+    parser.add_argument('--chunksize', type=int, default=EVENTS_CHUNK_SIZE)
+    parser.add_argument('--no-refresh', action='store_true', help="skip feature/model refresh")
+    parser.add_argument('--no-retrain', action='store_true', help="refresh features only")
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print("INCREMENTAL ETL")
+    print("="*60 + "\n")
+
+    try:
+        paths = resolve_inputs(args.input)
+        if not paths:
+            print(f"[ERROR] No input files match {args.input}")
+            return False
+
+        started = time.perf_counter()
+        result = load_new_events(paths, args.chunksize)
+        print(f"[OK] Load finished in {time.perf_counter() - started:.1f}s")
+
+        if result['inserted'] == 0:
+            print("[SKIP] No new events; downstream refresh not needed")
+        elif args.no_refresh:
+            print("[SKIP] Downstream refresh disabled")
+        else:
+            timings = refresh_downstream(retrain=not args.no_retrain)
+            for stage, seconds in timings.items():
+                print(f"[OK] Refreshed {stage} in {seconds:.1f}s")
+
+        print("\n" + "="*60)
+        print("[SUCCESS] INCREMENTAL ETL COMPLETED!")
+        print("="*60 + "\n")
+        return True
+
+    except Exception as e:
+        print(f"\n[ERROR] Incremental ETL failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,270 @@
+import psycopg2
+import re
+import time
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+from data_pipeline.load.load_to_postgres import DB_CONFIG, load_to_postgres, stream_to_postgres
+from database.event_partitions import list_partitions, partition_preparer
+
+# Per-session memory for index builds (each index builds on its own connection)
+INDEX_MAINTENANCE_WORK_MEM = '256MB'
+
+# Postgres identifier limit
+MAX_IDENTIFIER = 63
+
+
+def _suffixed(name, suffix):
+    return name[:MAX_IDENTIFIER - len(suffix)] + suffix
+
+
+def table_definitions(cursor, table_name):
+    """
+    Index and key definitions of the live table, as Postgres reports them
+
+    create_schema stays the single place that decides indexes; the bulk
+    loader only replays them on the staging table.
+
+    Returns:
+        (constraints, indexes): lists of (name, definition)
+    """
+    cursor.execute("""
+        SELECT conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype IN ('p', 'u')
+        ORDER BY conname
+    """, (table_name,))
+    constraints = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT i.relname, pg_get_indexdef(x.indexrelid)
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = %s::regclass
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+        ORDER BY i.relname
+    """, (table_name,))
+    indexes = cursor.fetchall()
+
+    return constraints, indexes
+
+
+def dependent_views(cursor, table_name):
+    """
+    Views that select from the table, as (name, definition)
+
+    Views bind to the table's OID, so the swap drops and recreates them
+    against the new table.
+    """
+    cursor.execute("""
+        SELECT DISTINCT v.relname, pg_get_viewdef(v.oid)
+        FROM pg_depend d
+        JOIN pg_rewrite r ON r.oid = d.objid
+        JOIN pg_class v ON v.oid = r.ev_class
+        WHERE d.classid = 'pg_rewrite'::regclass
+          AND d.refobjid = %s::regclass
+          AND v.oid <> d.refobjid
+          AND v.relkind = 'v'
+        ORDER BY v.relname
+    """, (table_name,))
+    return cursor.fetchall()
+
+
+def retarget_index(definition, new_name, table_name):
+    """
+    Point a pg_get_indexdef() statement at another table under another name
+
+    ONLY is dropped so an index on a partitioned table recurses to its partitions.
+    """
+    return re.sub(
+        r'^CREATE (UNIQUE )?INDEX \S+ ON (ONLY )?\S+',
+        lambda m: f"CREATE {m.group(1) or ''}INDEX {new_name} ON {table_name}",
+        definition
+    )
+
+
+def _rename_prefix(name, prefix, new_prefix):
+    """events_staging_20150504 -> events_20150504"""
+    return _suffixed(new_prefix + name[len(prefix):], "")
+
+
+def dedupe_statement(table_name, columns):
+    """DELETE every row but one from each group of rows equal on columns"""
+    cols = ", ".join(columns)
+    return f"""
+        DELETE FROM {table_name}
+        WHERE ctid IN (
+            SELECT ctid FROM (
+                SELECT ctid, ROW_NUMBER() OVER (PARTITION BY {cols}) AS copy_number
+                FROM {table_name}
+            ) numbered
+            WHERE copy_number > 1
+        )
+    """
+
+
+def _execute(statement):
+    """Run one statement on a fresh connection (parallel index builds and per-partition work)"""
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"SET maintenance_work_mem = '{INDEX_MAINTENANCE_WORK_MEM}'")
+            cursor.execute(statement)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def bulk_load(data, table_name, n_workers=4, index_workers=4, batch_size=100000, distinct_on=None):
+    """
+    Replace a table's contents via an unlogged, index-free staging table
+
+    Steps:
+        1. CREATE UNLOGGED TABLE <table>_staging (LIKE <table>) - no indexes
+        2. COPY the data in (DataFrame: n_workers parallel streams; iterable of chunks: streamed),
+           then, with distinct_on, keep one copy of rows equal on those columns
+        3. SET LOGGED, then add keys and build the live table's indexes
+           (indexes in parallel, one connection each)
+        4. ANALYZE
+        5. Swap in one transaction: <table> -> <table>_old, staging -> <table>,
+           and the same for index/constraint/partition names; dependent views
+           are recreated on the new table; then drop the old table
+
+    A partitioned live table (events: weekly ranges on timestamp) gets a
+    partitioned staging table whose partitions are UNLOGGED and created on
+    demand from the data's time range; SET LOGGED then runs per partition,
+    in parallel. Deduplication also runs per partition (equal rows share a
+    timestamp, so they share a partition), before indexes exist.
+
+    Readers see either the old or the new table, never a partial load.
+
+    Returns:
+        True/False like load_to_postgres
+    """
+    staging = _suffixed(table_name, "_staging")
+    old = _suffixed(table_name, "_old")
+    timings = {}
+
+    print(f"[INFO] Bulk loading {table_name} via {staging}...")
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("SELECT to_regclass(%s)", (table_name,))
+        if cursor.fetchone()[0] is None:
+            raise RuntimeError(f"{table_name} does not exist; run create_schema.py first")
+
+        constraints, indexes = table_definitions(cursor, table_name)
+        views = dependent_views(cursor, table_name)
+
+        cursor.execute("SELECT pg_get_partkeydef(%s::regclass)", (table_name,))
+        partition_key = cursor.fetchone()[0]
+
+        # 1. Staging table without indexes or WAL
+        cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+        if partition_key:
+            # A partitioned parent has no storage (and cannot be UNLOGGED); its partitions are
+            cursor.execute(f"CREATE TABLE {staging} (LIKE {table_name} INCLUDING DEFAULTS) "
+                           f"PARTITION BY {partition_key}")
+            prepare = partition_preparer(staging, unlogged=True)
+        else:
+            cursor.execute(f"CREATE UNLOGGED TABLE {staging} (LIKE {table_name} INCLUDING DEFAULTS)")
+            prepare = None
+        conn.commit()
+
+        # 2. COPY
+        started = time.perf_counter()
+        if isinstance(data, pd.DataFrame):
+            ok = load_to_postgres(data, staging, batch_size=batch_size, n_workers=n_workers,
+                                  prepare=prepare)
+        else:
+            ok = stream_to_postgres(data, staging, batch_size=batch_size, prepare=prepare)
+        if not ok:
+            raise RuntimeError(f"COPY into {staging} failed")
+        timings['copy'] = time.perf_counter() - started
+
+        partitions = list_partitions(cursor, staging) if partition_key else []
+
+        if distinct_on:
+            started = time.perf_counter()
+            targets = partitions if partition_key else [staging]
+            with ThreadPoolExecutor(max_workers=max(1, index_workers)) as pool:
+                list(pool.map(_execute, [dedupe_statement(name, distinct_on) for name in targets]))
+            timings['dedupe'] = time.perf_counter() - started
+
+        # 3. Durable, then keys and indexes
+        started = time.perf_counter()
+        if partition_key:
+            with ThreadPoolExecutor(max_workers=max(1, index_workers)) as pool:
+                list(pool.map(_execute, [f"ALTER TABLE {name} SET LOGGED" for name in partitions]))
+        else:
+            cursor.execute(f"ALTER TABLE {staging} SET LOGGED")
+            conn.commit()
+        timings['set_logged'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        cursor.execute(f"SET maintenance_work_mem = '{INDEX_MAINTENANCE_WORK_MEM}'")
+        for name, definition in constraints:
+            # ADD CONSTRAINT takes an exclusive lock, so keys build before the parallel indexes
+            cursor.execute(f"ALTER TABLE {staging} ADD CONSTRAINT {_suffixed(name, '_new')} {definition}")
+        conn.commit()
+
+        statements = [retarget_index(definition, _suffixed(name, "_new"), staging)
+                      for name, definition in indexes]
+        if statements:
+            with ThreadPoolExecutor(max_workers=max(1, index_workers)) as pool:
+                list(pool.map(_execute, statements))
+        timings['indexes'] = time.perf_counter() - started
+
+        # 4. Planner statistics
+        started = time.perf_counter()
+        cursor.execute(f"ANALYZE {staging}")
+        conn.commit()
+        timings['analyze'] = time.perf_counter() - started
+
+        # 5. Atomic swap
+        started = time.perf_counter()
+        cursor.execute(f"DROP TABLE IF EXISTS {old}")
+        cursor.execute(f"LOCK TABLE {table_name} IN ACCESS EXCLUSIVE MODE")
+        old_partitions = list_partitions(cursor, table_name) if partition_key else []
+
+        for name, _ in views:
+            cursor.execute(f"DROP VIEW {name}")
+
+        cursor.execute(f"ALTER TABLE {table_name} RENAME TO {old}")
+        for name in old_partitions:
+            cursor.execute(f"ALTER TABLE {name} RENAME TO {_rename_prefix(name, table_name, old)}")
+        for name in partitions:
+            cursor.execute(f"ALTER TABLE {name} RENAME TO {_rename_prefix(name, staging, table_name)}")
+        for name, _ in constraints:
+            cursor.execute(f"ALTER TABLE {old} RENAME CONSTRAINT {name} TO {_suffixed(name, '_old')}")
+            cursor.execute(f"ALTER TABLE {staging} RENAME CONSTRAINT {_suffixed(name, '_new')} TO {name}")
+        for name, _ in indexes:
+            cursor.execute(f"ALTER INDEX {name} RENAME TO {_suffixed(name, '_old')}")
+            cursor.execute(f"ALTER INDEX {_suffixed(name, '_new')} RENAME TO {name}")
+        cursor.execute(f"ALTER TABLE {staging} RENAME TO {table_name}")
+
+        for name, definition in views:
+            cursor.execute(f"CREATE VIEW {name} AS {definition}")
+        conn.commit()
+
+        # Separate transaction: readers queued on the old table finish against it
+        cursor.execute(f"DROP TABLE {old}")
+        conn.commit()
+        timings['swap'] = time.perf_counter() - started
+
+        print(f"[OK] Swapped in {table_name} "
+              + ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in timings.items()))
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        print(f"[ERROR] Bulk loading {table_name}: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+    finally:
+        cursor.close()
+        conn.close()
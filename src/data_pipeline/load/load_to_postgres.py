@@ -1,6 +1,8 @@
 import psycopg2
-from psycopg2.extras import execute_values
+import io
 import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from tqdm import tqdm
 
@@ -14,45 +16,187 @@ DB_CONFIG = {
     'port': os.getenv('DB_PORT')
 }
 
-def load_to_postgres(df, table_name, batch_size=10000):
-    """Load dataframe to PostgreSQL table"""
+def _copy_ready(df):
+    """
+    Render whole-number float columns as integers
+
+    INSERT used to coerce 12.0 into an INTEGER column; COPY rejects "12.0",
+    so NaN-widened id columns are converted to nullable Int64 first.
+    """
+    for col in df.select_dtypes(include="float").columns:
+        values = df[col].dropna()
+        if (values == np.floor(values)).all():
+            df = df.assign(**{col: df[col].astype("Int64")})
+    return df
+
+def copy_dataframe(cursor, df, table_name, batch_size=100000, pbar=None):
+    """
+    Stream a DataFrame into a table with COPY ... FROM STDIN (CSV)
+
+    Each batch is serialized column-wise by pandas into an in-memory
+    buffer, so rows never become Python tuples. Empty fields load as NULL.
+    """
+    df = _copy_ready(df)
+    cols = ", ".join(df.columns)
+    query = f"COPY {table_name} ({cols}) FROM STDIN WITH (FORMAT csv)"
+
+    for start in range(0, len(df), batch_size):
+        batch = df.iloc[start:start + batch_size]
+
+        buffer = io.StringIO()
+        batch.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+        cursor.copy_expert(query, buffer)
+
+        if pbar is not None:
+            pbar.update(len(batch))
+
+def insert_missing(cursor, source, table_name, columns):
+    """
+    INSERT the rows of source that table_name does not already hold
+
+    Relies on a unique index over the row's identity on table_name (events:
+    idx_events_unique_row): each row is one index probe, so the cost follows
+    the size of source, not of the table. Repeats within source collapse too.
+
+    Returns:
+        rows inserted
+    """
+    cols = ", ".join(columns)
+    cursor.execute(f"""
+        INSERT INTO {table_name} ({cols})
+        SELECT {cols} FROM {source}
+        ON CONFLICT DO NOTHING
+    """)
+    return cursor.rowcount
+
+def _copy_slice(df, table_name, batch_size, pbar):
+    """COPY one slice of rows on its own connection (one transaction)"""
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            copy_dataframe(cursor, df, table_name, batch_size, pbar)
+        conn.commit()
+    finally:
+        conn.close()
+
+def load_to_postgres(df, table_name, batch_size=100000, n_workers=1, prepare=None):
+    """
+    Load dataframe to PostgreSQL table using COPY
+
+    Args:
+        df: rows to load, columns named like the table columns
+        table_name: target table
+        batch_size: rows serialized per COPY buffer
+        n_workers: parallel COPY streams, each on its own connection
+                   loading a contiguous slice of rows
+        prepare: optional prepare(cursor, df) run and committed before any
+                 COPY, e.g. to create partitions for the frame's time range
+    """
     print(f"[INFO] Loading {len(df):,} rows to {table_name}...")
-    
+
     try:
+        if prepare is not None:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cursor:
+                prepare(cursor, df)
+            conn.commit()
+            conn.close()
+
+        n_workers = max(1, min(n_workers, len(df) // batch_size + 1))
+        bounds = np.linspace(0, len(df), n_workers + 1, dtype=np.int64)
+
+        with tqdm(total=len(df), desc=f"Loading {table_name}") as pbar:
+            if n_workers == 1:
+                _copy_slice(df, table_name, batch_size, pbar)
+            else:
+                with ThreadPoolExecutor(max_workers=n_workers) as pool:
+                    futures = [
+                        pool.submit(_copy_slice, df.iloc[lo:hi], table_name, batch_size, pbar)
+                        for lo, hi in zip(bounds[:-1], bounds[1:])
+                    ]
+                    for future in futures:
+                        future.result()
+
+        # Verify count
         conn = psycopg2.connect(**DB_CONFIG)
         cursor = conn.cursor()
-        
-        # Convert DataFrame to list of tuples
-        columns = df.columns.tolist()
-        records = [tuple(row) for row in df.values]
-        
-        # Build insert query
-        cols = ", ".join(columns)
-        query = f"INSERT INTO {table_name} ({cols}) VALUES %s"
-        
-        # Insert in batches with progress bar
-        total_batches = (len(records) + batch_size - 1) // batch_size
-        
-        with tqdm(total=len(records), desc=f"Loading {table_name}") as pbar:
-            for i in range(0, len(records), batch_size):
-                batch = records[i:i+batch_size]
-                execute_values(cursor, query, batch, page_size=1000)
-                conn.commit()
-                pbar.update(len(batch))
-        
+        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+        db_count = cursor.fetchone()[0]
+
+        print(f"[OK] Loaded {db_count:,} rows to {table_name}")
+
+        cursor.close()
+        conn.close()
+
+        return True
+
+    except Exception as e:
+        print(f"[ERROR] Loading to {table_name}: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def stream_to_postgres(chunks, table_name, batch_size=100000, prepare=None, distinct_on=None):
+    """
+    Load an iterator of DataFrames into a table with COPY
+
+    Chunks are consumed one at a time on a single connection and committed
+    together, so only one chunk is held in memory. prepare(cursor, chunk),
+    if given, runs before each chunk is copied on a second connection and
+    is committed at once: DDL such as creating partitions then holds its
+    locks for one short transaction, not for the whole load.
+
+    With distinct_on (a list of columns), each chunk is COPYed into a
+    temporary table and only rows the table does not hold yet are inserted,
+    so duplicates spanning chunks are dropped by the database (the table
+    needs a unique index on those columns, see insert_missing).
+    """
+    print(f"[INFO] Streaming rows to {table_name}...")
+
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        prepare_conn = psycopg2.connect(**DB_CONFIG) if prepare is not None else None
+
+        incoming = f"{table_name}_incoming"
+        if distinct_on:
+            cursor.execute(f"""
+                CREATE TEMP TABLE {incoming} (LIKE {table_name} INCLUDING DEFAULTS)
+                ON COMMIT DROP
+            """)
+
+        with tqdm(desc=f"Loading {table_name}", unit=" rows") as pbar:
+            for chunk in chunks:
+                if prepare is not None:
+                    with prepare_conn.cursor() as prepare_cursor:
+                        prepare(prepare_cursor, chunk)
+                    prepare_conn.commit()
+                if distinct_on:
+                    copy_dataframe(cursor, chunk, incoming, batch_size, pbar)
+                    insert_missing(cursor, incoming, table_name, distinct_on)
+                    cursor.execute(f"TRUNCATE {incoming}")
+                else:
+                    copy_dataframe(cursor, chunk, table_name, batch_size, pbar)
+
+        conn.commit()
+        if prepare_conn is not None:
+            prepare_conn.close()
+
         # Verify count
         cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
         db_count = cursor.fetchone()[0]
-        
+
         print(f"[OK] Loaded {db_count:,} rows to {table_name}")
-        
+
         cursor.close()
         conn.close()
-        
+
         return True
-        
+
     except Exception as e:
         print(f"[ERROR] Loading to {table_name}: {e}")
         import traceback
         traceback.print_exc()
-        return False
\ No newline at end of file
+        return False
@@ -1,8 +1,30 @@
+import numpy as np
 import pandas as pd
 
-def clean_events(df):
+from database.event_types import EVENT_CODES
+
+VALID_EVENTS = list(EVENT_CODES)
+
+def normalize_event(event):
+    """
+    Lower-case/strip event names and encode them as event_types codes (int16)
+
+    Works on the (few) categories rather than on every row; unknown names
+    become 0, which callers drop.
+    """
+    event = event.astype("category")
+    names = event.cat.categories.astype(str).str.lower().str.strip()
+    lookup = np.array([EVENT_CODES.get(name, 0) for name in names], dtype=np.int16)
+    
+    codes = event.cat.codes.to_numpy()
+    encoded = np.where(codes >= 0, lookup[codes], 0).astype(np.int16)
+    
+    return pd.Series(encoded, index=event.index)
+
+def clean_events(df, verbose=True):
     """Clean and preprocess events data."""
-    print("[INFO] Cleaning events data...")
+    if verbose:
+        print("[INFO] Cleaning events data...")
 
     # Drop duplicates and missing keys
     initial_count = len(df)
@@ -10,23 +32,46 @@ def clean_events(df):
     df = df.dropna(subset=["visitorid", "itemid", "event"])
     
     duplicates_removed = initial_count - len(df)
-    print(f"  - Removed {duplicates_removed:,} duplicates/nulls")
+    if verbose:
+        print(f"  - Removed {duplicates_removed:,} duplicates/nulls")
 
     # Ensure correct data types - FIXED: visitorid is int64 (BIGINT)
-    df["timestamp"] = df["timestamp"].astype("int64")
-    df["visitorid"] = df["visitorid"].astype("int64")  # CHANGED from int32
-    df["itemid"] = df["itemid"].astype("int32")
+    df = df.astype({"timestamp": "int64", "visitorid": "int64", "itemid": "int32"})
     
-    # Handle transactionid (can be null)
+    # Handle transactionid (can be null; stored as 0, part of the events unique key)
     if "transactionid" in df.columns:
         df["transactionid"] = df["transactionid"].fillna(0).astype("int32")
 
-    # Normalize event type
-    df["event"] = df["event"].str.lower().str.strip()
+    # Normalize and encode event type (per-category, not per-row string work)
+    df["event"] = normalize_event(df["event"])
     
     # Validate event types
-    valid_events = ["view", "addtocart", "transaction"]
-    df = df[df["event"].isin(valid_events)]
+    df = df[df["event"] > 0]
 
-    print(f"[OK] Cleaned events: {len(df):,} rows remaining")
-    return df
\ No newline at end of file
+    if verbose:
+        print(f"[OK] Cleaned events: {len(df):,} rows remaining")
+    return df
+
+def iter_clean_events(chunks):
+    """
+    Clean a stream of event chunks
+
+    Duplicates are dropped within each chunk only, so memory follows the
+    chunk size. Repeats that span chunks are left to the database: the
+    loaders drop them on insert (see load_to_postgres.insert_missing and
+    bulk_load's distinct_on).
+    """
+    print("[INFO] Cleaning events data (streaming)...")
+    
+    total_in = total_out = 0
+    
+    for chunk in chunks:
+        total_in += len(chunk)
+        chunk = clean_events(chunk, verbose=False)
+        
+        total_out += len(chunk)
+        if len(chunk):
+            yield chunk
+    
+    print(f"  - Removed {total_in - total_out:,} in-chunk duplicates/nulls/invalid events")
+    print(f"[OK] Cleaned events: {total_out:,} rows remaining")
\ No newline at end of file
@@ -1,46 +1,82 @@
+import numpy as np
 import pandas as pd
 
-def clean_item_properties(df):
-    """Clean and pivot item_properties to one row per item"""
-    print("[INFO] Cleaning item_properties...")
+def _aggregate_chunk(df, vocab):
+    """
+    Reduce one block of raw property rows to what the item table needs
 
-    initial_count = len(df)
+    Returns the distinct (itemid, property) keys packed into int64, the
+    max timestamp per item and the (small) subset of categoryid rows.
+    Property codes come from the shared vocab so they agree across chunks.
+    """
+    df = df.dropna(subset=["itemid"])
+    itemid = df["itemid"].to_numpy(dtype=np.int64)
+    timestamp = df["timestamp"].to_numpy(dtype=np.int64)
     
-    # Drop null itemids
-    df = df.dropna(subset=["itemid"]).drop_duplicates()
+    prop = df["property"].astype("category")
+    lookup = np.array(
+        [vocab.setdefault(name, len(vocab)) for name in prop.cat.categories], dtype=np.int64
+    )
+    codes = prop.cat.codes.to_numpy()
+    valid = codes >= 0
+    pairs = pd.unique((itemid[valid] << 32) | lookup[codes[valid]])
     
-    # Ensure correct data types
-    df["itemid"] = df["itemid"].astype("int32")
-    df["timestamp"] = df["timestamp"].astype("int64")
+    max_ts = pd.Series(timestamp).groupby(itemid).max()
     
-    # Keep most recent value per item-property
-    df = df.sort_values("timestamp").drop_duplicates(
-        subset=["itemid", "property"], 
-        keep="last"
-    )
+    # Filter before any sort: only categoryid rows are needed row-wise
+    category_rows = df.loc[(prop == "categoryid").to_numpy(), ["itemid", "timestamp", "value"]]
+    
+    return pairs, max_ts, category_rows
+
+def clean_item_properties(data):
+    """
+    Clean and pivot item_properties to one row per item
+
+    Accepts a DataFrame or an iterable of DataFrame chunks (itemid, timestamp,
+    property, value). Only the categoryid rows are kept as rows; everything
+    else is reduced on the fly to distinct property keys and max timestamps.
+    """
+    print("[INFO] Cleaning item_properties...")
+
+    chunks = [data] if isinstance(data, pd.DataFrame) else data
     
-    # Extract categoryid before pivoting
-    category_df = df[df["property"] == "categoryid"][["itemid", "value"]].copy()
-    category_df["categoryid"] = pd.to_numeric(category_df["value"], errors="coerce").astype("Int32")
-    category_df = category_df[["itemid", "categoryid"]].drop_duplicates(subset=["itemid"])
+    vocab = {}
+    pairs = np.empty(0, dtype=np.int64)
+    max_ts_parts, category_parts = [], []
+    initial_count = 0
     
-    # Count properties per item
-    property_counts = df.groupby("itemid").size().reset_index(name="property_count")
+    for chunk in chunks:
+        initial_count += len(chunk)
+        chunk_pairs, chunk_max_ts, chunk_categories = _aggregate_chunk(chunk, vocab)
+        pairs = pd.unique(np.concatenate([pairs, chunk_pairs]))
+        max_ts_parts.append(chunk_max_ts)
+        category_parts.append(chunk_categories)
     
-    # Get all unique items from the data
-    unique_items = df[["itemid"]].drop_duplicates()
+    # Latest timestamp per item (also defines the set of items)
+    latest_timestamps = pd.concat(max_ts_parts).groupby(level=0).max()
     
-    # Merge everything
-    result = unique_items.merge(category_df, on="itemid", how="left")
-    result = result.merge(property_counts, on="itemid", how="left")
+    # Count distinct properties per item
+    property_count = pd.Series(pairs >> 32).value_counts()
     
-    # Fill missing values
-    result["property_count"] = result["property_count"].fillna(0).astype("int32")
-    result["has_metadata"] = result["property_count"] > 0
+    # Most recent categoryid value per item
+    category_df = pd.concat(category_parts, ignore_index=True)
+    category_df = category_df.sort_values("timestamp", kind="stable").drop_duplicates(
+        subset=["itemid"],
+        keep="last"
+    )
+    category = pd.Series(
+        pd.to_numeric(category_df["value"], errors="coerce").astype("Int32").array,
+        index=category_df["itemid"].to_numpy(dtype=np.int64)
+    )
     
-    # Get latest timestamp per item
-    latest_timestamps = df.groupby("itemid")["timestamp"].max().reset_index()
-    result = result.merge(latest_timestamps, on="itemid", how="left")
+    index = latest_timestamps.index
+    result = pd.DataFrame({
+        "itemid": index.to_numpy().astype("int32"),
+        "categoryid": category.reindex(index).array,
+        "property_count": property_count.reindex(index, fill_value=0).to_numpy().astype("int32"),
+    })
+    result["has_metadata"] = result["property_count"] > 0
+    result["timestamp"] = latest_timestamps.to_numpy()
     
     print(f"[OK] Cleaned to {len(result):,} unique items (from {initial_count:,} property records)")
     
@@ -1,9 +1,36 @@
 import pandas as pd
+import json
 import os
 from pathlib import Path
 
-def merge_item_properties():
-    """Merge item_properties parts into one DataFrame."""
+PARTS = ["item_properties_part1.csv", "item_properties_part2.csv"]
+
+PROPERTY_DTYPES = {
+    'timestamp': 'int64',
+    'itemid': 'int32',
+    'property': 'category',
+    'value': 'string'
+}
+
+# Bump when the cached file's layout or dtypes change
+CACHE_VERSION = 1
+
+def _input_signature(data_dir):
+    """Size and mtime of every input part; the cache is valid while this matches"""
+    signature = {'version': CACHE_VERSION, 'inputs': {}}
+    for name in PARTS:
+        stat = (data_dir / name).stat()
+        signature['inputs'][name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    return signature
+
+def merge_item_properties(columns=None, force=False):
+    """
+    Merge item_properties parts into one DataFrame.
+
+    The merged, typed frame is cached as data/processed/item_properties.parquet
+    with a sidecar manifest of the input files' size/mtime. Re-runs with
+    unchanged inputs skip the CSV parse and read only the requested columns.
+    """
     print(" Merging item_properties...")
     
     # Find project root
@@ -13,14 +40,36 @@ def merge_item_properties():
     DATA_DIR = PROJECT_ROOT / "data" / "raw" 
     OUTPUT_DIR = PROJECT_ROOT / "data" / "processed"
     
+    cache_path = OUTPUT_DIR / "item_properties.parquet"
+    manifest_path = OUTPUT_DIR / "item_properties.manifest.json"
+    
+    signature = _input_signature(DATA_DIR)
+    
+    if not force and cache_path.exists() and manifest_path.exists():
+        with open(manifest_path) as f:
+            if json.load(f) == signature:
+                merged = pd.read_parquet(cache_path, columns=columns)
+                print(f"✅ Inputs unchanged, read {len(merged):,} rows from {cache_path.name}")
+                return merged
+    
     # Read and merge
-    part1 = pd.read_csv(DATA_DIR / "item_properties_part1.csv", dtype={'timestamp': 'int64'})
-    part2 = pd.read_csv(DATA_DIR / "item_properties_part2.csv", dtype={'timestamp': 'int64'})
+    part1 = pd.read_csv(DATA_DIR / PARTS[0], dtype=PROPERTY_DTYPES)
+    part2 = pd.read_csv(DATA_DIR / PARTS[1], dtype=PROPERTY_DTYPES)
     merged = pd.concat([part1, part2], ignore_index=True)
+    # concat of two categoricals with different categories falls back to object
+    merged['property'] = merged['property'].astype('category')
     
-    # Save
+    # Save atomically; the manifest goes last, so an interrupted run just rebuilds
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    merged.to_csv(OUTPUT_DIR / "item_properties.csv", index=False)
+    tmp_path = cache_path.with_suffix(".parquet.tmp")
+    merged.to_parquet(tmp_path, index=False, compression="zstd")
+    os.replace(tmp_path, cache_path)
+    
+    with open(manifest_path, 'w') as f:
+        json.dump(signature, f, indent=2)
 
     print(f"✅ Merged {len(part1):,} + {len(part2):,} = {len(merged):,} rows")
+    
+    if columns is not None:
+        merged = merged[columns]
     return merged
\ No newline at end of file
@@ -1,8 +1,15 @@
 import psycopg2
 import sys
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database.event_types import EVENT_CODES, EVENT_WEIGHTS
+from database.etl_state import ensure_state_table
+
 load_dotenv()
 
 DB_CONFIG = {
@@ -21,7 +28,30 @@ def create_schema():
         
         print("Creating tables...")
 
+        # 0. Event type lookup: events.event holds the SMALLINT code
+        print("Creating event_types table...")
+        cursor.execute("""
+            DROP TABLE IF EXISTS event_types CASCADE;
+            
+            CREATE TABLE event_types (
+                event_code SMALLINT PRIMARY KEY,
+                name VARCHAR(20) NOT NULL UNIQUE,
+                weight SMALLINT NOT NULL
+            );
+        """)
+        cursor.executemany(
+            "INSERT INTO event_types (event_code, name, weight) VALUES (%s, %s, %s)",
+            [(code, name, EVENT_WEIGHTS[code]) for name, code in EVENT_CODES.items()]
+        )
+        print("[OK] Event types table created")
+
         # 1. Events table - FIXED: visitorid is now BIGINT
+        # Range-partitioned by week on timestamp; loaders create partitions
+        # on demand (database/event_partitions.py). Indexes are declared on the
+        # parent and built per partition; BRIN suits the time column. The
+        # unique index is the dedup key loaders insert against (ON CONFLICT
+        # DO NOTHING); transactionid is 0 rather than NULL for non-purchases
+        # so equal rows always collide.
         print("Creating events table...")
         cursor.execute("""
             DROP TABLE IF EXISTS events CASCADE;
@@ -29,15 +59,18 @@ def create_schema():
             CREATE TABLE events (
                 timestamp BIGINT NOT NULL,
                 visitorid BIGINT NOT NULL,  -- CHANGED from INTEGER
-                event VARCHAR(50) NOT NULL,
+                event SMALLINT NOT NULL,    -- event_types.event_code
                 itemid INTEGER NOT NULL,
-                transactionid INTEGER
-            );
+                transactionid INTEGER NOT NULL DEFAULT 0
+            ) PARTITION BY RANGE (timestamp);
+            
+            CREATE UNIQUE INDEX idx_events_unique_row
+                ON events(timestamp, visitorid, itemid, event, transactionid);
             
             CREATE INDEX idx_events_visitorid ON events(visitorid);
             CREATE INDEX idx_events_itemid ON events(itemid);
             CREATE INDEX idx_events_event ON events(event);
-            CREATE INDEX idx_events_timestamp ON events(timestamp);
+            CREATE INDEX idx_events_timestamp ON events USING BRIN (timestamp);
         """)
         print("[OK] Events table created")
         
@@ -121,6 +154,43 @@ def create_schema():
         """)
         print("[OK] Item features table created")
         
+        # 6. ETL state (high-water marks for incremental loads)
+        print("Creating etl_state table...")
+        cursor.execute("DROP TABLE IF EXISTS etl_state CASCADE")
+        ensure_state_table(cursor)
+        print("[OK] ETL state table created")
+        
+        # 7. Sessions (features/sessionize.py): events of a visitor with no gap
+        # over 30 minutes; an event belongs to the session whose
+        # [start_ts, end_ts] covers it for the same visitor. session_id is a
+        # hash of (visitorid, start_ts), stable across rebuilds; event_sessions
+        # gives every event its session_id for session-based models.
+        print("Creating sessions table...")
+        cursor.execute("""
+            DROP TABLE IF EXISTS sessions CASCADE;
+            
+            CREATE TABLE sessions (
+                session_id BIGINT PRIMARY KEY,
+                visitorid BIGINT NOT NULL,
+                start_ts BIGINT NOT NULL,
+                end_ts BIGINT NOT NULL,
+                n_events INTEGER NOT NULL,
+                n_views INTEGER NOT NULL,
+                n_addtocarts INTEGER NOT NULL,
+                n_transactions INTEGER NOT NULL
+            );
+            
+            CREATE INDEX idx_sessions_visitor_start ON sessions(visitorid, start_ts);
+            
+            CREATE VIEW event_sessions AS
+            SELECT e.timestamp, e.visitorid, e.event, e.itemid, e.transactionid, s.session_id
+            FROM events e
+            JOIN sessions s
+              ON s.visitorid = e.visitorid
+             AND e.timestamp BETWEEN s.start_ts AND s.end_ts;
+        """)
+        print("[OK] Sessions table created")
+        
         conn.commit()
         
         cursor.execute("""
@@ -0,0 +1,28 @@
+# etl_state: one row per source (events, features, ...) holding the
+# high-water mark of what has been loaded or folded in so far
+
+
+def ensure_state_table(cursor):
+    """Create etl_state if the schema predates it"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS etl_state (
+            source VARCHAR(50) PRIMARY KEY,
+            watermark BIGINT,
+            rows_loaded BIGINT DEFAULT 0,
+            last_input TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def set_watermark(cursor, watermark, rows_loaded, last_input, source):
+    """Advance a source's watermark (never backwards) and add to its row count"""
+    cursor.execute("""
+        INSERT INTO etl_state (source, watermark, rows_loaded, last_input, updated_at)
+        VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
+        ON CONFLICT (source) DO UPDATE SET
+            watermark = GREATEST(etl_state.watermark, EXCLUDED.watermark),
+            rows_loaded = etl_state.rows_loaded + EXCLUDED.rows_loaded,
+            last_input = EXCLUDED.last_input,
+            updated_at = EXCLUDED.updated_at
+    """, (source, watermark, rows_loaded, last_input))
@@ -0,0 +1,81 @@
+from datetime import datetime, timezone
+
+# events is range-partitioned on timestamp (epoch ms), one partition per week
+WEEK_MS = 7 * 24 * 60 * 60 * 1000
+
+
+def partition_name(table_name, start_ts):
+    """events_20150504-style name for the partition starting at start_ts"""
+    start = datetime.fromtimestamp(start_ts / 1000, tz=timezone.utc)
+    return f"{table_name}_{start:%Y%m%d}"
+
+
+def week_bounds(min_ts, max_ts):
+    """[start, end) week ranges (epoch-aligned) covering min_ts..max_ts"""
+    first = (int(min_ts) // WEEK_MS) * WEEK_MS
+    last = (int(max_ts) // WEEK_MS) * WEEK_MS
+    return [(start, start + WEEK_MS) for start in range(first, last + WEEK_MS, WEEK_MS)]
+
+
+def list_partitions(cursor, table_name="events"):
+    """Names of the partitions attached to a partitioned table"""
+    cursor.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        ORDER BY c.relname
+    """, (table_name,))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def ensure_event_partitions(cursor, min_ts, max_ts, table_name="events", unlogged=False):
+    """
+    Create any missing weekly partitions for timestamps in [min_ts, max_ts]
+
+    Each partition is created as a standalone table and then attached.
+    ATTACH PARTITION takes only a SHARE UPDATE EXCLUSIVE lock on the parent
+    (CREATE TABLE ... PARTITION OF would take ACCESS EXCLUSIVE). So readers of
+    the parent are not blocked, and neither is a loader's open COPY
+    transaction on another connection. Commit right after calling this;
+    loaders run it on its own connection (see partition_preparer).
+
+    Returns:
+        list of partitions created
+    """
+    existing = set(list_partitions(cursor, table_name))
+    created = []
+
+    for start, end in week_bounds(min_ts, max_ts):
+        name = partition_name(table_name, start)
+        if name in existing:
+            continue
+        cursor.execute(f"""
+            CREATE {'UNLOGGED ' if unlogged else ''}TABLE {name}
+            (LIKE {table_name} INCLUDING DEFAULTS)
+        """)
+        cursor.execute(f"""
+            ALTER TABLE {table_name} ATTACH PARTITION {name}
+            FOR VALUES FROM ({start}) TO ({end})
+        """)
+        created.append(name)
+
+    if created:
+        print(f"[INFO] Created {len(created)} partition(s) of {table_name}")
+    return created
+
+
+def partition_preparer(table_name="events", unlogged=False):
+    """
+    Loader hook (prepare=...): ensure partitions for a frame's time range before COPY
+
+    The loaders call it on a separate connection and commit straight away,
+    so a new week costs one short transaction instead of riding along in
+    the (long) load transaction.
+    """
+    def prepare(cursor, df):
+        if len(df):
+            ensure_event_partitions(
+                cursor, df["timestamp"].min(), df["timestamp"].max(), table_name, unlogged
+            )
+    return prepare
@@ -0,0 +1,12 @@
+# Event type codes stored in events.event (SMALLINT) and the event_types lookup table.
+# Single source of truth: ml_models/event_types.py re-exports these values, so
+# model weights and stored codes cannot drift apart.
+VIEW = 1
+ADDTOCART = 2
+TRANSACTION = 3
+
+EVENT_CODES = {'view': VIEW, 'addtocart': ADDTOCART, 'transaction': TRANSACTION}
+EVENT_NAMES = {code: name for name, code in EVENT_CODES.items()}
+
+# Implicit-feedback strength of each event type (event_types.weight)
+EVENT_WEIGHTS = {VIEW: 1, ADDTOCART: 3, TRANSACTION: 5}
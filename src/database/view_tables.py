@@ -1,8 +1,15 @@
 import pandas as pd
 import os
+import sys
 import sqlalchemy
+from pathlib import Path
 from dotenv import load_dotenv
 
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database.event_types import VIEW, ADDTOCART, TRANSACTION
+
 load_dotenv()
 
 DB_CONFIG = {
@@ -57,11 +64,12 @@ def view_statistics():
     print("EVENT TYPES:")
     events_stats = pd.read_sql("""
         SELECT 
-            event,
+            et.name as event,
             COUNT(*) as count,
             ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER(), 2) as percentage
-        FROM events
-        GROUP BY event
+        FROM events e
+        JOIN event_types et ON et.event_code = e.event
+        GROUP BY et.name
         ORDER BY count DESC
     """, engine)
     print(events_stats.to_string(index=False))
@@ -97,12 +105,12 @@ def view_statistics():
     
     # Top items by views
     print("\n\nTOP 10 MOST VIEWED ITEMS:")
-    top_items = pd.read_sql("""
+    top_items = pd.read_sql(f"""
         SELECT 
             itemid,
             COUNT(*) as views
         FROM events
-        WHERE event = 'view'
+        WHERE event = {VIEW}
         GROUP BY itemid
         ORDER BY views DESC
         LIMIT 10
@@ -111,11 +119,11 @@ def view_statistics():
     
     # Conversion funnel
     print("\n\nCONVERSION FUNNEL:")
-    funnel = pd.read_sql("""
+    funnel = pd.read_sql(f"""
         SELECT 
-            SUM(CASE WHEN event = 'view' THEN 1 ELSE 0 END) as views,
-            SUM(CASE WHEN event = 'addtocart' THEN 1 ELSE 0 END) as add_to_cart,
-            SUM(CASE WHEN event = 'transaction' THEN 1 ELSE 0 END) as transactions
+            COUNT(*) FILTER (WHERE event = {VIEW}) as views,
+            COUNT(*) FILTER (WHERE event = {ADDTOCART}) as add_to_cart,
+            COUNT(*) FILTER (WHERE event = {TRANSACTION}) as transactions
         FROM events
     """, engine)
     
@@ -0,0 +1,428 @@
+import psycopg2
+import os
+import sys
+import time
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database.event_types import VIEW, ADDTOCART, TRANSACTION
+from database.etl_state import ensure_state_table, set_watermark
+
+load_dotenv()
+
+DB_CONFIG = {
+    'dbname': os.getenv('DB_NAME'),
+    'user': os.getenv('DB_USER'),
+    'password': os.getenv('DB_PASSWORD'),
+    'host': os.getenv('DB_HOST'),
+    'port': os.getenv('DB_PORT')
+}
+
+# Session memory for the hash aggregates below
+FEATURE_WORK_MEM = '256MB'
+
+# trending_score decay: exp(-age / 30 days)
+TRENDING_DECAY_SECONDS = 86400 * 30
+
+# etl_state row: newest event timestamp already counted into the features
+FEATURES_SOURCE = 'features'
+
+
+def aggregate_pairs(cursor, source="events", since=None):
+    """
+    The only scan of the event log: per (visitor, item) counters
+
+    Everything else (user/item counters, segments, favorite category,
+    trending score) is derived from this temp table; repeat interactions
+    with an item collapse into one row, so it is never larger than the log.
+    With since, only events after that timestamp are aggregated (the BRIN
+    index and weekly partitions keep this to the newest blocks).
+    """
+    where = "WHERE timestamp > %(since)s" if since is not None else ""
+    cursor.execute("DROP TABLE IF EXISTS pair_agg")
+    cursor.execute(f"""
+        CREATE TEMP TABLE pair_agg AS
+        SELECT
+            visitorid,
+            itemid,
+            COUNT(*) as events,
+            COUNT(*) FILTER (WHERE event = {VIEW}) as views,
+            COUNT(*) FILTER (WHERE event = {ADDTOCART}) as carts,
+            COUNT(*) FILTER (WHERE event = {TRANSACTION}) as transactions,
+            MAX(timestamp) as last_ts,
+            COALESCE(SUM(
+                EXP(-(EXTRACT(EPOCH FROM NOW()) - timestamp / 1000) / {TRENDING_DECAY_SECONDS})
+            ) FILTER (WHERE event = {VIEW}), 0) as trending
+        FROM {source}
+        {where}
+        GROUP BY visitorid, itemid
+    """, {'since': since})
+    cursor.execute("ANALYZE pair_agg")
+
+    cursor.execute("SELECT COUNT(*) FROM pair_agg")
+    return cursor.fetchone()[0]
+
+
+def upsert_user_features(cursor):
+    """User counters and segment; favorite_category is filled separately"""
+    cursor.execute("""
+        INSERT INTO user_features (
+            visitorid, total_events, total_views, total_addtocarts, total_transactions,
+            last_interaction_timestamp, user_segment
+        )
+        SELECT
+            visitorid,
+            SUM(events),
+            SUM(views),
+            SUM(carts),
+            SUM(transactions),
+            MAX(last_ts),
+            CASE
+                WHEN SUM(events) > 100 THEN 'power_user'
+                WHEN SUM(transactions) > 0 THEN 'converter'
+                ELSE 'casual'
+            END
+        FROM pair_agg
+        GROUP BY visitorid
+        ON CONFLICT (visitorid) DO UPDATE SET
+            total_events = EXCLUDED.total_events,
+            total_views = EXCLUDED.total_views,
+            total_addtocarts = EXCLUDED.total_addtocarts,
+            total_transactions = EXCLUDED.total_transactions,
+            last_interaction_timestamp = EXCLUDED.last_interaction_timestamp,
+            user_segment = EXCLUDED.user_segment
+    """)
+    return cursor.rowcount
+
+
+def update_favorite_category(cursor, pairs="pair_agg"):
+    """Most interacted category per user (event counts summed from pairs)"""
+    cursor.execute(f"""
+        UPDATE user_features uf
+        SET favorite_category = fav.categoryid
+        FROM (
+            SELECT DISTINCT ON (p.visitorid)
+                p.visitorid,
+                ip.categoryid
+            FROM {pairs} p
+            JOIN item_properties ip ON p.itemid = ip.itemid
+            WHERE ip.categoryid IS NOT NULL
+            GROUP BY p.visitorid, ip.categoryid
+            ORDER BY p.visitorid, SUM(p.events) DESC, ip.categoryid
+        ) fav
+        WHERE uf.visitorid = fav.visitorid
+          AND uf.favorite_category IS DISTINCT FROM fav.categoryid
+    """)
+    return cursor.rowcount
+
+
+def upsert_item_features(cursor):
+    """Item counters, conversion rate, popularity and trending score"""
+    cursor.execute("""
+        INSERT INTO item_features (
+            itemid, total_views, total_addtocarts, total_transactions,
+            conversion_rate, popularity_score, trending_score
+        )
+        SELECT
+            itemid,
+            SUM(views),
+            SUM(carts),
+            SUM(transactions),
+            CASE WHEN SUM(views) > 0 THEN SUM(transactions)::FLOAT / SUM(views) ELSE 0 END,
+            LOG(1 + SUM(views)::FLOAT),
+            SUM(trending)
+        FROM pair_agg
+        GROUP BY itemid
+        ON CONFLICT (itemid) DO UPDATE SET
+            total_views = EXCLUDED.total_views,
+            total_addtocarts = EXCLUDED.total_addtocarts,
+            total_transactions = EXCLUDED.total_transactions,
+            conversion_rate = EXCLUDED.conversion_rate,
+            popularity_score = EXCLUDED.popularity_score,
+            trending_score = EXCLUDED.trending_score
+    """)
+    return cursor.rowcount
+
+
+def merge_user_features(cursor):
+    """
+    Add new-event counters to existing users (new users are inserted)
+
+    Counters are additive and the last interaction only moves forward, so
+    only users present in pair_agg are touched; the segment is recomputed
+    from the merged totals.
+    """
+    cursor.execute("""
+        INSERT INTO user_features AS uf (
+            visitorid, total_events, total_views, total_addtocarts, total_transactions,
+            last_interaction_timestamp, user_segment
+        )
+        SELECT
+            visitorid,
+            SUM(events),
+            SUM(views),
+            SUM(carts),
+            SUM(transactions),
+            MAX(last_ts),
+            CASE
+                WHEN SUM(events) > 100 THEN 'power_user'
+                WHEN SUM(transactions) > 0 THEN 'converter'
+                ELSE 'casual'
+            END
+        FROM pair_agg
+        GROUP BY visitorid
+        ON CONFLICT (visitorid) DO UPDATE SET
+            total_events = uf.total_events + EXCLUDED.total_events,
+            total_views = uf.total_views + EXCLUDED.total_views,
+            total_addtocarts = uf.total_addtocarts + EXCLUDED.total_addtocarts,
+            total_transactions = uf.total_transactions + EXCLUDED.total_transactions,
+            last_interaction_timestamp = GREATEST(uf.last_interaction_timestamp,
+                                                  EXCLUDED.last_interaction_timestamp),
+            user_segment = CASE
+                WHEN uf.total_events + EXCLUDED.total_events > 100 THEN 'power_user'
+                WHEN uf.total_transactions + EXCLUDED.total_transactions > 0 THEN 'converter'
+                ELSE 'casual'
+            END
+    """)
+    return cursor.rowcount
+
+
+def update_touched_favorite_category(cursor):
+    """
+    Recompute favorite_category for users with new events
+
+    The favorite depends on the user's whole history, so their events are
+    re-aggregated (through idx_events_visitorid) for touched users only.
+    """
+    cursor.execute("DROP TABLE IF EXISTS touched_pairs")
+    cursor.execute("""
+        CREATE TEMP TABLE touched_pairs AS
+        SELECT e.visitorid, e.itemid, COUNT(*) as events
+        FROM events e
+        WHERE e.visitorid IN (SELECT DISTINCT visitorid FROM pair_agg)
+        GROUP BY e.visitorid, e.itemid
+    """)
+    return update_favorite_category(cursor, pairs="touched_pairs")
+
+
+def merge_item_features(cursor, elapsed_seconds):
+    """
+    Add new-event counters to existing items and recompute their scores
+
+    trending_score is a sum of exp(-age / decay) terms, so the stored
+    scores are first aged by exp(-elapsed / decay) - one multiply over
+    item_features, which keeps untouched items comparable with touched
+    ones - and the new events' terms are added on top.
+    """
+    if elapsed_seconds > 0:
+        cursor.execute(f"""
+            UPDATE item_features
+            SET trending_score = trending_score * EXP(-%s / {TRENDING_DECAY_SECONDS})
+            WHERE trending_score > 0
+        """, (elapsed_seconds,))
+
+    cursor.execute("""
+        INSERT INTO item_features AS f (
+            itemid, total_views, total_addtocarts, total_transactions,
+            conversion_rate, popularity_score, trending_score
+        )
+        SELECT
+            itemid,
+            SUM(views),
+            SUM(carts),
+            SUM(transactions),
+            CASE WHEN SUM(views) > 0 THEN SUM(transactions)::FLOAT / SUM(views) ELSE 0 END,
+            LOG(1 + SUM(views)::FLOAT),
+            SUM(trending)
+        FROM pair_agg
+        GROUP BY itemid
+        ON CONFLICT (itemid) DO UPDATE SET
+            total_views = f.total_views + EXCLUDED.total_views,
+            total_addtocarts = f.total_addtocarts + EXCLUDED.total_addtocarts,
+            total_transactions = f.total_transactions + EXCLUDED.total_transactions,
+            conversion_rate = CASE
+                WHEN f.total_views + EXCLUDED.total_views > 0
+                THEN (f.total_transactions + EXCLUDED.total_transactions)::FLOAT
+                     / (f.total_views + EXCLUDED.total_views)
+                ELSE 0
+            END,
+            popularity_score = LOG(1 + (f.total_views + EXCLUDED.total_views)::FLOAT),
+            trending_score = COALESCE(f.trending_score, 0) + EXCLUDED.trending_score
+    """)
+    return cursor.rowcount
+
+
+def get_feature_state(cursor):
+    """
+    (watermark, seconds since the features were last refreshed)
+
+    Both are None when features were never built through this module.
+    """
+    ensure_state_table(cursor)
+    cursor.execute("""
+        SELECT watermark, EXTRACT(EPOCH FROM (CURRENT_TIMESTAMP::TIMESTAMP - updated_at))
+        FROM etl_state
+        WHERE source = %s
+    """, (FEATURES_SOURCE,))
+    row = cursor.fetchone()
+    if row is None:
+        return None, None
+    return row[0], float(row[1])
+
+
+def _record_watermark(cursor, pairs):
+    cursor.execute("SELECT MAX(last_ts) FROM pair_agg")
+    watermark = cursor.fetchone()[0]
+    if watermark is not None:
+        set_watermark(cursor, watermark, pairs, "pair_agg", source=FEATURES_SOURCE)
+    return watermark
+
+
+def _print_timings(timings):
+    print(f"\n{'Step':<28} {'Seconds':>8}")
+    print("-" * 38)
+    for label, seconds in timings.items():
+        print(f"{label:<28} {seconds:>8.2f}")
+    print("-" * 38)
+    print(f"{'total':<28} {sum(timings.values()):>8.2f}")
+
+
+# (label, function) in execution order; each reads pair_agg
+FEATURE_STEPS = [
+    ('user counters + segment', upsert_user_features),
+    ('favorite_category', update_favorite_category),
+    ('item counters + scores', upsert_item_features)
+]
+
+
+def build_features():
+    """
+    Build user_features and item_features from a single scan of events
+
+    Replaces generate_features.py + complete_features.py (four scans, two
+    of them joined and windowed over the full log). Rows are upserted, so
+    reruns refresh existing features; everything commits at once, together
+    with the watermark update_features() continues from.
+
+    Returns:
+        dict of seconds per step
+    """
+    print("\n" + "="*60)
+    print("BUILDING FEATURES (SINGLE SCAN)")
+    print("="*60 + "\n")
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute(f"SET work_mem = '{FEATURE_WORK_MEM}'")
+
+    timings = {}
+
+    started = time.perf_counter()
+    pairs = aggregate_pairs(cursor)
+    timings['events scan'] = time.perf_counter() - started
+    print(f"[OK] Aggregated events into {pairs:,} (visitor, item) pairs")
+
+    for label, step in FEATURE_STEPS:
+        started = time.perf_counter()
+        rows = step(cursor)
+        timings[label] = time.perf_counter() - started
+        print(f"[OK] {label}: {rows:,} rows")
+
+    ensure_state_table(cursor)
+    watermark = _record_watermark(cursor, pairs)
+
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    print(f"[OK] Features watermark: {watermark}")
+    _print_timings(timings)
+
+    return timings
+
+
+def update_features():
+    """
+    Fold events newer than the features watermark into the feature tables
+
+    Additive counters (views, carts, transactions, events) are added to the
+    stored rows and the last interaction timestamp moves forward; derived
+    fields (segment, conversion_rate, popularity_score, favorite_category)
+    are recomputed for touched users/items only. Falls back to
+    build_features() when no watermark has been recorded yet.
+
+    Events are taken strictly after the watermark: a late row carrying the
+    watermark's own millisecond is only counted by the next full build.
+
+    Returns:
+        dict of seconds per step
+    """
+    conn = psycopg2.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    watermark, elapsed = get_feature_state(cursor)
+    conn.commit()
+
+    if watermark is None:
+        cursor.close()
+        conn.close()
+        print("[INFO] No features watermark yet; running a full build")
+        return build_features()
+
+    print("\n" + "="*60)
+    print("UPDATING FEATURES (INCREMENTAL)")
+    print("="*60 + "\n")
+    print(f"[INFO] Features watermark: {watermark}")
+
+    cursor.execute(f"SET work_mem = '{FEATURE_WORK_MEM}'")
+    timings = {}
+
+    try:
+        started = time.perf_counter()
+        pairs = aggregate_pairs(cursor, since=watermark)
+        timings['events scan'] = time.perf_counter() - started
+        print(f"[OK] Aggregated new events into {pairs:,} (visitor, item) pairs")
+
+        if pairs == 0:
+            print("[SKIP] No events after the watermark")
+            conn.rollback()
+            return timings
+
+        steps = [
+            ('user counters + segment', merge_user_features),
+            ('favorite_category', update_touched_favorite_category),
+            ('item counters + scores', lambda cur: merge_item_features(cur, elapsed))
+        ]
+        for label, step in steps:
+            started = time.perf_counter()
+            rows = step(cursor)
+            timings[label] = time.perf_counter() - started
+            print(f"[OK] {label}: {rows:,} rows")
+
+        new_watermark = _record_watermark(cursor, pairs)
+
+        # Merged rows and the new watermark become visible together
+        conn.commit()
+
+    except Exception:
+        conn.rollback()
+        raise
+
+    finally:
+        cursor.close()
+        conn.close()
+
+    print(f"[OK] Features watermark: {watermark} -> {new_watermark}")
+    _print_timings(timings)
+
+    return timings
+
+
+if __name__ == "__main__":
+    if "--incremental" in sys.argv:
+        update_features()
+    else:
+        build_features()
+    print("\n[SUCCESS] Features built!")
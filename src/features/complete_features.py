@@ -1,7 +1,14 @@
 import psycopg2
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database.event_types import VIEW
+
 load_dotenv()
 
 DB_CONFIG = {
@@ -54,16 +61,15 @@ def fill_trending_score():
     conn = psycopg2.connect(**DB_CONFIG)
     cursor = conn.cursor()
     
-    query = """
+    query = f"""
     UPDATE item_features if
     SET trending_score = subq.trending
     FROM (
         SELECT 
             itemid,
-            SUM(
-                CASE WHEN event = 'view' THEN 1 ELSE 0 END * 
+            COALESCE(SUM(
                 EXP(-(EXTRACT(EPOCH FROM NOW() - to_timestamp(timestamp/1000))/(86400*30)))
-            ) as trending
+            ) FILTER (WHERE event = {VIEW}), 0) as trending
         FROM events
         GROUP BY itemid
     ) subq
@@ -1,8 +1,15 @@
 import psycopg2
 import pandas as pd
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database.event_types import VIEW, ADDTOCART, TRANSACTION
+
 load_dotenv()
 
 DB_CONFIG = {
@@ -22,20 +29,20 @@ def generate_user_features():
     
     print("[INFO] Calculating user behavior metrics...")
     
-    query = """
+    query = f"""
     INSERT INTO user_features
     SELECT 
         visitorid,
         COUNT(*) as total_events,
-        SUM(CASE WHEN event = 'view' THEN 1 ELSE 0 END) as total_views,
-        SUM(CASE WHEN event = 'addtocart' THEN 1 ELSE 0 END) as total_addtocarts,
-        SUM(CASE WHEN event = 'transaction' THEN 1 ELSE 0 END) as total_transactions,
+        COUNT(*) FILTER (WHERE event = {VIEW}) as total_views,
+        COUNT(*) FILTER (WHERE event = {ADDTOCART}) as total_addtocarts,
+        COUNT(*) FILTER (WHERE event = {TRANSACTION}) as total_transactions,
         NULL as favorite_category,
         NULL as avg_session_duration,
         MAX(timestamp) as last_interaction_timestamp,
         CASE 
             WHEN COUNT(*) > 100 THEN 'power_user'
-            WHEN SUM(CASE WHEN event = 'transaction' THEN 1 ELSE 0 END) > 0 THEN 'converter'
+            WHEN COUNT(*) FILTER (WHERE event = {TRANSACTION}) > 0 THEN 'converter'
             ELSE 'casual'
         END as user_segment,
         CURRENT_TIMESTAMP as created_at
@@ -76,21 +83,21 @@ def generate_item_features():
     
     print("[INFO] Calculating item metrics...")
     
-    query = """
+    query = f"""
     INSERT INTO item_features
     SELECT 
         itemid,
-        SUM(CASE WHEN event = 'view' THEN 1 ELSE 0 END) as total_views,
-        SUM(CASE WHEN event = 'addtocart' THEN 1 ELSE 0 END) as total_addtocarts,
-        SUM(CASE WHEN event = 'transaction' THEN 1 ELSE 0 END) as total_transactions,
+        COUNT(*) FILTER (WHERE event = {VIEW}) as total_views,
+        COUNT(*) FILTER (WHERE event = {ADDTOCART}) as total_addtocarts,
+        COUNT(*) FILTER (WHERE event = {TRANSACTION}) as total_transactions,
         CASE 
-            WHEN SUM(CASE WHEN event = 'view' THEN 1 ELSE 0 END) > 0 
-            THEN SUM(CASE WHEN event = 'transaction' THEN 1 ELSE 0 END)::FLOAT / 
-                 SUM(CASE WHEN event = 'view' THEN 1 ELSE 0 END)
+            WHEN COUNT(*) FILTER (WHERE event = {VIEW}) > 0 
+            THEN COUNT(*) FILTER (WHERE event = {TRANSACTION})::FLOAT / 
+                 COUNT(*) FILTER (WHERE event = {VIEW})
             ELSE 0
         END as conversion_rate,
         NULL as avg_time_to_purchase,
-        LOG(1 + SUM(CASE WHEN event = 'view' THEN 1 ELSE 0 END)::FLOAT) as popularity_score,
+        LOG(1 + COUNT(*) FILTER (WHERE event = {VIEW})::FLOAT) as popularity_score,
         NULL as trending_score,
         CURRENT_TIMESTAMP as created_at
     FROM events
@@ -0,0 +1,262 @@
+import psycopg2
+import numpy as np
+import pandas as pd
+import os
+import sys
+import time
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database.event_types import VIEW, ADDTOCART, TRANSACTION
+from data_pipeline.load.load_to_postgres import copy_dataframe
+from data_pipeline.load.bulk_load import bulk_load
+
+load_dotenv()
+
+DB_CONFIG = {
+    'dbname': os.getenv('DB_NAME'),
+    'user': os.getenv('DB_USER'),
+    'password': os.getenv('DB_PASSWORD'),
+    'host': os.getenv('DB_HOST'),
+    'port': os.getenv('DB_PORT')
+}
+
+# A gap longer than this between two events of a visitor starts a new session
+SESSION_GAP_MS = 30 * 60 * 1000
+
+SESSION_COLUMNS = ['session_id', 'visitorid', 'start_ts', 'end_ts',
+                   'n_events', 'n_views', 'n_addtocarts', 'n_transactions']
+
+
+def load_events(table="events"):
+    """The four event columns sessionization needs"""
+    conn = psycopg2.connect(**DB_CONFIG)
+    df = pd.read_sql(f"SELECT visitorid, itemid, event, timestamp FROM {table}", conn)
+    conn.close()
+    return df
+
+
+def _group_starts(*keys):
+    """Boolean mask marking the first row of each run of equal keys (rows already sorted)"""
+    n = len(keys[0])
+    starts = np.zeros(n, dtype=bool)
+    if n:
+        starts[0] = True
+        for key in keys:
+            starts[1:] |= key[1:] != key[:-1]
+    return starts
+
+
+def sort_events(events):
+    """
+    Event columns as arrays sorted by (visitorid, timestamp)
+
+    The one sort sessionization needs; sessionize and item_times_to_purchase
+    both accept its result (or a raw events frame, which they sort).
+    """
+    visitorid = events['visitorid'].to_numpy(dtype=np.int64)
+    timestamp = events['timestamp'].to_numpy(dtype=np.int64)
+    order = np.lexsort((timestamp, visitorid))
+    return {
+        'visitorid': visitorid[order],
+        'timestamp': timestamp[order],
+        'itemid': events['itemid'].to_numpy(dtype=np.int64)[order],
+        'event': events['event'].to_numpy(dtype=np.int16)[order]
+    }
+
+
+def _mix64(x):
+    """splitmix64 finalizer on uint64 arrays (wraps modulo 2**64)"""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def session_ids(visitorid, start_ts):
+    """
+    Stable session ids: a fixed 63-bit hash of (visitorid, start_ts)
+
+    The same session gets the same id on every run, and a session that
+    later events extend keeps its id (its start does not move). A collision
+    between two sessions fails the load on the primary key rather than
+    merging them silently.
+    """
+    mixed = _mix64(_mix64(visitorid.astype(np.uint64)) ^ start_ts.astype(np.uint64))
+    return (mixed >> np.uint64(1)).astype(np.int64)
+
+
+def sessionize(events, gap_ms=SESSION_GAP_MS):
+    """
+    Split each visitor's events into sessions
+
+    Events are sorted by (visitorid, timestamp) once (sort_events); a session
+    starts at a visitor change or where the diff to the previous timestamp
+    exceeds gap_ms. Per-session counters come from np.add.reduceat over the
+    session boundaries.
+
+    Returns:
+        sessions DataFrame (SESSION_COLUMNS), ordered by visitorid, start_ts;
+        session_id is stable across runs (see session_ids)
+    """
+    if isinstance(events, pd.DataFrame):
+        events = sort_events(events)
+    visitorid = events['visitorid']
+    timestamp = events['timestamp']
+    event = events['event']
+
+    new_session = _group_starts(visitorid)
+    new_session[1:] |= np.diff(timestamp) > gap_ms
+
+    starts = np.flatnonzero(new_session)
+    if len(starts) == 0:
+        return pd.DataFrame(columns=SESSION_COLUMNS)
+    ends = np.append(starts[1:], len(visitorid))
+
+    def count(code):
+        return np.add.reduceat((event == code).astype(np.int32), starts)
+
+    return pd.DataFrame({
+        'session_id': session_ids(visitorid[starts], timestamp[starts]),
+        'visitorid': visitorid[starts],
+        'start_ts': timestamp[starts],
+        'end_ts': timestamp[ends - 1],
+        'n_events': (ends - starts).astype(np.int32),
+        'n_views': count(VIEW),
+        'n_addtocarts': count(ADDTOCART),
+        'n_transactions': count(TRANSACTION)
+    })
+
+
+def user_session_durations(sessions):
+    """
+    Average session length per visitor, in seconds
+
+    Single-event sessions count with length 0. sessions must be ordered by
+    visitorid (as sessionize returns them).
+    """
+    visitorid = sessions['visitorid'].to_numpy()
+    duration = (sessions['end_ts'] - sessions['start_ts']).to_numpy(dtype=np.float64) / 1000
+
+    starts = np.flatnonzero(_group_starts(visitorid))
+    counts = np.diff(np.append(starts, len(visitorid)))
+
+    return pd.DataFrame({
+        'visitorid': visitorid[starts],
+        'avg_session_duration': np.add.reduceat(duration, starts) / counts
+    })
+
+
+def item_times_to_purchase(events):
+    """
+    Average seconds from a visitor's first view of an item to buying it
+
+    Works on the (visitorid, timestamp) order of sort_events, so no second
+    sort: within a visitor the first view row of an item is its earliest,
+    which drop_duplicates keeps (a hash pass); purchases are hash-joined to
+    it. Purchases with no earlier view by the same visitor are skipped.
+    """
+    if isinstance(events, pd.DataFrame):
+        events = sort_events(events)
+    event = events['event']
+
+    def rows(code, time_column):
+        mask = event == code
+        return pd.DataFrame({
+            'visitorid': events['visitorid'][mask],
+            'itemid': events['itemid'][mask],
+            time_column: events['timestamp'][mask]
+        })
+
+    first_views = rows(VIEW, 'viewed_at').drop_duplicates(['visitorid', 'itemid'])
+    purchases = rows(TRANSACTION, 'bought_at').merge(first_views, on=['visitorid', 'itemid'])
+    purchases = purchases[purchases['viewed_at'] <= purchases['bought_at']]
+    if purchases.empty:
+        return pd.DataFrame(columns=['itemid', 'avg_time_to_purchase'])
+
+    seconds = (purchases['bought_at'] - purchases['viewed_at']) / 1000
+    return (
+        seconds.groupby(purchases['itemid']).mean()
+        .rename('avg_time_to_purchase').rename_axis('itemid').reset_index()
+    )
+
+
+def _update_from_frame(cursor, df, target, key, column):
+    """COPY (key, column) into a temp table and UPDATE target from it"""
+    temp = f"{target}_{column}_new"
+    cursor.execute(f"DROP TABLE IF EXISTS {temp}")
+    cursor.execute(f"CREATE TEMP TABLE {temp} ({key} BIGINT PRIMARY KEY, {column} FLOAT)")
+    copy_dataframe(cursor, df[[key, column]], temp)
+    cursor.execute(f"""
+        UPDATE {target} t
+        SET {column} = s.{column}
+        FROM {temp} s
+        WHERE t.{key} = s.{key}
+          AND t.{column} IS DISTINCT FROM s.{column}
+    """)
+    return cursor.rowcount
+
+
+def run_sessionization(gap_ms=SESSION_GAP_MS):
+    """
+    Sessionize all events, persist the sessions table and fill
+    user_features.avg_session_duration / item_features.avg_time_to_purchase
+
+    sessions is replaced atomically via bulk_load; both feature columns are
+    updated in one transaction.
+
+    Returns:
+        dict of seconds per step
+    """
+    print("\n" + "="*60)
+    print("SESSIONIZING EVENTS")
+    print("="*60 + "\n")
+
+    timings = {}
+
+    started = time.perf_counter()
+    events = load_events()
+    timings['read events'] = time.perf_counter() - started
+    print(f"[OK] Read {len(events):,} events")
+
+    started = time.perf_counter()
+    ordered = sort_events(events)
+    sessions = sessionize(ordered, gap_ms)
+    durations = user_session_durations(sessions)
+    purchase_times = item_times_to_purchase(ordered)
+    timings['sessionize'] = time.perf_counter() - started
+    print(f"[OK] {len(sessions):,} sessions for {len(durations):,} visitors "
+          f"({len(events) / max(len(sessions), 1):.1f} events/session)")
+    print(f"[OK] Time to purchase for {len(purchase_times):,} items")
+
+    started = time.perf_counter()
+    if not bulk_load(sessions, 'sessions'):
+        raise RuntimeError("Loading sessions failed")
+    timings['load sessions'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    conn = psycopg2.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    users = _update_from_frame(cursor, durations, 'user_features', 'visitorid', 'avg_session_duration')
+    items = _update_from_frame(cursor, purchase_times, 'item_features', 'itemid', 'avg_time_to_purchase')
+    conn.commit()
+    cursor.close()
+    conn.close()
+    timings['update features'] = time.perf_counter() - started
+    print(f"[OK] avg_session_duration: {users:,} users, avg_time_to_purchase: {items:,} items")
+
+    print(f"\n{'Step':<28} {'Seconds':>8}")
+    print("-" * 38)
+    for label, seconds in timings.items():
+        print(f"{label:<28} {seconds:>8.2f}")
+
+    return timings
+
+
+if __name__ == "__main__":
+    run_sessionization()
+    print("\n[SUCCESS] Sessions built!")
@@ -1,6 +1,7 @@
 import pandas as pd
 import psycopg2
 import os
+import math
 from dotenv import load_dotenv
 from datetime import datetime
 
@@ -14,6 +15,26 @@ DB_CONFIG = {
     'port': os.getenv('DB_PORT')
 }
 
+# View name -> comparison against the split timestamp. events_train/events_test
+# are the names the model scripts query; all four read events directly.
+SPLIT_VIEWS = {
+    'train_set': '<',
+    'test_set': '>=',
+    'events_train': '<',
+    'events_test': '>='
+}
+
+def drop_relation(cursor, name):
+    """Drop a view or table of that name, whichever exists"""
+    cursor.execute("""
+        SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)
+    """, (name,))
+    row = cursor.fetchone()
+    if row is None:
+        return
+    kind = "VIEW" if row[0] == 'v' else "TABLE"
+    cursor.execute(f"DROP {kind} {name} CASCADE")
+
 def create_train_test_split():
     """
     Create train/test split based on TIME
@@ -23,6 +44,9 @@ def create_train_test_split():
     - Test: Last 20% of time period
     
     This simulates real-world scenario: train on past, predict future
+    
+    The splits are views with a range predicate on the partitioned events
+    table, so creating them is instant and takes no extra storage.
     """
     print("\n" + "="*60)
     print("CREATING TRAIN/TEST SPLIT")
@@ -32,7 +56,7 @@ def create_train_test_split():
     cursor = conn.cursor()
     
     # Get time range
-    print("[1/4] Analyzing data time range...")
+    print("[1/3] Analyzing data time range...")
     cursor.execute("""
         SELECT 
             MIN(timestamp) as min_ts,
@@ -49,57 +73,40 @@ def create_train_test_split():
     print(f"[OK] Data range: {min_date} to {max_date}")
     print(f"[OK] Total events: {total_events:,}")
     
-    # Calculate 80/20 split point
-    split_ts = min_ts + (max_ts - min_ts) * 0.8
+    # Calculate 80/20 split point (rounded up: same rows as comparing with the exact value)
+    split_ts = math.ceil(min_ts + (max_ts - min_ts) * 0.8)
     split_date = pd.to_datetime(split_ts, unit='ms')
     
     print(f"\n[INFO] Split point: {split_date}")
     print(f"[INFO] Train: {min_date} to {split_date}")
     print(f"[INFO] Test:  {split_date} to {max_date}")
     
-    # Drop existing tables if they exist
-    print("\n[2/4] Dropping old train/test tables...")
-    cursor.execute("DROP TABLE IF EXISTS train_set CASCADE")
-    cursor.execute("DROP TABLE IF EXISTS test_set CASCADE")
+    # Drop existing split relations (views now; tables in older databases)
+    print("\n[2/3] Dropping old train/test relations...")
+    for name in SPLIT_VIEWS:
+        drop_relation(cursor, name)
     conn.commit()
     
-    # Create train set
-    print("\n[3/4] Creating train set...")
-    cursor.execute(f"""
-        CREATE TABLE train_set AS
-        SELECT *
-        FROM events
-        WHERE timestamp < {split_ts}
-    """)
+    # Views over the partitioned events table: the split literal prunes
+    # partitions at plan time, so nothing is copied or re-indexed
+    print("\n[3/3] Creating train/test views...")
+    for name, predicate in SPLIT_VIEWS.items():
+        cursor.execute(f"""
+            CREATE VIEW {name} AS
+            SELECT *
+            FROM events
+            WHERE timestamp {predicate} {split_ts}
+        """)
     conn.commit()
     
     cursor.execute("SELECT COUNT(*) FROM train_set")
     train_count = cursor.fetchone()[0]
     print(f"[OK] Train set: {train_count:,} events ({train_count/total_events*100:.1f}%)")
     
-    # Create test set
-    print("\n[4/4] Creating test set...")
-    cursor.execute(f"""
-        CREATE TABLE test_set AS
-        SELECT *
-        FROM events
-        WHERE timestamp >= {split_ts}
-    """)
-    conn.commit()
-    
     cursor.execute("SELECT COUNT(*) FROM test_set")
     test_count = cursor.fetchone()[0]
     print(f"[OK] Test set: {test_count:,} events ({test_count/total_events*100:.1f}%)")
     
-    # Create indexes for performance
-    print("\n[INFO] Creating indexes...")
-    cursor.execute("CREATE INDEX idx_train_visitor ON train_set(visitorid)")
-    cursor.execute("CREATE INDEX idx_train_item ON train_set(itemid)")
-    cursor.execute("CREATE INDEX idx_test_visitor ON test_set(visitorid)")
-    cursor.execute("CREATE INDEX idx_test_item ON test_set(itemid)")
-    conn.commit()
-    print("[OK] Indexes created")
-    
     # Stats
     print("\n" + "="*60)
     print("SPLIT STATISTICS")
@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "ml_models"))
+
+from feature_store import TABLES, MISSING_INT, FeatureTable, _write_table
+
+
+def _table(tmp_path, df):
+    key, columns = TABLES['user_features']
+    meta = _write_table(df, key, columns, tmp_path / "user_features")
+    return FeatureTable(tmp_path / "user_features", meta)
+
+
+def _users(visitorids):
+    n = len(visitorids)
+    return pd.DataFrame({
+        'visitorid': visitorids,
+        'total_events': np.arange(n) + 1,
+        'total_views': np.ones(n, dtype=int),
+        'total_addtocarts': np.zeros(n, dtype=int),
+        'total_transactions': np.zeros(n, dtype=int),
+        'favorite_category': np.arange(n) + 100,
+        'avg_session_duration': np.full(n, 1.5),
+        'last_interaction_timestamp': np.arange(n),
+        'user_segment': ['casual'] * n
+    })
+
+
+def test_lookup_on_empty_table(tmp_path):
+    """A snapshot built before features exist answers every id as missing"""
+    table = _table(tmp_path, _users([]))
+
+    found, values = table.lookup([1, 2])
+
+    assert not found.any()
+    assert (values['favorite_category'] == MISSING_INT).all()
+    assert np.isnan(values['avg_session_duration']).all()
+    assert list(values['user_segment']) == [None, None]
+    assert table.get(1) is None
+
+
+def test_lookup_mixes_known_and_unknown_ids(tmp_path):
+    table = _table(tmp_path, _users([30, 10, 20]))
+
+    found, values = table.lookup([20, 5, 30, 99])
+
+    assert list(found) == [True, False, True, False]
+    assert list(values['favorite_category']) == [102, MISSING_INT, 100, MISSING_INT]
+    assert list(values['user_segment']) == ['casual', None, 'casual', None]